@@ -1,18 +1,26 @@
-import json
 import statistics
 from datetime import datetime
 import matplotlib.pyplot as plt
 import numpy as np
 import os
+from histograma import HistogramaLatencia
+from arquivoResultados import carregar_resultados
 
 class AnalisadorMetricas:
+    # Campos de cada execução usados na análise; fases e endpoints ficam de fora da memória
+    CAMPOS = ('tempo_medio', 'throughput', 'taxa_sucesso', 'desvio_padrao', 'total_requisicoes', 'sucessos',
+              'p50', 'p90', 'p99', 'p99_9', 'max', 'histograma')
+
     def __init__(self, arquivoResultados):
         self.arquivoResultados = arquivoResultados
         self.dados = self.carregarDados()
         
     def carregarDados(self):
-        with open(self.arquivoResultados, 'r', encoding='utf-8') as arquivo:
-            return json.load(arquivo)
+        # .jsonl é lido linha a linha (última suíte do arquivo); o .json antigo ainda é aceito
+        dados = carregar_resultados(self.arquivoResultados, campos=self.CAMPOS)
+        if not dados['metadata'].get('completa', True):
+            print("Aviso: a suíte não chegou ao fim; analisando só as execuções gravadas")
+        return dados
     
     def calcularEstatisticasGrupo(self, grupo):
         if not grupo:
@@ -22,6 +30,7 @@ class AnalisadorMetricas:
         throughputs = [t['throughput'] for t in grupo]
         taxasSucesso = [t['taxa_sucesso'] for t in grupo]
         desviosPadrao = [t['desvio_padrao'] for t in grupo]
+        histograma = self.mesclarHistogramas(grupo)
         
         return {
             'tempo_medio': statistics.mean(temposMedios),
@@ -30,9 +39,57 @@ class AnalisadorMetricas:
             'throughput_desvio': statistics.stdev(throughputs) if len(throughputs) > 1 else 0,
             'taxa_sucesso_medio': statistics.mean(taxasSucesso),
             'consistencia_medio': statistics.mean(desviosPadrao),
-            'amostras': len(grupo)
+            'amostras': len(grupo),
+            'percentis': histograma.resumo() if histograma else None
         }
     
+    def mesclarHistogramas(self, grupo):
+        """Junta os histogramas de latência de todas as execuções do grupo.
+
+        Percentis não podem ser tirados da média dos percentis de cada execução; com os
+        histogramas somados o p99 é o p99 real de todas as requisições do grupo.
+        Resultados antigos, sem histograma, fazem o método retornar None.
+        """
+        if not grupo or any('histograma' not in teste for teste in grupo):
+            return None
+        return HistogramaLatencia.juntar_todos(HistogramaLatencia.de_dict(teste['histograma']) for teste in grupo)
+    
+    def analisarPercentis(self):
+        print("\nPERCENTIS DE LATÊNCIA (todas as execuções de cada cenário)")
+        print("-" * 60)
+        for cenario_nome, cenario in self.dados['cenarios'].items():
+            print(f"\n{cenario_nome.upper().replace('_', ' ')}:")
+            for servidor_nome, execucoes in cenario.items():
+                histograma = self.mesclarHistogramas(execucoes)
+                if histograma is None:
+                    print(f"  {servidor_nome.upper():12} | sem histograma nos resultados")
+                    continue
+                percentis = histograma.resumo()
+                print(f"  {servidor_nome.upper():12} | p50 {percentis['p50'] * 1000:8.2f}ms"
+                      f" | p90 {percentis['p90'] * 1000:8.2f}ms | p99 {percentis['p99'] * 1000:8.2f}ms"
+                      f" | p99.9 {percentis['p99_9'] * 1000:8.2f}ms | max {percentis['max'] * 1000:8.2f}ms"
+                      f" | {histograma.contagem} reqs")
+    
+    def analisarCapacidade(self):
+        # A busca de capacidade (MODO_CARGA=capacidade) grava em capacidade.jsonl, ao lado das métricas
+        caminho = os.path.join(os.path.dirname(self.arquivoResultados), 'capacidade.jsonl')
+        if not os.path.exists(caminho):
+            return
+        capacidade = carregar_resultados(caminho).get('capacidade', {})
+        if not capacidade:
+            return
+        print("\nCAPACIDADE SOB SLO (maior taxa que cumpre o SLO)")
+        print("-" * 60)
+        for servidor_nome, resultado in capacidade.items():
+            slo = resultado['slo']
+            if resultado['capacidade'] is None:
+                valor = "SLO violado já na taxa inicial"
+            else:
+                valor = f"{resultado['capacidade']:8.1f} req/s"
+                if resultado['limitado_por_taxa_maxima']:
+                    valor += " (limite da busca)"
+            print(f"  {servidor_nome.upper():12} | {valor} | SLO p99 < {slo['p99'] * 1000:.0f}ms, erros < {slo['taxa_erros']}%")
+    
     def converter_para_formato_antigo(self):
         """Converte o novo formato para o formato esperado pelo analisador original"""
         formato_antigo = {
@@ -197,6 +254,9 @@ class AnalisadorMetricas:
         print(f"X-Custom-ID: {self.dados['metadata']['custom_id']}")
         print("=" * 80)
         
+        self.analisarPercentis()
+        self.analisarCapacidade()
+        
         dados_convertidos = self.converter_para_formato_antigo()
         
         stats_seq_get_seq = self.calcularEstatisticasGrupo(dados_convertidos['servidor_sequencial']['testes_get_sequenciais'])
@@ -329,6 +389,8 @@ class AnalisadorMetricas:
 def encontrarArquivoRecente():
     import os
     caminhos_tentados = [
+        'resultados/metricas_completas.jsonl',
+        '/app/resultados/metricas_completas.jsonl',
         'resultados/metricas_completas.json',
         '/app/resultados/metricas_completas.json', 
         'metricas_completas.json'
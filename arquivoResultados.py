@@ -0,0 +1,101 @@
+import json
+import os
+from datetime import datetime
+
+
+class ArquivoResultados:
+    """Gravacao incremental dos resultados da suite em JSON Lines (so acrescenta linhas).
+
+    Cada execucao vira uma linha gravada assim que termina, entao uma queda no meio da
+    suite perde no maximo a execucao em andamento. Uma suite comeca com um registro
+    'metadata' e termina com um 'fim'; varias suites podem ficar no mesmo arquivo.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        diretorio = os.path.dirname(caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self.arquivo = open(caminho, 'a', encoding='utf-8')
+        self.suite = None
+
+    def escrever(self, registro):
+        self.arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        self.arquivo.flush()
+
+    def iniciar_suite(self, metadata):
+        self.suite = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        self.escrever({'tipo': 'metadata', 'suite': self.suite, **metadata})
+
+    def registrar_execucao(self, cenario, servidor, execucao, resultado):
+        self.escrever({'tipo': 'execucao', 'suite': self.suite, 'cenario': cenario, 'servidor': servidor,
+                       'execucao': execucao, 'resultado': resultado})
+
+    def finalizar(self):
+        self.escrever({'tipo': 'fim', 'suite': self.suite, 'data_fim': datetime.now().isoformat()})
+        self.arquivo.close()
+
+
+def ler_registros(caminho):
+    # Le linha a linha; uma ultima linha cortada (queda no meio da escrita) e ignorada
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            try:
+                yield json.loads(linha)
+            except ValueError:
+                continue
+
+
+def ultima_suite(caminho):
+    suite = None
+    for registro in ler_registros(caminho):
+        if registro.get('tipo') == 'metadata':
+            suite = registro['suite']
+    return suite
+
+
+def carregar_resultados(caminho, campos=None, suite=None, ao_ler=None):
+    """Monta {'metadata', 'cenarios': {cenario: {servidor: [resultado, ...]}}} lendo o arquivo aos poucos.
+
+    Sem suite usa a ultima suite do arquivo. Com campos cada resultado guarda so essas
+    chaves, e ao_ler(cenario, servidor, resultado) recebe o resultado completo antes do
+    corte (por exemplo para somar histogramas sem manter todos na memoria).
+    Registros 'capacidade' (busca de capacidade sob SLO) vao para dados['capacidade'][servidor].
+    Arquivos .json do formato antigo (um unico dump) tambem sao aceitos.
+    """
+    if caminho.endswith('.json'):
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            dados = json.load(arquivo)
+        dados['metadata'].setdefault('completa', True)
+        for cenario_nome, cenario in dados['cenarios'].items():
+            for servidor_nome, execucoes in cenario.items():
+                for indice, resultado in enumerate(execucoes):
+                    if ao_ler is not None:
+                        ao_ler(cenario_nome, servidor_nome, resultado)
+                    if campos is not None:
+                        execucoes[indice] = {chave: resultado[chave] for chave in campos if chave in resultado}
+        return dados
+
+    if suite is None:
+        suite = ultima_suite(caminho)
+    dados = {'metadata': {}, 'cenarios': {}}
+    for registro in ler_registros(caminho):
+        if registro.get('suite') != suite:
+            continue
+        tipo = registro.get('tipo')
+        if tipo == 'metadata':
+            dados['metadata'] = {chave: valor for chave, valor in registro.items() if chave != 'tipo'}
+            dados['metadata']['completa'] = False
+        elif tipo == 'fim':
+            dados['metadata']['completa'] = True
+        elif tipo == 'execucao':
+            resultado = registro['resultado']
+            if ao_ler is not None:
+                ao_ler(registro['cenario'], registro['servidor'], resultado)
+            if campos is not None:
+                resultado = {chave: resultado[chave] for chave in campos if chave in resultado}
+            dados['cenarios'].setdefault(registro['cenario'], {}).setdefault(registro['servidor'], []).append(resultado)
+        elif tipo == 'capacidade':
+            dados.setdefault('capacidade', {})[registro['servidor']] = {
+                chave: valor for chave, valor in registro.items() if chave not in ('tipo', 'suite', 'servidor')}
+    return dados
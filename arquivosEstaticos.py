@@ -0,0 +1,195 @@
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import unquote
+
+from respostaHttp import TrechoArquivo
+
+
+class ArquivoAberto:
+    """Arquivo mantido aberto no cache; so e fechado quando sai do cache e ninguem mais esta enviando"""
+
+    def __init__(self, caminho, objeto, info):
+        self.caminho = caminho
+        self.objeto = objeto
+        self.tamanho = info.st_size
+        self.identidade = (info.st_ino, info.st_size, info.st_mtime_ns)
+        self.mtime = int(info.st_mtime)
+        self.etag = f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+        self.tipo = mimetypes.guess_type(caminho)[0] or 'application/octet-stream'
+        self.verificado_em = time.monotonic()
+        self.usuarios = 0
+        self.descartado = False
+        self.lock = threading.Lock()
+
+    def adquirir(self):
+        with self.lock:
+            self.usuarios += 1
+
+    def liberar(self):
+        with self.lock:
+            self.usuarios -= 1
+            fechar = self.descartado and self.usuarios == 0
+        if fechar:
+            self.objeto.close()
+
+    def descartar(self):
+        with self.lock:
+            self.descartado = True
+            fechar = self.usuarios == 0
+        if fechar:
+            self.objeto.close()
+
+
+class ServidorArquivos:
+    """Serve arquivos de uma raiz de documentos com sendfile, respostas condicionais e Range.
+
+    Arquivos quentes ficam abertos num cache LRU; o stat so e refeito a cada
+    intervalo_validacao segundos para detectar alteracoes no disco.
+    """
+
+    def __init__(self, raiz, max_arquivos=64, intervalo_validacao=1.0):
+        self.raiz = os.path.realpath(raiz)
+        self.max_arquivos = max_arquivos
+        self.intervalo_validacao = intervalo_validacao
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def resolver_caminho(self, relativo):
+        caminho = os.path.realpath(os.path.join(self.raiz, relativo.lstrip('/')))
+        if caminho != self.raiz and not caminho.startswith(self.raiz + os.sep):
+            raise PermissionError(relativo)
+        return caminho
+
+    def abrir(self, relativo):
+        caminho = self.resolver_caminho(relativo)
+        agora = time.monotonic()
+
+        with self.lock:
+            arquivo = self.cache.get(caminho)
+            if arquivo is not None:
+                if agora - arquivo.verificado_em < self.intervalo_validacao:
+                    self.cache.move_to_end(caminho)
+                    arquivo.adquirir()
+                    return arquivo
+
+        info = os.stat(caminho)
+        if not os.path.isfile(caminho):
+            raise FileNotFoundError(relativo)
+        identidade = (info.st_ino, info.st_size, info.st_mtime_ns)
+
+        with self.lock:
+            arquivo = self.cache.get(caminho)
+            if arquivo is not None and arquivo.identidade == identidade:
+                arquivo.verificado_em = agora
+                self.cache.move_to_end(caminho)
+                arquivo.adquirir()
+                return arquivo
+
+        # open() fora do lock: um disco lento so atrasa quem pediu este arquivo
+        novo = ArquivoAberto(caminho, open(caminho, 'rb', buffering=0), info)
+
+        with self.lock:
+            arquivo = self.cache.get(caminho)
+            if arquivo is not None and arquivo.identidade == identidade:
+                # Outra thread abriu o mesmo arquivo enquanto isso: fica o que ja esta no cache
+                novo.objeto.close()
+                arquivo.verificado_em = agora
+            else:
+                if arquivo is not None:
+                    arquivo.descartar()
+                arquivo = self.cache[caminho] = novo
+                while len(self.cache) > self.max_arquivos:
+                    _, antigo = self.cache.popitem(last=False)
+                    antigo.descartar()
+            self.cache.move_to_end(caminho)
+            arquivo.adquirir()
+            return arquivo
+
+    def nao_modificado(self, arquivo, cabecalhos):
+        if_none_match = cabecalhos.get('if-none-match')
+        if if_none_match is not None:
+            etags = [etag.strip() for etag in if_none_match.split(',')]
+            return '*' in etags or arquivo.etag in etags or f"W/{arquivo.etag}" in etags
+
+        if_modified_since = cabecalhos.get('if-modified-since')
+        if if_modified_since:
+            try:
+                return arquivo.mtime <= int(parsedate_to_datetime(if_modified_since).timestamp())
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def intervalo_pedido(self, arquivo, cabecalhos):
+        """Retorna (inicio, fim) do Range, None para o arquivo inteiro ou False se insatisfazivel"""
+        faixa = cabecalhos.get('range')
+        if not faixa or not faixa.startswith('bytes=') or ',' in faixa:
+            return None
+        if_range = cabecalhos.get('if-range')
+        if if_range and if_range != arquivo.etag and if_range != arquivo.last_modified:
+            return None
+
+        inicio_txt, _, fim_txt = faixa[6:].strip().partition('-')
+        try:
+            if not inicio_txt:
+                sufixo = int(fim_txt)
+                if sufixo <= 0:
+                    return False
+                inicio, fim = max(0, arquivo.tamanho - sufixo), arquivo.tamanho - 1
+            else:
+                inicio = int(inicio_txt)
+                fim = int(fim_txt) if fim_txt else arquivo.tamanho - 1
+        except ValueError:
+            return None
+
+        if inicio >= arquivo.tamanho or fim < inicio:
+            return False
+        return inicio, min(fim, arquivo.tamanho - 1)
+
+    def responder(self, requisicao, criar_resposta):
+        """Resposta para o arquivo pedido; com corpo, quem envia libera o arquivo (ConstrutorRespostas.enviar)"""
+        try:
+            # O roteador entrega o caminho como veio na URL: /static/a%20b.txt e o arquivo "a b.txt"
+            arquivo = self.abrir(unquote(requisicao.parametros.get('*', '')))
+        except (FileNotFoundError, NotADirectoryError, IsADirectoryError, PermissionError, ValueError):
+            # ValueError: %00 no caminho (byte nulo nao existe em nome de arquivo)
+            return criar_resposta(404, "<h1>404 - Arquivo Não Encontrado</h1>")
+
+        try:
+            resposta = self.montar_resposta(arquivo, requisicao, criar_resposta)
+        except BaseException:
+            # Sem resposta ninguem chega ao liberar() do envio: o arquivo ficaria preso no cache
+            arquivo.liberar()
+            raise
+        if resposta.arquivo is None:
+            arquivo.liberar()
+        return resposta
+
+    def montar_resposta(self, arquivo, requisicao, criar_resposta):
+        cabecalhos = {
+            "ETag": arquivo.etag,
+            "Last-Modified": arquivo.last_modified,
+            "Accept-Ranges": "bytes"
+        }
+
+        if self.nao_modificado(arquivo, requisicao.cabecalhos):
+            return criar_resposta(304, b"", arquivo.tipo, cabecalhos)
+
+        faixa = self.intervalo_pedido(arquivo, requisicao.cabecalhos)
+        if faixa is False:
+            cabecalhos["Content-Range"] = f"bytes */{arquivo.tamanho}"
+            return criar_resposta(416, b"", arquivo.tipo, cabecalhos)
+
+        if faixa is None:
+            codigo, inicio, quantidade = 200, 0, arquivo.tamanho
+        else:
+            codigo, inicio, quantidade = 206, faixa[0], faixa[1] - faixa[0] + 1
+            cabecalhos["Content-Range"] = f"bytes {faixa[0]}-{faixa[1]}/{arquivo.tamanho}"
+
+        resposta = criar_resposta(codigo, b"", arquivo.tipo, cabecalhos)
+        resposta.arquivo = TrechoArquivo(arquivo, inicio, quantidade)
+        return resposta
@@ -0,0 +1,118 @@
+import itertools
+import os
+import threading
+import time
+
+from contadorRequisicoes import ContadorRequisicoes
+
+
+class ContadorComLock:
+    """O contador antigo do servidor concorrente: um lock global por requisicao"""
+
+    def __init__(self):
+        self.valor = 0
+        self.lock = threading.Lock()
+
+    def proximo(self):
+        with self.lock:
+            self.valor += 1
+            return self.valor
+
+    def total(self):
+        return self.valor
+
+
+CONTADORES = {
+    'lock': ContadorComLock,
+    'itertools.count': ContadorRequisicoes
+}
+
+
+def medir(fabrica, num_threads, operacoes_por_thread):
+    """Todas as threads incrementam juntas; retorna (ops/s, numeros unicos?, total lido)"""
+    contador = fabrica()
+    barreira = threading.Barrier(num_threads + 1)
+    vistos = [None] * num_threads
+
+    def trabalhar(indice):
+        proximo = contador.proximo
+        numeros = []
+        barreira.wait()
+        for _ in range(operacoes_por_thread):
+            numeros.append(proximo())
+        vistos[indice] = numeros
+
+    threads = [threading.Thread(target=trabalhar, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barreira.wait()
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    total_ops = num_threads * operacoes_por_thread
+    unicos = len(set(itertools.chain.from_iterable(vistos))) == total_ops
+    return total_ops / duracao, unicos, contador.total()
+
+
+def medir_thread_por_requisicao(fabrica, num_threads, total_requisicoes):
+    """Como o modo thread com Connection: close: uma thread nova para cada numero.
+
+    Ate num_threads threads vivas ao mesmo tempo (as vagas do semaforo do servidor).
+    O custo de criar as threads entra nas duas medidas; o que muda e o que o contador
+    faz na primeira chamada de cada thread.
+    """
+    contador = fabrica()
+    vagas = threading.Semaphore(num_threads)
+    vistos = []
+
+    def atender():
+        try:
+            vistos.append(contador.proximo())
+        finally:
+            vagas.release()
+
+    threads = []
+    inicio = time.perf_counter()
+    for _ in range(total_requisicoes):
+        vagas.acquire()
+        thread = threading.Thread(target=atender)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+    return total_requisicoes / duracao, len(set(vistos)) == total_requisicoes, contador.total()
+
+
+def executar_bench(lista_threads, operacoes_por_thread, repeticoes, requisicoes_curtas):
+    print("Threads longas: cada thread numera operacoes_por_thread requisicoes (modo pool/keep-alive)")
+    executar_cenario(lista_threads, repeticoes, lambda fabrica, num_threads: medir(fabrica, num_threads, operacoes_por_thread))
+    print(f"\nThread por requisicao: {requisicoes_curtas} threads de um numero cada (modo thread + Connection: close)")
+    executar_cenario(lista_threads, repeticoes,
+                     lambda fabrica, num_threads: medir_thread_por_requisicao(fabrica, num_threads, requisicoes_curtas))
+
+
+def executar_cenario(lista_threads, repeticoes, medida):
+    print(f"{'threads':>8} {'contador':>16} {'ops/s':>12} {'vs lock':>8} {'unicos':>7} {'total':>10}")
+    for num_threads in lista_threads:
+        referencia = None
+        for nome, fabrica in CONTADORES.items():
+            # Melhor de N repeticoes para reduzir o ruido do escalonador
+            melhor = max((medida(fabrica, num_threads) for _ in range(repeticoes)),
+                         key=lambda resultado: resultado[0])
+            taxa, unicos, total = melhor
+            if referencia is None:
+                referencia = taxa
+            print(f"{num_threads:>8} {nome:>16} {taxa:>12,.0f} {taxa / referencia:>7.2f}x {'sim' if unicos else 'NAO':>7} "
+                  f"{'-' if total is None else total:>10}")
+
+
+if __name__ == "__main__":
+    executar_bench(
+        lista_threads=[int(valor) for valor in os.environ.get('THREADS', '1,8,50,100').split(',')],
+        operacoes_por_thread=int(os.environ.get('OPERACOES', '20000')),
+        repeticoes=int(os.environ.get('REPETICOES', '3')),
+        requisicoes_curtas=int(os.environ.get('REQUISICOES_CURTAS', '5000'))
+    )
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheRespostas:
+    """Cache LRU com TTL por rota para respostas GET idempotentes.
+
+    Guarda o RespostaHttp ja codificado; no envio so Date e Connection sao montados.
+    Dentro do TTL os campos volateis da resposta (contador de requisicoes, timestamp,
+    threads ativas) podem estar defasados: e o preco aceito para nao refazer o
+    json.dumps a cada health check.
+    """
+
+    def __init__(self, rotas, max_entradas=128):
+        self.rotas = dict(rotas)  # caminho -> TTL em segundos
+        self.max_entradas = max_entradas
+        self.entradas = OrderedDict()  # caminho -> (expira_em, resposta)
+        self.lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, caminho):
+        if caminho not in self.rotas:
+            return None
+        with self.lock:
+            entrada = self.entradas.get(caminho)
+            if entrada is not None and entrada[0] > time.monotonic():
+                self.entradas.move_to_end(caminho)
+                self.acertos += 1
+                return entrada[1]
+            self.falhas += 1
+            return None
+
+    def guardar(self, caminho, resposta):
+        ttl = self.rotas.get(caminho)
+        if not ttl:
+            return
+        with self.lock:
+            self.entradas[caminho] = (time.monotonic() + ttl, resposta)
+            self.entradas.move_to_end(caminho)
+            while len(self.entradas) > self.max_entradas:
+                self.entradas.popitem(last=False)
+
+    def invalidar(self, caminho=None):
+        with self.lock:
+            if caminho is None:
+                self.entradas.clear()
+            else:
+                self.entradas.pop(caminho, None)
+
+    def estatisticas(self):
+        return {
+            "hits": self.acertos,
+            "misses": self.falhas,
+            "entries": len(self.entradas)
+        }
+
+
+def carregar_rotas_cache(texto):
+    """Converte "/health=1,/status=0.1" em {'/health': 1.0, '/status': 0.1}"""
+    rotas = {}
+    for item in texto.split(','):
+        if '=' in item:
+            caminho, ttl = item.split('=', 1)
+            rotas[caminho.strip()] = float(ttl)
+    return rotas
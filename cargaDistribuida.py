@@ -0,0 +1,147 @@
+import json
+import multiprocessing
+import socket
+import time
+
+from histograma import HistogramaLatencia
+
+
+def enviar_mensagem(arquivo, mensagem):
+    arquivo.write(json.dumps(mensagem) + "\n")
+    arquivo.flush()
+
+
+def receber_mensagem(arquivo):
+    linha = arquivo.readline()
+    if not linha:
+        raise ConnectionError("Conexao com o coordenador/participante encerrada")
+    return json.loads(linha)
+
+
+class CoordenadorCarga:
+    """Divide cada teste entre varios geradores de carga e junta as amostras.
+
+    Os participantes (processos locais ou outros containers cliente) conectam por TCP e
+    recebem o teste em JSON com um horario de inicio comum, assim todos comecam juntos.
+    Cada um devolve seu histograma de latencias; o ClienteTestesServidores calcula o
+    resultado a partir da uniao deles.
+    """
+
+    ATRASO_INICIO = 0.5  # folga para o teste chegar a todos antes do horario de inicio
+
+    def __init__(self, cliente, num_participantes, host='0.0.0.0', porta=9000, processos_locais=0):
+        self.cliente = cliente
+        self.num_participantes = num_participantes + processos_locais
+        self.processos_locais = processos_locais
+        self.socket_servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket_servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket_servidor.bind((host, porta))
+        self.socket_servidor.listen(self.num_participantes)
+        self.participantes = []
+        self.processos = []
+
+    def aguardar_participantes(self, timeout=120):
+        # Processos locais entram pelo loopback, como se fossem mais um container
+        porta = self.socket_servidor.getsockname()[1]
+        for indice in range(self.processos_locais):
+            processo = multiprocessing.Process(target=participar, args=('127.0.0.1', porta),
+                                               name=f"Gerador-{indice + 1}", daemon=True)
+            processo.start()
+            self.processos.append(processo)
+
+        print(f"[Coordenador] Aguardando {self.num_participantes} geradores na porta {porta}")
+        self.socket_servidor.settimeout(timeout)
+        while len(self.participantes) < self.num_participantes:
+            conexao, endereco = self.socket_servidor.accept()
+            conexao.settimeout(None)
+            self.participantes.append((conexao, conexao.makefile('rw', encoding='utf-8')))
+            print(f"[Coordenador] Gerador conectado: {endereco} ({len(self.participantes)}/{self.num_participantes})")
+
+    def dividir(self, total):
+        base, resto = divmod(total, len(self.participantes))
+        return [base + (1 if i < resto else 0) for i in range(len(self.participantes))]
+
+    def coletar_amostras(self, ip, porta, num_usuarios, requisicoes_por_usuario, gerador='threads', conexoes='nova',
+                         cenario=None):
+        inicio_em = time.time() + self.ATRASO_INICIO
+        primeiro_usuario = 0
+        for (_, arquivo), usuarios in zip(self.participantes, self.dividir(num_usuarios)):
+            enviar_mensagem(arquivo, {
+                'tipo': 'teste', 'ip': ip, 'porta': porta, 'usuarios': usuarios,
+                'requisicoes_por_usuario': requisicoes_por_usuario, 'gerador': gerador,
+                'conexoes': conexoes, 'inicio_em': inicio_em,
+                # Com o indice global cada gerador continua a rampa e as sementes de onde o anterior parou
+                'cenario': cenario.para_dict() if cenario is not None else None,
+                'primeiro_usuario': primeiro_usuario
+            })
+            primeiro_usuario += usuarios
+        return [receber_mensagem(arquivo) for _, arquivo in self.participantes]
+
+    def executar_teste(self, ip, porta, num_usuarios, requisicoes_por_usuario, gerador='threads', conexoes='nova',
+                       cenario=None):
+        if cenario is not None and cenario.duracao is not None:
+            print(f"Teste Servidor {ip}:{porta} - {num_usuarios} usuários por {cenario.duracao}s "
+                  f"(cenário {cenario.nome}), em {len(self.participantes)} geradores")
+        else:
+            print(f"Teste Servidor {ip}:{porta} - {num_usuarios} usuários × {requisicoes_por_usuario} reqs = "
+                  f"{num_usuarios * requisicoes_por_usuario} total, em {len(self.participantes)} geradores")
+        parciais = [parcial for parcial in self.coletar_amostras(ip, porta, num_usuarios, requisicoes_por_usuario,
+                                                                   gerador, conexoes, cenario)
+                    if parcial['histograma']['contagem']]
+        return self.cliente.resumir_teste(ip, porta, num_usuarios, requisicoes_por_usuario, parciais)
+
+    def encerrar(self):
+        for conexao, arquivo in self.participantes:
+            try:
+                enviar_mensagem(arquivo, {'tipo': 'fim'})
+            except OSError:
+                pass
+            conexao.close()
+        self.socket_servidor.close()
+        for processo in self.processos:
+            processo.join(timeout=5)
+
+
+def participar(host, porta, tentativas=60):
+    """Laco de um gerador: espera testes do coordenador, roda sua parte e devolve as amostras"""
+    from cenariosCarga import CenarioCarga
+    from clienteTestes import ClienteTestesServidores
+
+    cliente = ClienteTestesServidores()
+    for tentativa in range(tentativas):
+        try:
+            conexao = socket.create_connection((host, porta))
+            break
+        except OSError:
+            # O coordenador pode ainda nao ter subido (containers iniciam em paralelo)
+            time.sleep(1)
+    else:
+        raise ConnectionError(f"Coordenador {host}:{porta} inacessivel")
+
+    with conexao, conexao.makefile('rw', encoding='utf-8') as arquivo:
+        while True:
+            mensagem = receber_mensagem(arquivo)
+            if mensagem['tipo'] == 'fim':
+                return
+
+            if mensagem['usuarios'] == 0:
+                vazio = HistogramaLatencia().para_dict()
+                enviar_mensagem(arquivo, {'histograma': vazio, 'fases': {nome: vazio for nome in cliente.TODAS_FASES},
+                                          'sucessos': 0, 'inicio': 0, 'fim': 0})
+                continue
+
+            espera = mensagem['inicio_em'] - time.time()
+            if espera > 0:
+                time.sleep(espera)
+
+            cenario = CenarioCarga.de_dict(mensagem['cenario']) if mensagem.get('cenario') else None
+            primeiro_usuario = mensagem.get('primeiro_usuario', 0)
+            if mensagem['gerador'] == 'asyncio':
+                amostras = cliente.coletar_amostras_async(mensagem['ip'], mensagem['porta'], mensagem['usuarios'],
+                                                          mensagem['requisicoes_por_usuario'], cenario,
+                                                          primeiro_usuario)
+            else:
+                amostras = cliente.coletar_amostras(mensagem['ip'], mensagem['porta'], mensagem['usuarios'],
+                                                    mensagem['requisicoes_por_usuario'], mensagem.get('conexoes', 'nova'),
+                                                    cenario, primeiro_usuario)
+            enviar_mensagem(arquivo, amostras)
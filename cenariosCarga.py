@@ -0,0 +1,152 @@
+import bisect
+import itertools
+import json
+import random
+import string
+
+try:
+    import yaml
+except ImportError:  # YAML e opcional; arquivos .json funcionam sem dependencias
+    yaml = None
+
+
+class EndpointCarga:
+    """Um endpoint do mix: metodo, caminho, peso relativo e como gerar o corpo do POST"""
+
+    FORMATOS = ('texto', 'lista')
+
+    def __init__(self, metodo, caminho, peso=1, tamanho_corpo=0, formato_corpo='texto'):
+        self.metodo = metodo.upper()
+        self.caminho = caminho
+        self.peso = peso
+        # tamanho_corpo: bytes fixos ou [minimo, maximo] sorteado a cada requisicao
+        if isinstance(tamanho_corpo, (list, tuple)):
+            self.tamanho_minimo, self.tamanho_maximo = int(tamanho_corpo[0]), int(tamanho_corpo[1])
+        else:
+            self.tamanho_minimo = self.tamanho_maximo = int(tamanho_corpo)
+        if formato_corpo not in self.FORMATOS:
+            raise ValueError(f"formato_corpo invalido em {self.chave()}: {formato_corpo}")
+        self.formato_corpo = formato_corpo
+
+    def chave(self):
+        return f"{self.metodo} {self.caminho}"
+
+    def gerar_corpo(self, rng):
+        tamanho = rng.randint(self.tamanho_minimo, self.tamanho_maximo)
+        if tamanho <= 0:
+            return ""
+        if self.formato_corpo == 'lista':
+            # Itens separados por virgula, o formato que /api/batch conta
+            return ("item," * (tamanho // 5 + 1))[:tamanho].rstrip(',')
+        return "".join(rng.choices(string.ascii_letters + string.digits, k=tamanho))
+
+    def para_dict(self):
+        return {
+            'metodo': self.metodo,
+            'caminho': self.caminho,
+            'peso': self.peso,
+            'tamanho_corpo': [self.tamanho_minimo, self.tamanho_maximo],
+            'formato_corpo': self.formato_corpo
+        }
+
+
+class CenarioCarga:
+    """Cenario declarativo: usuarios, mix ponderado de endpoints, rampa, duracao ou contagem e think time.
+
+    Com duracao cada usuario repete requisicoes ate o prazo acabar; sem duracao cada um
+    faz requisicoes_por_usuario. A rampa espalha a entrada dos usuarios ao longo de
+    'rampa' segundos e o think time (fixo ou [min, max]) e a pausa entre requisicoes.
+    """
+
+    def __init__(self, nome, usuarios, mix, requisicoes_por_usuario=None, duracao=None, rampa=0,
+                 pensar=0, conexoes='nova', semente=None, servidores=None):
+        if not mix:
+            raise ValueError(f"Cenario {nome} sem endpoints no mix")
+        if (requisicoes_por_usuario is None) == (duracao is None):
+            raise ValueError(f"Cenario {nome}: defina requisicoes_por_usuario ou duracao (um dos dois)")
+        self.nome = nome
+        self.usuarios = int(usuarios)
+        self.mix = mix
+        self.pesos_acumulados = list(itertools.accumulate(endpoint.peso for endpoint in mix))
+        self.requisicoes_por_usuario = requisicoes_por_usuario
+        self.duracao = duracao
+        self.rampa = rampa
+        self.pensar = tuple(pensar) if isinstance(pensar, (list, tuple)) else (pensar, pensar)
+        self.conexoes = conexoes
+        self.semente = semente
+        # Nomes dos servidores que rodam este cenario; None segue a lista do arquivo
+        self.servidores = servidores
+
+    def rng_usuario(self, indice):
+        # Com semente cada usuario tem sua sequencia reprodutivel
+        return random.Random(None if self.semente is None else f"{self.semente}-{indice}")
+
+    def sortear(self, rng):
+        alvo = rng.random() * self.pesos_acumulados[-1]
+        return self.mix[bisect.bisect_right(self.pesos_acumulados, alvo)]
+
+    def atraso_entrada(self, indice, total_usuarios):
+        return self.rampa * indice / total_usuarios if total_usuarios else 0
+
+    def tempo_pensar(self, rng):
+        minimo, maximo = self.pensar
+        return rng.uniform(minimo, maximo) if maximo > minimo else minimo
+
+    def continuar(self, feitas, prazo, agora):
+        if self.duracao is not None:
+            return agora < prazo
+        return feitas < self.requisicoes_por_usuario
+
+    def para_dict(self):
+        return {
+            'nome': self.nome,
+            'usuarios': self.usuarios,
+            'mix': [endpoint.para_dict() for endpoint in self.mix],
+            'requisicoes_por_usuario': self.requisicoes_por_usuario,
+            'duracao': self.duracao,
+            'rampa': self.rampa,
+            'pensar': list(self.pensar),
+            'conexoes': self.conexoes,
+            'semente': self.semente,
+            'servidores': self.servidores
+        }
+
+    @classmethod
+    def de_dict(cls, dados, mix_padrao=None):
+        mix = dados.get('mix', mix_padrao)
+        if mix is None:
+            raise ValueError(f"Cenario {dados.get('nome')} sem mix (nem mix padrao no arquivo)")
+        return cls(
+            nome=dados['nome'],
+            usuarios=dados['usuarios'],
+            mix=[EndpointCarga(**endpoint) for endpoint in mix],
+            requisicoes_por_usuario=dados.get('requisicoes_por_usuario'),
+            duracao=dados.get('duracao'),
+            rampa=dados.get('rampa', 0),
+            pensar=dados.get('pensar', 0),
+            conexoes=dados.get('conexoes', 'nova'),
+            semente=dados.get('semente'),
+            servidores=dados.get('servidores')
+        )
+
+
+def carregar_arquivo_cenarios(caminho):
+    """Le um arquivo .json (ou .yaml/.yml com PyYAML instalado) e retorna (configuracao, cenarios).
+
+    'mix' no nivel de cima do arquivo vale para os cenarios que nao definem o proprio.
+    """
+    with open(caminho, 'r', encoding='utf-8') as arquivo:
+        if caminho.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise RuntimeError("Arquivos YAML precisam do PyYAML (pip install pyyaml); use .json")
+            dados = yaml.safe_load(arquivo)
+        else:
+            dados = json.load(arquivo)
+
+    cenarios = [CenarioCarga.de_dict(cenario, dados.get('mix')) for cenario in dados['cenarios']]
+    configuracao = {
+        'nome': dados.get('nome', caminho),
+        'execucoes': dados.get('execucoes', 1),
+        'servidores': dados.get('servidores')
+    }
+    return configuracao, cenarios
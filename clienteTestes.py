@@ -6,72 +6,303 @@ import hashlib
 import json
 from datetime import datetime
 import os
+import random
+import itertools
+import functools
+import asyncio
+from histograma import HistogramaLatencia
+from poolConexoes import PoolConexoes
+from janelasTempo import JanelasLatencia
+from arquivoResultados import ArquivoResultados, carregar_resultados
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 class ClienteTestesServidores:
-    def __init__(self):
+    # Fases de uma requisicao, na ordem: resolucao do endereco + socket(), connect, envio,
+    # espera do primeiro byte da resposta (TTFB) e recebimento do restante ate o close
+    FASES = ('preparacao', 'conexao', 'envio', 'primeiro_byte', 'transferencia')
+    # Com RASTREIO=1 no servidor, o Server-Timing divide a latencia em: fila no servidor (espera
+    # por vaga), processamento no servidor (parse, handler, montagem) e rede (todo o resto)
+    DECOMPOSICAO = ('rede', 'fila_servidor', 'processamento_servidor')
+    TODAS_FASES = FASES + DECOMPOSICAO
+    # Campos do /status guardados em cada janela do soak (os que o servidor tiver)
+    CAMPOS_STATUS_SOAK = ('active_threads', 'queued_connections', 'rejected_connections', 'requests_processed')
+    CAMPOS_RELATORIO = ('tempo_medio', 'throughput', 'taxa_sucesso', 'desvio_padrao')
+
+    SERVIDORES = [
+        {'nome': 'sequencial', 'ip': '37.92.0.10', 'porta': 80},
+        {'nome': 'concorrente', 'ip': '37.92.0.11', 'porta': 80},
+        {'nome': 'assincrono', 'ip': '37.92.0.12', 'porta': 80}
+    ]
+
+    def __init__(self, max_requisicoes_conexao=100):
         self.id_personalizado = hashlib.md5("20229043792 Victor Rodrigues Luz".encode()).hexdigest()
+        self.max_requisicoes_conexao = max_requisicoes_conexao  # limite de reuso no modo de conexoes 'pool'
     
-    def criar_requisicao_http(self, caminho="/", ip_alvo="37.92.0.10"):
-        requisicao = f"""GET {caminho} HTTP/1.1\r
+    def criar_requisicao_http(self, caminho="/", ip_alvo="37.92.0.10", manter_conexao=False, metodo="GET", corpo=""):
+        requisicao = f"""{metodo} {caminho} HTTP/1.1\r
 Host: {ip_alvo}\r
 X-Custom-ID: {self.id_personalizado}\r
 User-Agent: Cliente-Teste-Sockets/Redes-II\r
-Connection: close\r
-\r
+Connection: {'keep-alive' if manter_conexao else 'close'}\r
 """
-        return requisicao
+        if corpo:
+            requisicao += f"Content-Type: text/plain\r\nContent-Length: {len(corpo.encode())}\r\n"
+        return requisicao + "\r\n" + corpo
+
+    def proxima_requisicao(self, indice, cenario=None, rng=None):
+        # Sem cenario mantem a carga original: alterna / e /info
+        if cenario is None:
+            return "GET", "/" if indice % 2 == 0 else "/info", ""
+        endpoint = cenario.sortear(rng)
+        return endpoint.metodo, endpoint.caminho, endpoint.gerar_corpo(rng)
     
-    def medir_requisicao(self, ip, porta, caminho="/"):
-        inicio = time.time()
+    def novas_fases(self):
+        return {nome: HistogramaLatencia() for nome in self.TODAS_FASES}
+
+    def registrar_fases(self, fases, marcas):
+        # marcas: instantes perf_counter_ns ao fim de cada fase, precedidos do inicio
+        for nome, antes, depois in zip(self.FASES, marcas, marcas[1:]):
+            fases[nome].registrar((depois - antes) / 1e9)
+
+    def extrair_server_timing(self, resposta):
+        """Duracoes em segundos do cabecalho Server-Timing ({'queue': 0.0012, ...}) ou None se ausente"""
+        fim_cabecalhos = resposta.find(b'\r\n\r\n')
+        for linha in bytes(resposta[:fim_cabecalhos]).split(b'\r\n')[1:]:
+            nome, _, valor = linha.partition(b':')
+            if nome.strip().lower() != b'server-timing':
+                continue
+            etapas = {}
+            for metrica in valor.decode('latin-1').split(','):
+                partes = metrica.strip().split(';')
+                for parametro in partes[1:]:
+                    chave, _, numero = parametro.strip().partition('=')
+                    if chave == 'dur':
+                        etapas[partes[0]] = float(numero) / 1000
+            return etapas
+        return None
+
+    def registrar_decomposicao(self, fases, tempo, resposta):
+        # 'recv' (pedacos chegando) e transferencia: fica na rede junto com conexao e envio
+        etapas = self.extrair_server_timing(resposta)
+        if not etapas:
+            return
+        fila = etapas.get('queue', 0.0)
+        processamento = sum(duracao for etapa, duracao in etapas.items() if etapa not in ('queue', 'recv'))
+        fases['fila_servidor'].registrar(fila)
+        fases['processamento_servidor'].registrar(processamento)
+        fases['rede'].registrar(max(0.0, tempo - fila - processamento))
+
+    def medir_requisicao(self, ip, porta, caminho="/", fases=None, metodo="GET", corpo=""):
+        """Faz uma requisicao e retorna (tempo, status, sucesso).
+
+        Com fases (dict nome -> HistogramaLatencia) o tempo de cada fase tambem e registrado;
+        fases que nao chegaram a acontecer (erro no meio) ficam sem amostra.
+        """
+        inicio = time.perf_counter_ns()
+        marcas = [inicio]
+        s = None
         try:
+            endereco = socket.getaddrinfo(ip, porta, socket.AF_INET, socket.SOCK_STREAM)[0][4]
             s = socket.socket()
             s.settimeout(10)
-            s.connect((ip, porta))
+            marcas.append(time.perf_counter_ns())
+            s.connect(endereco)
+            marcas.append(time.perf_counter_ns())
             
-            requisicao = self.criar_requisicao_http(caminho, ip)
-            s.send(requisicao.encode())
+            requisicao = self.criar_requisicao_http(caminho, ip, metodo=metodo, corpo=corpo)
+            s.sendall(requisicao.encode())
+            marcas.append(time.perf_counter_ns())
             
-            resposta = b""
+            resposta = bytearray()
             while True:
                 dados = s.recv(4096)
+                if len(marcas) == 4:
+                    marcas.append(time.perf_counter_ns())
                 if not dados:
                     break
                 resposta += dados
+            marcas.append(time.perf_counter_ns())
             
-            tempo = time.time() - inicio
-            s.close()
+            tempo = (marcas[-1] - inicio) / 1e9
+            if fases is not None:
+                self.registrar_decomposicao(fases, tempo, resposta)
             
-            resposta_str = resposta.decode('utf-8', errors='ignore')
-            if '200 OK' in resposta_str:
+            if b'200 OK' in resposta:
                 return tempo, 200, True
             else:
                 return tempo, 400, False
                 
         except Exception as e:
             print(f"Erro na requisição para {ip}:{porta}: {e}")
-            return time.time() - inicio, 0, False
+            return (time.perf_counter_ns() - inicio) / 1e9, 0, False
+        finally:
+            if s is not None:
+                s.close()
+            if fases is not None:
+                self.registrar_fases(fases, marcas)
     
-    def executar_teste_servidor(self, ip, porta, num_threads, requisicoes_por_thread):
-        total_requisicoes = num_threads * requisicoes_por_thread
-        
-        print(f"Teste Servidor {ip}:{porta} - {num_threads} threads × {requisicoes_por_thread} reqs = {total_requisicoes} total")
+    def ler_resposta_http(self, s, marcas):
+        """Le uma resposta delimitada por Content-Length (a conexao continua aberta depois dela).
+
+        Retorna (resposta, manter_conexao, timeout_keep_alive, max_keep_alive); os dois ultimos
+        sao None quando o servidor nao manda o cabecalho Keep-Alive.
+        """
+        buffer = bytearray()
+        while True:
+            fim_cabecalhos = buffer.find(b'\r\n\r\n')
+            if fim_cabecalhos != -1:
+                break
+            dados = s.recv(65536)
+            if not dados:
+                raise ConnectionError("Conexão fechada antes da resposta")
+            # TTFB so com o primeiro byte de verdade: sem marca, quem chama sabe que nada chegou
+            if len(marcas) == 4:
+                marcas.append(time.perf_counter_ns())
+            buffer += dados
+
+        tamanho = 0
+        manter_conexao = True
+        timeout_keep_alive = max_keep_alive = None
+        for linha in bytes(buffer[:fim_cabecalhos]).decode('latin-1').split('\r\n')[1:]:
+            nome, _, valor = linha.partition(':')
+            nome = nome.strip().lower()
+            if nome == 'content-length':
+                tamanho = int(valor)
+            elif nome == 'connection':
+                manter_conexao = valor.strip().lower() != 'close'
+            elif nome == 'keep-alive':
+                for parametro in valor.split(','):
+                    chave, _, numero = parametro.strip().partition('=')
+                    if chave == 'timeout':
+                        timeout_keep_alive = float(numero)
+                    elif chave == 'max':
+                        max_keep_alive = int(numero)
+
+        fim_resposta = fim_cabecalhos + 4 + tamanho
+        while len(buffer) < fim_resposta:
+            dados = s.recv(65536)
+            if not dados:
+                raise ConnectionError("Conexão fechada no meio da resposta")
+            buffer += dados
+        return bytes(buffer[:fim_resposta]), manter_conexao, timeout_keep_alive, max_keep_alive
+
+    def medir_requisicao_pool(self, ip, porta, pool, caminho="/", fases=None, metodo="GET", corpo=""):
+        """Como medir_requisicao, mas com conexoes keep-alive reaproveitadas do pool.
+
+        Se uma conexao reaproveitada foi fechada pelo servidor (nada chegou antes do EOF/RST),
+        a requisicao e repetida uma vez numa conexao nova, como fazem os clientes HTTP.
+        """
+        inicio = time.perf_counter_ns()
+        marcas = [inicio]
+        conexao = None
+        try:
+            requisicao = self.criar_requisicao_http(caminho, ip, True, metodo, corpo).encode()
+            for tentativa in range(2):
+                conexao = pool.obter(ip, porta)
+                marcas.append(time.perf_counter_ns())
+                if conexao.socket is None:
+                    pool.conectar(conexao)
+                marcas.append(time.perf_counter_ns())
+                try:
+                    conexao.socket.sendall(requisicao)
+                    marcas.append(time.perf_counter_ns())
+                    resposta, manter, timeout_keep_alive, max_keep_alive = self.ler_resposta_http(conexao.socket, marcas)
+                    break
+                except ConnectionError:
+                    # len(marcas) > 4: ja chegou algum byte da resposta, repetir nao e seguro
+                    if not conexao.reusada() or len(marcas) > 4 or tentativa == 1:
+                        raise
+                    pool.descartar(conexao)
+                    conexao = None
+                    marcas = [inicio]
+            marcas.append(time.perf_counter_ns())
+
+            pool.devolver(conexao, manter, timeout_keep_alive, max_keep_alive)
+            conexao = None
+            tempo = (marcas[-1] - inicio) / 1e9
+            if fases is not None:
+                self.registrar_decomposicao(fases, tempo, resposta)
+
+            if b'200 OK' in resposta[:64]:
+                return tempo, 200, True
+            else:
+                return tempo, 400, False
+
+        except Exception as e:
+            print(f"Erro na requisição para {ip}:{porta}: {e}")
+            return (time.perf_counter_ns() - inicio) / 1e9, 0, False
+        finally:
+            if conexao is not None:
+                pool.descartar(conexao)
+            if fases is not None:
+                self.registrar_fases(fases, marcas)
+
+    def executar_teste_servidor(self, ip, porta, num_threads, requisicoes_por_thread, conexoes='nova', cenario=None):
+        if cenario is not None and cenario.duracao is not None:
+            print(f"Teste Servidor {ip}:{porta} - {num_threads} threads por {cenario.duracao}s (cenário {cenario.nome})")
+        else:
+            print(f"Teste Servidor {ip}:{porta} - {num_threads} threads × {requisicoes_por_thread} reqs = {num_threads * requisicoes_por_thread} total"
+                  f"{' (conexões keep-alive)' if conexoes == 'pool' else ''}")
         
+        amostras = self.coletar_amostras(ip, porta, num_threads, requisicoes_por_thread, conexoes, cenario)
+        return self.resumir_teste(ip, porta, num_threads, requisicoes_por_thread, [amostras])
+
+    def coletar_amostras(self, ip, porta, num_threads, requisicoes_por_thread, conexoes='nova', cenario=None,
+                         primeiro_usuario=0):
+        # Amostras cruas de um teste em malha fechada; resumir_teste junta as de varios processos.
+        # conexoes='nova' abre um socket por requisicao; 'pool' reaproveita conexoes keep-alive.
+        # Com cenario (CenarioCarga) o mix, a rampa, o think time e a duracao vem do arquivo
+        if conexoes not in ('nova', 'pool'):
+            raise ValueError(f"Modo de conexoes invalido: {conexoes}")
+        pool = PoolConexoes(max_por_destino=num_threads,
+                            max_requisicoes_conexao=self.max_requisicoes_conexao) if conexoes == 'pool' else None
         resultados = {
-            'tempos': [],
+            'histograma': HistogramaLatencia(),
+            'fases': self.novas_fases(),
+            'endpoints': {},
             'sucessos': 0,
             'lock': threading.Lock()
         }
         
         def thread_trabalhadora(id_thread):
-            for i in range(requisicoes_por_thread):
-                caminho = "/" if i % 2 == 0 else "/info"
+            # Histogramas e contador proprios da thread: o lock so e usado uma vez, no final
+            histograma = HistogramaLatencia()
+            fases = self.novas_fases()
+            endpoints = {}
+            sucessos = 0
+            rng = cenario.rng_usuario(primeiro_usuario + id_thread) if cenario else None
+            if cenario is not None and cenario.rampa:
+                # Indice global do usuario: em testes distribuidos a rampa cobre todos os geradores
+                time.sleep(cenario.atraso_entrada(primeiro_usuario + id_thread - 1, cenario.usuarios))
+            prazo = inicio_teste + cenario.duracao if cenario is not None and cenario.duracao else None
+            
+            i = 0
+            while cenario.continuar(i, prazo, time.time()) if cenario else i < requisicoes_por_thread:
+                metodo, caminho, corpo = self.proxima_requisicao(i, cenario, rng)
                 
-                tempo, status, sucesso = self.medir_requisicao(ip, porta, caminho)
+                if pool is not None:
+                    tempo, status, sucesso = self.medir_requisicao_pool(ip, porta, pool, caminho, fases, metodo, corpo)
+                else:
+                    tempo, status, sucesso = self.medir_requisicao(ip, porta, caminho, fases, metodo, corpo)
                 
-                with resultados['lock']:
-                    resultados['tempos'].append(tempo)
-                    if sucesso:
-                        resultados['sucessos'] += 1
+                histograma.registrar(tempo)
+                if sucesso:
+                    sucessos += 1
+                if cenario is not None:
+                    self.registrar_endpoint(endpoints, f"{metodo} {caminho}", tempo, sucesso)
+                    pausa = cenario.tempo_pensar(rng)
+                    if pausa:
+                        time.sleep(pausa)
+                i += 1
+            
+            with resultados['lock']:
+                resultados['histograma'].juntar(histograma)
+                self.juntar_fases(resultados['fases'], fases)
+                self.juntar_endpoints(resultados['endpoints'], endpoints)
+                resultados['sucessos'] += sucessos
         
         threads = []
         inicio_teste = time.time()
@@ -83,27 +314,630 @@ Connection: close\r
         
         for thread in threads:
             thread.join()
+        fim_teste = time.time()
         
-        tempo_total = time.time() - inicio_teste
-        
-        return {
+        amostras = {
+            'histograma': resultados['histograma'].para_dict(),
+            'fases': {nome: histograma.para_dict() for nome, histograma in resultados['fases'].items()},
+            'sucessos': resultados['sucessos'],
+            'inicio': inicio_teste,
+            'fim': fim_teste
+        }
+        if resultados['endpoints']:
+            amostras['endpoints'] = self.serializar_endpoints(resultados['endpoints'])
+        if pool is not None:
+            amostras['pool'] = pool.estatisticas()
+            pool.fechar()
+        return amostras
+
+    def juntar_fases(self, destino, origem):
+        for nome, histograma in origem.items():
+            destino[nome].juntar(histograma)
+
+    def registrar_endpoint(self, endpoints, chave, tempo, sucesso):
+        # endpoints: "METODO caminho" -> [histograma, sucessos]
+        estatisticas = endpoints.get(chave)
+        if estatisticas is None:
+            estatisticas = endpoints[chave] = [HistogramaLatencia(), 0]
+        estatisticas[0].registrar(tempo)
+        if sucesso:
+            estatisticas[1] += 1
+
+    def juntar_endpoints(self, destino, origem):
+        for chave, (histograma, sucessos) in origem.items():
+            estatisticas = destino.setdefault(chave, [HistogramaLatencia(), 0])
+            estatisticas[0].juntar(histograma)
+            estatisticas[1] += sucessos
+
+    def serializar_endpoints(self, endpoints):
+        return {chave: {'histograma': histograma.para_dict(), 'sucessos': sucessos}
+                for chave, (histograma, sucessos) in endpoints.items()}
+
+    def resumir_teste(self, ip, porta, num_threads, requisicoes_por_thread, parciais):
+        """Junta as amostras de um ou mais geradores num unico resultado.
+
+        Os percentis saem da uniao dos histogramas (nao da media dos percentis de cada um) e o
+        throughput usa a janela do primeiro inicio ao ultimo fim entre todos os geradores.
+        """
+        histograma = HistogramaLatencia.juntar_todos(HistogramaLatencia.de_dict(parcial['histograma'])
+                                                     for parcial in parciais)
+        # Toda requisicao (com sucesso ou nao) entra no histograma; em cenarios por duracao o
+        # total so e conhecido no final
+        total_requisicoes = histograma.contagem
+        fases = {nome: HistogramaLatencia.juntar_todos(HistogramaLatencia.de_dict(parcial['fases'][nome])
+                                                       for parcial in parciais)
+                 for nome in self.TODAS_FASES}
+        sucessos = sum(parcial['sucessos'] for parcial in parciais)
+        # Nenhum gerador com amostras (o coordenador descarta os vazios): resumo com zero requisicoes
+        tempo_total = (max(parcial['fim'] for parcial in parciais) - min(parcial['inicio'] for parcial in parciais)
+                       if parciais else 0)
+
+        resumo = {
             'ip': ip,
             'porta': porta,
             'total_requisicoes': total_requisicoes,
             'threads': num_threads,
-            'requisicoes_por_thread': requisicoes_por_thread,
+            'requisicoes_por_thread': requisicoes_por_thread
+        }
+        resumo.update(self.resumir_histograma(histograma, sucessos, total_requisicoes, tempo_total, fases))
+        endpoints = {}
+        for parcial in parciais:
+            for chave, dados in parcial.get('endpoints', {}).items():
+                estatisticas = endpoints.setdefault(chave, [HistogramaLatencia(), 0])
+                estatisticas[0].juntar(HistogramaLatencia.de_dict(dados['histograma']))
+                estatisticas[1] += dados['sucessos']
+        if endpoints:
+            resumo['endpoints'] = {chave: self.resumir_endpoint(histograma_endpoint, sucessos_endpoint)
+                                   for chave, (histograma_endpoint, sucessos_endpoint) in sorted(endpoints.items())}
+        if any('pool' in parcial for parcial in parciais):
+            resumo['conexoes'] = 'pool'
+            resumo['pool'] = {chave: sum(parcial['pool'][chave] for parcial in parciais if 'pool' in parcial)
+                              for chave in ('conexoes_abertas', 'reusos', 'conexoes_descartadas')}
+        return resumo
+
+    async def medir_requisicao_async(self, ip, porta, caminho="/", fases=None, metodo="GET", corpo=""):
+        # Mesma medida (e mesmas fases) do medir_requisicao, mas sem prender uma thread por requisicao
+        inicio = time.perf_counter_ns()
+        marcas = [inicio]
+        escritor = None
+        try:
+            informacoes = await asyncio.get_running_loop().getaddrinfo(ip, porta, family=socket.AF_INET,
+                                                                         type=socket.SOCK_STREAM)
+            endereco = informacoes[0][4]
+            marcas.append(time.perf_counter_ns())
+            leitor, escritor = await asyncio.wait_for(asyncio.open_connection(endereco[0], endereco[1]), 10)
+            marcas.append(time.perf_counter_ns())
+            escritor.write(self.criar_requisicao_http(caminho, ip, metodo=metodo, corpo=corpo).encode())
+            await escritor.drain()
+            marcas.append(time.perf_counter_ns())
+
+            resposta = bytearray(await asyncio.wait_for(leitor.read(65536), 10))
+            marcas.append(time.perf_counter_ns())
+            while True:
+                dados = await asyncio.wait_for(leitor.read(65536), 10)
+                if not dados:
+                    break
+                resposta += dados
+            marcas.append(time.perf_counter_ns())
+            tempo = (marcas[-1] - inicio) / 1e9
+            if fases is not None:
+                self.registrar_decomposicao(fases, tempo, resposta)
+
+            if b'200 OK' in resposta:
+                return tempo, 200, True
+            else:
+                return tempo, 400, False
+
+        except Exception as e:
+            print(f"Erro na requisição para {ip}:{porta}: {e!r}")
+            return (time.perf_counter_ns() - inicio) / 1e9, 0, False
+        finally:
+            if escritor is not None:
+                escritor.close()
+            if fases is not None:
+                self.registrar_fases(fases, marcas)
+
+    async def executar_usuarios_async(self, ip, porta, num_usuarios, requisicoes_por_usuario, cenario=None,
+                                      primeiro_usuario=0):
+        resultados = {'histograma': HistogramaLatencia(), 'fases': self.novas_fases(), 'endpoints': {}, 'sucessos': 0}
+
+        async def usuario_virtual(id_usuario):
+            rng = cenario.rng_usuario(primeiro_usuario + id_usuario) if cenario else None
+            if cenario is not None and cenario.rampa:
+                await asyncio.sleep(cenario.atraso_entrada(primeiro_usuario + id_usuario - 1, cenario.usuarios))
+
+            i = 0
+            while cenario.continuar(i, prazo, time.time()) if cenario else i < requisicoes_por_usuario:
+                metodo, caminho, corpo = self.proxima_requisicao(i, cenario, rng)
+
+                tempo, status, sucesso = await self.medir_requisicao_async(ip, porta, caminho, resultados['fases'],
+                                                                           metodo, corpo)
+
+                # Tudo roda no mesmo event loop: nao precisa de lock
+                resultados['histograma'].registrar(tempo)
+                if sucesso:
+                    resultados['sucessos'] += 1
+                if cenario is not None:
+                    self.registrar_endpoint(resultados['endpoints'], f"{metodo} {caminho}", tempo, sucesso)
+                    pausa = cenario.tempo_pensar(rng)
+                    if pausa:
+                        await asyncio.sleep(pausa)
+                i += 1
+
+        inicio_teste = time.time()
+        prazo = inicio_teste + cenario.duracao if cenario is not None and cenario.duracao else None
+        await asyncio.gather(*(usuario_virtual(i + 1) for i in range(num_usuarios)))
+        amostras = {
+            'histograma': resultados['histograma'].para_dict(),
+            'fases': {nome: histograma.para_dict() for nome, histograma in resultados['fases'].items()},
             'sucessos': resultados['sucessos'],
-            'falhas': total_requisicoes - resultados['sucessos'],
-            'taxa_sucesso': (resultados['sucessos'] / total_requisicoes) * 100,
+            'inicio': inicio_teste,
+            'fim': time.time()
+        }
+        if resultados['endpoints']:
+            amostras['endpoints'] = self.serializar_endpoints(resultados['endpoints'])
+        return amostras
+
+    def coletar_amostras_async(self, ip, porta, num_usuarios, requisicoes_por_usuario, cenario=None, primeiro_usuario=0):
+        self.ajustar_limite_arquivos(num_usuarios)
+        return asyncio.run(self.executar_usuarios_async(ip, porta, num_usuarios, requisicoes_por_usuario,
+                                                        cenario, primeiro_usuario))
+
+    def executar_teste_servidor_async(self, ip, porta, num_usuarios, requisicoes_por_usuario, cenario=None):
+        """Versao asyncio do executar_teste_servidor: cada usuario virtual e uma corrotina.
+
+        Milhares de conexoes simultaneas cabem num unico processo; o resultado tem o mesmo
+        formato do teste com threads (o campo 'threads' guarda o numero de usuarios virtuais).
+        """
+        if cenario is not None and cenario.duracao is not None:
+            print(f"Teste Servidor {ip}:{porta} - {num_usuarios} usuários asyncio por {cenario.duracao}s (cenário {cenario.nome})")
+        else:
+            print(f"Teste Servidor {ip}:{porta} - {num_usuarios} usuários asyncio × {requisicoes_por_usuario} reqs = "
+                  f"{num_usuarios * requisicoes_por_usuario} total")
+
+        amostras = self.coletar_amostras_async(ip, porta, num_usuarios, requisicoes_por_usuario, cenario)
+        return self.resumir_teste(ip, porta, num_usuarios, requisicoes_por_usuario, [amostras])
+
+    def ajustar_limite_arquivos(self, conexoes):
+        # Cada conexao aberta e um descritor; sobe o limite soft ate o hard se for preciso
+        if resource is None:
+            return
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        desejado = conexoes + 64
+        if soft != resource.RLIM_INFINITY and soft < desejado:
+            novo = desejado if hard == resource.RLIM_INFINITY else min(desejado, hard)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (novo, hard))
+
+    def resumir_histograma(self, histograma, sucessos, total_requisicoes, tempo_total, fases=None):
+        resumo = {
+            'sucessos': sucessos,
+            'falhas': total_requisicoes - sucessos,
+            'taxa_sucesso': (sucessos / total_requisicoes) * 100 if total_requisicoes else 0,
             'tempo_total': tempo_total,
-            'tempo_medio': statistics.mean(resultados['tempos']) if resultados['tempos'] else 0,
-            'tempo_minimo': min(resultados['tempos']) if resultados['tempos'] else 0,
-            'tempo_maximo': max(resultados['tempos']) if resultados['tempos'] else 0,
-            'desvio_padrao': statistics.stdev(resultados['tempos']) if len(resultados['tempos']) > 1 else 0,
+            'tempo_medio': histograma.media(),
+            'tempo_minimo': histograma.minimo or 0,
+            'tempo_maximo': histograma.maximo or 0,
+            'desvio_padrao': histograma.desvio_padrao(),
             'throughput': total_requisicoes / tempo_total if tempo_total > 0 else 0
         }
+        resumo.update(histograma.resumo())
+        # Serializado para o analisador juntar as execucoes de um mesmo cenario
+        resumo['histograma'] = histograma.para_dict()
+        if fases is not None:
+            # A decomposicao so aparece quando o servidor mandou Server-Timing
+            resumo['fases'] = {nome: self.resumir_fase(fase) for nome, fase in fases.items()
+                               if fase.contagem or nome not in self.DECOMPOSICAO}
+        return resumo
+
+    def resumir_endpoint(self, histograma, sucessos):
+        resumo = self.resumir_fase(histograma)
+        resumo['sucessos'] = sucessos
+        return resumo
+
+    def resumir_fase(self, histograma):
+        resumo = {'media': histograma.media(), 'amostras': histograma.contagem}
+        resumo.update(histograma.resumo())
+        resumo['histograma'] = histograma.para_dict()
+        return resumo
+
+    def gerar_horarios(self, taxa, total, chegadas='constante'):
+        # Instantes de envio (segundos desde o inicio) de cada requisicao
+        if chegadas == 'poisson':
+            # Intervalos exponenciais: chegadas independentes com a mesma taxa media
+            return list(itertools.accumulate(random.expovariate(taxa) for _ in range(total)))
+        if chegadas == 'constante':
+            return [i / taxa for i in range(total)]
+        raise ValueError(f"Tipo de chegada invalido: {chegadas}")
+
+    def executar_teste_taxa(self, ip, porta, taxa, duracao, chegadas='constante', max_concorrencia=256):
+        """Carga em malha aberta: as requisicoes saem na taxa alvo independente das respostas.
+
+        A latencia e medida a partir do horario previsto de envio, entao o tempo que uma
+        requisicao esperou por uma thread livre (servidor saturado) entra na medida em vez
+        de sumir (coordinated omission).
+        """
+        total_requisicoes = max(1, int(taxa * duracao))
+        horarios = self.gerar_horarios(taxa, total_requisicoes, chegadas)
+        num_threads = min(max_concorrencia, total_requisicoes)
+
+        print(f"Teste Servidor {ip}:{porta} - malha aberta {taxa} req/s ({chegadas}) por {duracao}s = {total_requisicoes} total")
+
+        resultados = {
+            'histograma': HistogramaLatencia(),
+            'fases': self.novas_fases(),
+            'atrasos_envio': HistogramaLatencia(),
+            'sucessos': 0,
+            'lock': threading.Lock()
+        }
+        proxima = itertools.count()
+
+        def thread_enviadora():
+            histograma = HistogramaLatencia()
+            fases = self.novas_fases()
+            atrasos_envio = HistogramaLatencia()
+            sucessos = 0
+            while True:
+                i = next(proxima)
+                if i >= total_requisicoes:
+                    break
+                previsto = inicio_teste + horarios[i]
+                espera = previsto - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                atraso_envio = time.perf_counter() - previsto
+                caminho = "/" if i % 2 == 0 else "/info"
+
+                tempo, status, sucesso = self.medir_requisicao(ip, porta, caminho, fases)
+
+                histograma.registrar(atraso_envio + tempo)
+                atrasos_envio.registrar(atraso_envio)
+                if sucesso:
+                    sucessos += 1
+
+            with resultados['lock']:
+                resultados['histograma'].juntar(histograma)
+                self.juntar_fases(resultados['fases'], fases)
+                resultados['atrasos_envio'].juntar(atrasos_envio)
+                resultados['sucessos'] += sucessos
+
+        threads = [threading.Thread(target=thread_enviadora) for _ in range(num_threads)]
+        inicio_teste = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        tempo_total = time.perf_counter() - inicio_teste
+
+        resumo = {
+            'ip': ip,
+            'porta': porta,
+            'modo': 'aberto',
+            'chegadas': chegadas,
+            'taxa_alvo': taxa,
+            # Taxa que o cronograma sorteado realmente pediu: com poisson e poucas chegadas ela
+            # fica longe do alvo, e e contra ela que o throughput obtido deve ser comparado
+            'taxa_oferecida': total_requisicoes / horarios[-1] if horarios[-1] > 0 else taxa,
+            'duracao_alvo': duracao,
+            'total_requisicoes': total_requisicoes,
+            'threads': num_threads,
+            'atraso_envio_medio': resultados['atrasos_envio'].media(),
+            'atraso_envio_maximo': resultados['atrasos_envio'].maximo or 0
+        }
+        resumo.update(self.resumir_histograma(resultados['histograma'], resultados['sucessos'], total_requisicoes,
+                                              tempo_total, resultados['fases']))
+        return resumo
+
+    def varrer_taxas(self, ip, porta, taxas, duracao, chegadas='constante'):
+        """Roda executar_teste_taxa em taxas crescentes e aponta o joelho de saturacao.
+
+        Uma taxa e considerada saturada quando o servidor nao acompanha (throughput abaixo
+        de 90% da taxa oferecida pelo cronograma de envios), falha mais de 1% das requisicoes ou o p99 passa de 5x o p99 da
+        menor taxa. O joelho e a ultima taxa antes da primeira saturada.
+        """
+        pontos = []
+        joelho = None
+        saturou_em = None
+        for taxa in sorted(taxas):
+            ponto = self.executar_teste_taxa(ip, porta, taxa, duracao, chegadas)
+            pontos.append(ponto)
+            p99_base = pontos[0]['p99']
+            saturado = (ponto['throughput'] < 0.9 * ponto['taxa_oferecida'] or ponto['taxa_sucesso'] < 99
+                        or (p99_base > 0 and ponto['p99'] > 5 * p99_base))
+            print(f"  {taxa:8.1f} req/s alvo | oferecido {ponto['taxa_oferecida']:8.1f} | obtido {ponto['throughput']:8.1f} req/s"
+                  f" | p99 {ponto['p99']:.3f}s | sucesso {ponto['taxa_sucesso']:.1f}%{' | SATURADO' if saturado else ''}")
+            if saturado:
+                saturou_em = taxa
+                break
+            joelho = taxa
+            time.sleep(0.5)
+        return {'pontos': pontos, 'joelho': joelho, 'saturou_em': saturou_em}
+
+    def executar_suite_carga_aberta(self, taxas, duracao=10, chegadas='constante'):
+        print("=" * 70)
+        print("SUITE DE TESTES - CARGA EM MALHA ABERTA (VARREDURA DE TAXAS)")
+        print("=" * 70)
+        print(f"Taxas: {', '.join(str(taxa) for taxa in taxas)} req/s | Duração por taxa: {duracao}s | Chegadas: {chegadas}")
+        print("=" * 70)
+
+        resultados = {
+            'metadata': {
+                'matricula': '20229043792',
+                'nome': 'Victor Rodrigues Luz',
+                'data_testes': datetime.now().isoformat(),
+                'custom_id': self.id_personalizado,
+                'configuracao': 'varredura_taxa_malha_aberta',
+                'taxas': list(taxas),
+                'duracao_por_taxa': duracao,
+                'chegadas': chegadas
+            },
+            'servidores': {}
+        }
+
+        for servidor in self.SERVIDORES:
+            print(f"\n--- SERVIDOR {servidor['nome'].upper()} ---")
+            varredura = self.varrer_taxas(servidor['ip'], servidor['porta'], taxas, duracao, chegadas)
+            resultados['servidores'][servidor['nome']] = varredura
+            print(f"  Joelho: {varredura['joelho']} req/s" if varredura['joelho'] else "  Saturado já na menor taxa")
+
+        os.makedirs('resultados', exist_ok=True)
+        with open('resultados/metricas_carga_aberta.json', 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+        return resultados
+    
+    def consultar_status(self, ip, porta, timeout=0.5):
+        # Amostra do /status do servidor (threads ativas, fila...); None se nao responder a tempo
+        try:
+            with socket.create_connection((ip, porta), timeout=timeout) as s:
+                s.sendall(self.criar_requisicao_http("/status", ip).encode())
+                resposta = bytearray()
+                while True:
+                    dados = s.recv(65536)
+                    if not dados:
+                        break
+                    resposta += dados
+            status = json.loads(bytes(resposta).partition(b'\r\n\r\n')[2])
+        except (OSError, ValueError):
+            return None
+        return {chave: status[chave] for chave in self.CAMPOS_STATUS_SOAK if chave in status}
+
+    def executar_teste_soak(self, ip, porta, num_threads, duracao, arquivo_janelas, janela=1.0, conexoes='nova',
+                            cenario=None, amostrar_status=True):
+        """Teste de longa duracao (soak) em malha fechada com serie temporal por janela.
+
+        As threads repetem requisicoes ate o fim da duracao. A cada janela (1s por padrao) o
+        throughput, as falhas e os percentis das requisicoes concluidas nela sao gravados
+        como uma linha em arquivo_janelas (JSON Lines), junto com uma amostra do /status do
+        servidor. A memoria fica constante, nao importa quanto dure o teste.
+        """
+        if conexoes not in ('nova', 'pool'):
+            raise ValueError(f"Modo de conexoes invalido: {conexoes}")
+        pool = PoolConexoes(num_threads, self.max_requisicoes_conexao) if conexoes == 'pool' else None
+
+        print(f"Teste Servidor {ip}:{porta} - soak com {num_threads} threads por {duracao}s, janelas de {janela}s"
+              f"{' (conexões keep-alive)' if conexoes == 'pool' else ''}")
+
+        fases = {'lock': threading.Lock(), 'histogramas': self.novas_fases()}
+
+        def thread_trabalhadora(id_thread):
+            # Fases so vao para o total do teste: ficam na thread e sao juntadas uma vez no final
+            fases_thread = self.novas_fases()
+            rng = cenario.rng_usuario(id_thread) if cenario else None
+            i = 0
+            while time.perf_counter() < prazo:
+                metodo, caminho, corpo = self.proxima_requisicao(i, cenario, rng)
+                if pool is not None:
+                    tempo, status, sucesso = self.medir_requisicao_pool(ip, porta, pool, caminho, fases_thread,
+                                                                        metodo, corpo)
+                else:
+                    tempo, status, sucesso = self.medir_requisicao(ip, porta, caminho, fases_thread, metodo, corpo)
+                janelas.registrar(time.perf_counter(), tempo, sucesso)
+                if cenario is not None:
+                    pausa = cenario.tempo_pensar(rng)
+                    if pausa:
+                        time.sleep(pausa)
+                i += 1
+            with fases['lock']:
+                self.juntar_fases(fases['histogramas'], fases_thread)
+
+        with open(arquivo_janelas, 'w', encoding='utf-8') as arquivo:
+            inicio_teste = time.perf_counter()
+            prazo = inicio_teste + duracao
+            janelas = JanelasLatencia(arquivo, inicio_teste, janela)
+            threads = [threading.Thread(target=thread_trabalhadora, args=(i + 1,), daemon=True)
+                       for i in range(num_threads)]
+            for thread in threads:
+                thread.start()
+
+            # A thread principal fecha as janelas: dorme ate a proxima virada, amostra o servidor e grava
+            proxima_virada = 1
+            while any(thread.is_alive() for thread in threads):
+                espera = inicio_teste + proxima_virada * janela - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                status = self.consultar_status(ip, porta, janela / 2) if amostrar_status else None
+                self.mostrar_janelas(janelas.fechar_ate(janelas.indice(time.perf_counter()), status))
+                proxima_virada = janelas.proxima_gravar + 1
+            for thread in threads:
+                thread.join()
+            fim_teste = time.perf_counter()
+            tempo_total = fim_teste - inicio_teste
+            self.mostrar_janelas(janelas.fechar_ate(janelas.indice(fim_teste) + 1, fim=fim_teste))
+
+        if pool is not None:
+            pool.fechar()
+
+        resumo = {
+            'ip': ip,
+            'porta': porta,
+            'modo': 'soak',
+            'duracao_alvo': duracao,
+            'largura_janela': janela,
+            'janelas': janelas.proxima_gravar,
+            'arquivo_janelas': arquivo_janelas,
+            'threads': num_threads,
+            'conexoes': conexoes,
+            'total_requisicoes': janelas.total.contagem
+        }
+        resumo.update(self.resumir_histograma(janelas.total, janelas.sucessos, janelas.total.contagem, tempo_total,
+                                              fases['histogramas']))
+        if pool is not None:
+            resumo['pool'] = pool.estatisticas()
+        return resumo
+
+    def mostrar_janelas(self, linhas):
+        for linha in linhas:
+            threads_servidor = linha.get('servidor', {}).get('active_threads')
+            print(f"  [{linha['inicio']:7.1f}s] {linha['throughput']:8.1f} req/s | falhas {linha['falhas']:4d}"
+                  f" | p50 {linha['p50']:.3f}s | p99 {linha['p99']:.3f}s"
+                  + (f" | threads no servidor {threads_servidor}" if threads_servidor is not None else ""))
+
+    def executar_suite_soak(self, duracao, num_threads=10, janela=1.0, conexoes='nova', cenario=None):
+        print("=" * 70)
+        print("SUITE DE TESTES - SOAK (LONGA DURAÇÃO COM SÉRIE TEMPORAL)")
+        print("=" * 70)
+        print(f"Duração por servidor: {duracao}s | Threads: {num_threads} | Janela: {janela}s")
+        print("=" * 70)
+
+        resultados = {
+            'metadata': {
+                'matricula': '20229043792',
+                'nome': 'Victor Rodrigues Luz',
+                'data_testes': datetime.now().isoformat(),
+                'custom_id': self.id_personalizado,
+                'configuracao': 'soak_serie_temporal',
+                'duracao': duracao,
+                'threads': num_threads,
+                'largura_janela': janela,
+                'conexoes': conexoes,
+                'cenario_carga': cenario.para_dict() if cenario is not None else None
+            },
+            'servidores': {}
+        }
+
+        os.makedirs('resultados', exist_ok=True)
+        for servidor in self.SERVIDORES:
+            print(f"\n--- SERVIDOR {servidor['nome'].upper()} ---")
+            resultados['servidores'][servidor['nome']] = self.executar_teste_soak(
+                servidor['ip'], servidor['porta'], num_threads, duracao,
+                f"resultados/soak_{servidor['nome']}.jsonl", janela, conexoes, cenario)
+            time.sleep(1)
+
+        with open('resultados/metricas_soak.json', 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+        return resultados
     
-    def executar_suite_comparativa_servidores(self, num_execucoes=10):
+    def avaliar_slo(self, ponto, slo_p99, slo_erros):
+        # Retorna o motivo da violacao do SLO, ou None se a taxa foi atendida
+        taxa_erros = 100 - ponto['taxa_sucesso']
+        if taxa_erros > slo_erros:
+            return f"erros {taxa_erros:.2f}% > {slo_erros}%"
+        if ponto['p99'] > slo_p99:
+            return f"p99 {ponto['p99'] * 1000:.1f}ms > {slo_p99 * 1000:.0f}ms"
+        if ponto['throughput'] < 0.9 * ponto['taxa_oferecida']:
+            return f"obtido {ponto['throughput']:.1f} req/s < 90% dos {ponto['taxa_oferecida']:.1f} req/s oferecidos"
+        return None
+
+    def buscar_capacidade(self, ip, porta, slo_p99=0.2, slo_erros=0.1, taxa_inicial=10, taxa_maxima=10000,
+                          duracao=10, amostras_minimas=2000, precisao=0.05, chegadas='constante'):
+        """Maior taxa (req/s) em malha aberta em que o servidor ainda cumpre o SLO.
+
+        Primeiro dobra a taxa a partir de taxa_inicial ate o SLO falhar (ou chegar em
+        taxa_maxima); depois faz busca binaria entre a ultima taxa atendida e a primeira
+        que falhou ate o intervalo ficar menor que precisao (relativa). Cada passo dura o
+        suficiente para juntar amostras_minimas requisicoes: com menos de ~1000 amostras o
+        p99 e a taxa de erros de 0,1% nao tem significado estatistico.
+        """
+        passos = []
+
+        def medir(taxa, fase):
+            duracao_passo = max(duracao, amostras_minimas / taxa)
+            ponto = self.executar_teste_taxa(ip, porta, taxa, duracao_passo, chegadas)
+            violacao = self.avaliar_slo(ponto, slo_p99, slo_erros)
+            passos.append({
+                'fase': fase,
+                'taxa_alvo': taxa,
+                'duracao': duracao_passo,
+                'amostras': ponto['total_requisicoes'],
+                'throughput': ponto['throughput'],
+                'taxa_sucesso': ponto['taxa_sucesso'],
+                'p50': ponto['p50'],
+                'p99': ponto['p99'],
+                'atraso_envio_maximo': ponto['atraso_envio_maximo'],
+                'atende_slo': violacao is None,
+                'violacao': violacao
+            })
+            print(f"  [{fase:6}] {taxa:9.1f} req/s | obtido {ponto['throughput']:9.1f} req/s | p99 {ponto['p99'] * 1000:8.1f}ms"
+                  f" | sucesso {ponto['taxa_sucesso']:6.2f}% | {'OK' if violacao is None else violacao}")
+            # Folga para o servidor esvaziar filas e backlog antes do proximo passo
+            time.sleep(1 if violacao is None else 3)
+            return violacao is None
+
+        atendida, falhou = None, None
+        taxa = taxa_inicial
+        while taxa <= taxa_maxima:
+            if not medir(taxa, 'subida'):
+                falhou = taxa
+                break
+            atendida = taxa
+            taxa *= 2
+
+        if atendida is not None and falhou is not None:
+            while (falhou - atendida) / atendida > precisao:
+                meio = (atendida + falhou) / 2
+                if medir(meio, 'busca'):
+                    atendida = meio
+                else:
+                    falhou = meio
+
+        return {
+            'ip': ip,
+            'porta': porta,
+            'capacidade': atendida,
+            'primeira_falha': falhou,
+            'limitado_por_taxa_maxima': falhou is None,
+            'slo': {'p99': slo_p99, 'taxa_erros': slo_erros},
+            'passos': passos
+        }
+
+    def executar_suite_capacidade(self, slo_p99=0.2, slo_erros=0.1, arquivo_resultados='resultados/capacidade.jsonl',
+                                  **parametros):
+        print("=" * 70)
+        print("SUITE DE TESTES - BUSCA DE CAPACIDADE SOB SLO")
+        print("=" * 70)
+        print(f"SLO: p99 < {slo_p99 * 1000:.0f}ms e erros < {slo_erros}%")
+        print("=" * 70)
+
+        arquivo = ArquivoResultados(arquivo_resultados)
+        arquivo.iniciar_suite({
+            'matricula': '20229043792',
+            'nome': 'Victor Rodrigues Luz',
+            'data_testes': datetime.now().isoformat(),
+            'custom_id': self.id_personalizado,
+            'configuracao': 'busca_capacidade_slo',
+            'slo': {'p99': slo_p99, 'taxa_erros': slo_erros},
+            'parametros': parametros
+        })
+
+        capacidades = {}
+        for servidor in self.SERVIDORES:
+            print(f"\n--- SERVIDOR {servidor['nome'].upper()} ---")
+            resultado = self.buscar_capacidade(servidor['ip'], servidor['porta'], slo_p99, slo_erros, **parametros)
+            arquivo.escrever({'tipo': 'capacidade', 'suite': arquivo.suite, 'servidor': servidor['nome'], **resultado})
+            capacidades[servidor['nome']] = resultado['capacidade']
+            if resultado['capacidade'] is None:
+                print("  Capacidade: SLO violado já na taxa inicial")
+            else:
+                print(f"  Capacidade: {resultado['capacidade']:.1f} req/s"
+                      f"{' (limite da busca, não do servidor)' if resultado['limitado_por_taxa_maxima'] else ''}")
+        arquivo.finalizar()
+
+        return capacidades
+
+    def executar_suite_comparativa_servidores(self, num_execucoes=10, gerador='threads', coordenador=None,
+                                              conexoes='nova', cenarios_carga=None, servidores=None,
+                                              arquivo_resultados='resultados/metricas_completas.jsonl'):
         print("=" * 70)
         print("SUITE DE TESTES - COMPARAÇÃO SERVIDORES SEQUENCIAL vs CONCORRENTE")
         print("=" * 70)
@@ -113,63 +947,108 @@ Connection: close\r
         print("IPs baseados na matrícula 20229043792 → 3792")
         print("Servidor Sequencial: 37.92.0.10:80")
         print("Servidor Concorrente: 37.92.0.11:80")
+        print("Servidor Assincrono: 37.92.0.12:80")
         print("=" * 70)
         
-        resultados = {
-            'metadata': {
-                'matricula': '20229043792',
-                'nome': 'Victor Rodrigues Luz',
-                'data_testes': datetime.now().isoformat(),
-                'num_execucoes': num_execucoes,
-                'custom_id': self.id_personalizado,
-                'configuracao': 'comparacao_servidores_sequencial_vs_concorrente',
-                'metricas': ['throughput', 'tempo_medio', 'taxa_sucesso', 'desvio_padrao']
-            },
-            'cenarios': {}
+        metadata = {
+            'matricula': '20229043792',
+            'nome': 'Victor Rodrigues Luz',
+            'data_testes': datetime.now().isoformat(),
+            'num_execucoes': num_execucoes,
+            'custom_id': self.id_personalizado,
+            'configuracao': 'comparacao_servidores_sequencial_vs_concorrente',
+            'gerador': gerador,
+            'geradores_carga': len(coordenador.participantes) if coordenador else 1,
+            'conexoes': conexoes,
+            'metricas': ['throughput', 'tempo_medio', 'taxa_sucesso', 'desvio_padrao']
         }
+        if cenarios_carga:
+            metadata['cenarios_carga'] = [cenario.para_dict() for cenario in cenarios_carga]
         
         cenarios = [
             {'nome': 'carga_baixa', 'threads': 1, 'reqs_por_thread': 10},
             {'nome': 'carga_media', 'threads': 5, 'reqs_por_thread': 4},
             {'nome': 'carga_alta', 'threads': 10, 'reqs_por_thread': 3}
         ]
+        if gerador == 'asyncio':
+            # So o gerador asyncio sustenta esse numero de conexoes simultaneas num processo
+            cenarios.append({'nome': 'carga_extrema', 'threads': 1000, 'reqs_por_thread': 10})
+
+        # 'pool' troca os cenarios por versoes keep-alive; 'ambos' roda cada cenario dos dois jeitos, lado a lado
+        if conexoes not in ('nova', 'pool', 'ambos'):
+            raise ValueError(f"Modo de conexoes invalido: {conexoes}")
+        if conexoes != 'nova' and gerador == 'asyncio':
+            raise ValueError("O pool de conexoes keep-alive so existe no gerador com threads")
+        cenarios_conexoes = []
+        for cenario in cenarios:
+            if conexoes in ('nova', 'ambos'):
+                cenarios_conexoes.append(dict(cenario, conexoes='nova'))
+            if conexoes in ('pool', 'ambos'):
+                cenarios_conexoes.append(dict(cenario, nome=f"{cenario['nome']}_keepalive", conexoes='pool'))
+        cenarios = cenarios_conexoes
+
+        if cenarios_carga:
+            # Cenarios vindos de arquivo (cenariosCarga) substituem os fixos; cada um traz seu modo de conexao
+            cenarios = [{'nome': carga.nome, 'threads': carga.usuarios, 'reqs_por_thread': carga.requisicoes_por_usuario,
+                         'conexoes': carga.conexoes, 'carga': carga} for carga in cenarios_carga]
+            if gerador == 'asyncio' and any(cenario['conexoes'] != 'nova' for cenario in cenarios):
+                raise ValueError("O pool de conexoes keep-alive so existe no gerador com threads")
+
+        if coordenador is not None:
+            # Cada teste e dividido entre os geradores conectados ao coordenador
+            executar_teste = functools.partial(coordenador.executar_teste, gerador=gerador)
+        elif gerador == 'asyncio':
+            executar_teste = lambda ip, porta, usuarios, reqs, conexoes, cenario: self.executar_teste_servidor_async(
+                ip, porta, usuarios, reqs, cenario)
+        else:
+            executar_teste = self.executar_teste_servidor
         
-        servidores = [
-            {'nome': 'sequencial', 'ip': '37.92.0.10', 'porta': 80},
-            {'nome': 'concorrente', 'ip': '37.92.0.11', 'porta': 80}
-        ]
+        if servidores is None:
+            servidores = self.SERVIDORES
+        else:
+            servidores = [servidor for servidor in self.SERVIDORES if servidor['nome'] in servidores]
+        
+        # Cada execucao vai para o arquivo assim que termina; nada se acumula na memoria
+        arquivo = ArquivoResultados(arquivo_resultados)
+        arquivo.iniciar_suite(metadata)
         
         for cenario in cenarios:
             nome_cenario = cenario['nome']
-            resultados['cenarios'][nome_cenario] = {}
             
             print(f"\n{'='*50}")
             print(f"CENÁRIO: {nome_cenario.upper().replace('_', ' ')}")
-            print(f"Threads: {cenario['threads']}, Reqs/thread: {cenario['reqs_por_thread']}")
-            print(f"Total: {cenario['threads'] * cenario['reqs_por_thread']} requisições")
+            carga = cenario.get('carga')
+            print(f"Threads: {cenario['threads']}, Reqs/thread: {cenario['reqs_por_thread'] or '-'}, "
+                  f"Conexões: {'keep-alive (pool)' if cenario['conexoes'] == 'pool' else 'nova por requisição'}")
+            if carga is not None and carga.duracao is not None:
+                print(f"Duração: {carga.duracao}s, rampa: {carga.rampa}s")
+            else:
+                print(f"Total: {cenario['threads'] * cenario['reqs_por_thread']} requisições")
+            if carga is not None:
+                print("Mix: " + ", ".join(f"{endpoint.chave()} ({endpoint.peso})" for endpoint in carga.mix))
             print(f"{'='*50}")
             
             for servidor in servidores:
+                if carga is not None and carga.servidores is not None and servidor['nome'] not in carga.servidores:
+                    # Ex.: cenarios com /heavy ou /api/batch, que o sequencial nao tem
+                    continue
                 print(f"\n--- SERVIDOR {servidor['nome'].upper()} ---")
                 
-                resultados_servidor = []
-                
                 for execucao in range(num_execucoes):
                     print(f"Execução {execucao + 1}/{num_execucoes}")
                     
-                    resultado = self.executar_teste_servidor(
+                    resultado = executar_teste(
                         servidor['ip'], servidor['porta'],
-                        cenario['threads'], cenario['reqs_por_thread']
+                        cenario['threads'], cenario['reqs_por_thread'], conexoes=cenario['conexoes'],
+                        cenario=carga
                     )
-                    resultados_servidor.append(resultado)
+                    arquivo.registrar_execucao(nome_cenario, servidor['nome'], execucao + 1, resultado)
                     time.sleep(0.5)
-                
-                resultados['cenarios'][nome_cenario][servidor['nome']] = resultados_servidor
         
-        os.makedirs('resultados', exist_ok=True)
-        with open('resultados/metricas_completas.json', 'w', encoding='utf-8') as f:
-            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        arquivo.finalizar()
         
+        # O relatorio relê o arquivo guardando so os campos que usa
+        resultados = carregar_resultados(arquivo_resultados, campos=self.CAMPOS_RELATORIO, suite=arquivo.suite)
         self.gerar_relatorio_comparativo_servidores(resultados)
         
         return resultados
@@ -194,12 +1073,73 @@ Connection: close\r
                 print(f"  | Consistencia: {consistencia:6.4f}s")
 
 if __name__ == "__main__":
-    cliente = ClienteTestesServidores()
-    resultados = cliente.executar_suite_comparativa_servidores(num_execucoes=10)
+    from cargaDistribuida import CoordenadorCarga, participar
+    from cenariosCarga import carregar_arquivo_cenarios
+
+    cliente = ClienteTestesServidores(max_requisicoes_conexao=int(os.environ.get('MAX_REQUISICOES_CONEXAO', '100')))
+    if os.environ.get('MODO_CARGA', 'fechado') == 'soak':
+        # CENARIOS opcional: usa o mix e o think time do primeiro cenario do arquivo
+        cenario_soak = carregar_arquivo_cenarios(os.environ['CENARIOS'])[1][0] if os.environ.get('CENARIOS') else None
+        cliente.executar_suite_soak(float(os.environ.get('DURACAO', '300')),
+                                    num_threads=int(os.environ.get('USUARIOS', '10')),
+                                    janela=float(os.environ.get('JANELA', '1')),
+                                    conexoes=os.environ.get('CONEXOES', 'nova'),
+                                    cenario=cenario_soak)
+        print("Resultados salvos em: resultados/metricas_soak.json e resultados/soak_<servidor>.jsonl")
+        raise SystemExit(0)
+    if os.environ.get('MODO_CARGA', 'fechado') == 'capacidade':
+        cliente.executar_suite_capacidade(slo_p99=float(os.environ.get('SLO_P99_MS', '200')) / 1000,
+                                          slo_erros=float(os.environ.get('SLO_ERROS', '0.1')),
+                                          taxa_inicial=float(os.environ.get('TAXA_INICIAL', '10')),
+                                          taxa_maxima=float(os.environ.get('TAXA_MAXIMA', '10000')),
+                                          duracao=float(os.environ.get('DURACAO', '10')),
+                                          amostras_minimas=int(os.environ.get('AMOSTRAS_MINIMAS', '2000')),
+                                          precisao=float(os.environ.get('PRECISAO', '0.05')),
+                                          chegadas=os.environ.get('CHEGADAS', 'constante'))
+        print("Resultados salvos em: resultados/capacidade.jsonl")
+        raise SystemExit(0)
+    if os.environ.get('MODO_CARGA', 'fechado') == 'aberto':
+        taxas = [float(taxa) for taxa in os.environ.get('TAXAS', '5,10,20,50,100,200').split(',')]
+        cliente.executar_suite_carga_aberta(taxas, duracao=float(os.environ.get('DURACAO', '10')),
+                                            chegadas=os.environ.get('CHEGADAS', 'constante'))
+        print("Resultados salvos em: resultados/metricas_carga_aberta.json")
+        raise SystemExit(0)
+
+    porta_coordenacao = int(os.environ.get('PORTA_COORDENACAO', '9000'))
+    if os.environ.get('PAPEL_CLIENTE', 'coordenador') == 'participante':
+        # Container extra de carga: so gera a parte dele e devolve as amostras ao coordenador
+        participar(os.environ.get('COORDENADOR', '37.92.0.100'), porta_coordenacao)
+        raise SystemExit(0)
+
+    # CENARIOS=<arquivo .json/.yaml> troca os cenarios fixos pelos do arquivo
+    num_execucoes, cenarios_carga, servidores = 10, None, None
+    if os.environ.get('CENARIOS'):
+        configuracao, cenarios_carga = carregar_arquivo_cenarios(os.environ['CENARIOS'])
+        num_execucoes, servidores = configuracao['execucoes'], configuracao['servidores']
+        print(f"Cenários de {configuracao['nome']}: {', '.join(cenario.nome for cenario in cenarios_carga)}")
+
+    coordenador = None
+    participantes = int(os.environ.get('PARTICIPANTES', '0'))
+    processos_locais = int(os.environ.get('PROCESSOS_CLIENTE', '0'))
+    if participantes or processos_locais:
+        coordenador = CoordenadorCarga(cliente, participantes, porta=porta_coordenacao,
+                                       processos_locais=processos_locais)
+        coordenador.aguardar_participantes()
+
+    try:
+        resultados = cliente.executar_suite_comparativa_servidores(num_execucoes=num_execucoes,
+                                                                   gerador=os.environ.get('GERADOR', 'threads'),
+                                                                   coordenador=coordenador,
+                                                                   conexoes=os.environ.get('CONEXOES', 'nova'),
+                                                                   cenarios_carga=cenarios_carga,
+                                                                   servidores=servidores)
+    finally:
+        if coordenador is not None:
+            coordenador.encerrar()
     
     print("\n" + "=" * 70)
     print(" SUITE DE TESTES concluida!")
     print("=" * 70)
-    print("Resultados salvs em: resultados/metricas_completas.json")
+    print("Resultados salvs em: resultados/metricas_completas.jsonl")
     print("Analise focada na comparacao: Servidor Sequencial vs Concorrente")
     print("=" * 70)
\ No newline at end of file
@@ -0,0 +1,22 @@
+import itertools
+
+
+class ContadorRequisicoes:
+    """Numera requisicoes sem lock nenhum, nem por requisicao nem por thread.
+
+    Os numeros saem de um itertools.count: next() roda inteiro em C com o GIL, entao
+    cada chamada devolve um numero unico e crescente sem precisar de lock. O total (para
+    /status e /info) e o proximo numero que o count daria menos um, lido do repr ("count(N)"),
+    que mostra o estado sem consumir um numero. Assim nao ha registro por thread: no modo
+    thread, com uma thread por conexao, nada e alocado nem travado ao criar a thread.
+    """
+
+    def __init__(self, inicio=0):
+        self.numeros = itertools.count(inicio + 1)
+
+    def proximo(self):
+        return next(self.numeros)
+
+    def total(self):
+        # repr(count(N)) == "count(N)": N e o proximo numero, entao N - 1 ja foram entregues
+        return int(repr(self.numeros)[len('count('):-1]) - 1
@@ -0,0 +1,70 @@
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+class FilaPesadaCheia(Exception):
+    """O executor de rotas pesadas ja tem trabalho demais; a requisicao deve receber 503"""
+
+
+class ExecutorPesado:
+    """Executor separado para o processamento das rotas pesadas (/heavy, /api/batch).
+
+    Tem tamanho proprio e fila limitada: no maximo num_trabalhadores tarefas rodando e
+    tamanho_fila esperando. Acima disso submeter() levanta FilaPesadaCheia em vez de
+    enfileirar, assim rotas pesadas nunca acumulam trabalho sem limite.
+    """
+
+    def __init__(self, num_trabalhadores=4, tamanho_fila=16, tipo='thread'):
+        if tipo == 'thread':
+            self.executor = ThreadPoolExecutor(num_trabalhadores, thread_name_prefix='Pesado')
+        elif tipo == 'processo':
+            # So funcoes e argumentos serializaveis (ex.: time.sleep) podem ir para outro processo.
+            # forkserver evita dar fork no servidor com threads de conexao segurando locks
+            self.executor = ProcessPoolExecutor(num_trabalhadores,
+                                                mp_context=multiprocessing.get_context('forkserver'))
+        else:
+            raise ValueError(f"Tipo de executor invalido: {tipo}")
+        self.tipo = tipo
+        self.num_trabalhadores = num_trabalhadores
+        self.tamanho_fila = tamanho_fila
+        self.pendentes = 0
+        self.rejeitadas = 0
+        self.concluidas = 0
+        self.lock = threading.Lock()
+
+    def submeter(self, funcao, *args):
+        with self.lock:
+            if self.pendentes >= self.num_trabalhadores + self.tamanho_fila:
+                self.rejeitadas += 1
+                raise FilaPesadaCheia()
+            self.pendentes += 1
+        try:
+            futuro = self.executor.submit(funcao, *args)
+        except BaseException:
+            with self.lock:
+                self.pendentes -= 1
+            raise
+        futuro.add_done_callback(self.tarefa_concluida)
+        return futuro
+
+    def tarefa_concluida(self, futuro):
+        with self.lock:
+            self.pendentes -= 1
+            self.concluidas += 1
+
+    def estatisticas(self):
+        with self.lock:
+            pendentes = self.pendentes
+            return {
+                "executor": self.tipo,
+                "workers": self.num_trabalhadores,
+                "running": min(pendentes, self.num_trabalhadores),
+                "queued": max(0, pendentes - self.num_trabalhadores),
+                "queue_limit": self.tamanho_fila,
+                "completed": self.concluidas,
+                "rejected": self.rejeitadas
+            }
+
+    def encerrar(self):
+        self.executor.shutdown(wait=False)
@@ -1,17 +1,20 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
-import json
 import os
 import pandas as pd
 from scipy import stats
+from arquivoResultados import carregar_resultados
 
 
 os.makedirs('graficos_relatorio', exist_ok=True)
 
 
-with open('resultados/metricas_completas.json', 'r') as f:
-    dados = json.load(f)
+# Lê os resultados linha a linha guardando só os campos dos gráficos; o .json antigo ainda é aceito
+arquivo_resultados = 'resultados/metricas_completas.jsonl'
+if not os.path.exists(arquivo_resultados):
+    arquivo_resultados = 'resultados/metricas_completas.json'
+dados = carregar_resultados(arquivo_resultados, campos=('throughput', 'tempo_medio', 'taxa_sucesso'))
 
 
 plt.style.use('default')
@@ -89,14 +92,15 @@ print("Gerando gráficos 7-9: Evolução do Throughput por Cenário")
 for i, cenario in enumerate(cenarios):
     fig, ax = plt.subplots(figsize=(10, 6))
     
-    execucoes = range(1, 11)
-    
     seq_throughputs = [run['throughput'] for run in dados['cenarios'][cenario]['sequencial']]
     conc_throughputs = [run['throughput'] for run in dados['cenarios'][cenario]['concorrente']]
     
+    # Uma suíte interrompida pode ter menos execuções gravadas
+    execucoes = range(1, len(seq_throughputs) + 1)
+    
     ax.plot(execucoes, seq_throughputs, marker='o', linewidth=2, 
             label='Sequencial', color=cores[0])
-    ax.plot(execucoes, conc_throughputs, marker='s', linewidth=2, 
+    ax.plot(range(1, len(conc_throughputs) + 1), conc_throughputs, marker='s', linewidth=2, 
             label='Concorrente', color=cores[1])
     
     ax.set_title(f'Evolução do Throughput - {titulos[i]}', fontsize=14, fontweight='bold')
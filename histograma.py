@@ -0,0 +1,125 @@
+import math
+
+
+class HistogramaLatencia:
+    """Histograma de latencias com baldes logaritmicos (no estilo do HdrHistogram).
+
+    Valores sao guardados em microssegundos. Ate 2**BITS_SUB us cada valor tem balde
+    proprio; acima disso cada potencia de 2 e dividida em 2**(BITS_SUB - 1) baldes, o que
+    mantem o erro relativo abaixo de 1/2**(BITS_SUB - 1) (~1,6%) em qualquer escala.
+    Registrar e O(1) e a memoria so depende da faixa de valores, nao do numero de amostras.
+    Nao e thread-safe: cada thread usa o seu e no final eles sao juntados com juntar().
+    """
+
+    BITS_SUB = 7
+    SUB_BALDES = 1 << BITS_SUB
+    METADE = SUB_BALDES >> 1
+
+    def __init__(self):
+        self.baldes = {}
+        self.contagem = 0
+        self.soma = 0.0
+        self.soma_quadrados = 0.0
+        self.minimo = None
+        self.maximo = None
+
+    def indice(self, microssegundos):
+        if microssegundos < self.SUB_BALDES:
+            return microssegundos
+        expoente = microssegundos.bit_length() - self.BITS_SUB
+        return self.SUB_BALDES + (expoente - 1) * self.METADE + (microssegundos >> expoente) - self.METADE
+
+    def valor_balde(self, indice):
+        # Valor representativo (meio do balde) em microssegundos
+        if indice < self.SUB_BALDES:
+            return indice
+        expoente, deslocamento = divmod(indice - self.SUB_BALDES, self.METADE)
+        expoente += 1
+        inicio = (deslocamento + self.METADE) << expoente
+        return inicio + ((1 << expoente) - 1) / 2
+
+    def registrar(self, segundos):
+        microssegundos = max(0, int(segundos * 1_000_000))
+        indice = self.indice(microssegundos)
+        self.baldes[indice] = self.baldes.get(indice, 0) + 1
+        self.contagem += 1
+        self.soma += segundos
+        self.soma_quadrados += segundos * segundos
+        if self.minimo is None or segundos < self.minimo:
+            self.minimo = segundos
+        if self.maximo is None or segundos > self.maximo:
+            self.maximo = segundos
+
+    def juntar(self, outro):
+        for indice, quantidade in outro.baldes.items():
+            self.baldes[indice] = self.baldes.get(indice, 0) + quantidade
+        self.contagem += outro.contagem
+        self.soma += outro.soma
+        self.soma_quadrados += outro.soma_quadrados
+        if outro.minimo is not None and (self.minimo is None or outro.minimo < self.minimo):
+            self.minimo = outro.minimo
+        if outro.maximo is not None and (self.maximo is None or outro.maximo > self.maximo):
+            self.maximo = outro.maximo
+        return self
+
+    def percentil(self, p):
+        if not self.contagem:
+            return 0
+        alvo = max(1, math.ceil(p / 100 * self.contagem))
+        acumulado = 0
+        for indice in sorted(self.baldes):
+            acumulado += self.baldes[indice]
+            if acumulado >= alvo:
+                # O balde pode passar dos extremos reais; o valor fica limitado a eles
+                return min(max(self.valor_balde(indice) / 1_000_000, self.minimo), self.maximo)
+        return self.maximo
+
+    def media(self):
+        return self.soma / self.contagem if self.contagem else 0
+
+    def desvio_padrao(self):
+        if self.contagem < 2:
+            return 0
+        variancia = (self.soma_quadrados - self.soma * self.soma / self.contagem) / (self.contagem - 1)
+        return math.sqrt(max(0.0, variancia))
+
+    def resumo(self):
+        return {
+            'p50': self.percentil(50),
+            'p90': self.percentil(90),
+            'p99': self.percentil(99),
+            'p99_9': self.percentil(99.9),
+            'max': self.maximo or 0
+        }
+
+    def para_dict(self):
+        return {
+            'unidade_baldes': 'us',
+            'bits_sub': self.BITS_SUB,
+            'contagem': self.contagem,
+            'soma': self.soma,
+            'soma_quadrados': self.soma_quadrados,
+            'minimo': self.minimo,
+            'maximo': self.maximo,
+            'baldes': sorted(self.baldes.items())
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        if dados.get('bits_sub', cls.BITS_SUB) != cls.BITS_SUB:
+            raise ValueError(f"Histograma com bits_sub={dados['bits_sub']} nao pode ser juntado a {cls.BITS_SUB}")
+        histograma = cls()
+        histograma.baldes = {int(indice): quantidade for indice, quantidade in dados['baldes']}
+        histograma.contagem = dados['contagem']
+        histograma.soma = dados['soma']
+        histograma.soma_quadrados = dados['soma_quadrados']
+        histograma.minimo = dados['minimo']
+        histograma.maximo = dados['maximo']
+        return histograma
+
+    @classmethod
+    def juntar_todos(cls, histogramas):
+        total = cls()
+        for histograma in histogramas:
+            total.juntar(histograma)
+        return total
@@ -0,0 +1,78 @@
+import json
+import threading
+
+from histograma import HistogramaLatencia
+
+
+class JanelasLatencia:
+    """Serie temporal de throughput, erros e percentis em janelas fixas (1s por padrao).
+
+    Cada requisicao entra na janela em que terminou. As janelas fechadas sao gravadas
+    como uma linha JSON no arquivo e descartadas, entao a memoria nao cresce com a
+    duracao do teste: ficam abertas so as janelas ainda em andamento, mais o histograma
+    acumulado do teste inteiro (de tamanho limitado). Janelas sem nenhuma requisicao
+    concluida tambem sao gravadas, com zero, para que travadas do servidor aparecam.
+    """
+
+    def __init__(self, arquivo, inicio, largura=1.0):
+        self.arquivo = arquivo
+        self.inicio = inicio
+        self.largura = largura
+        self.abertas = {}
+        self.proxima_gravar = 0
+        self.total = HistogramaLatencia()
+        self.sucessos = 0
+        self.lock = threading.Lock()
+
+    def indice(self, instante):
+        return int((instante - self.inicio) // self.largura)
+
+    def registrar(self, instante, tempo, sucesso):
+        indice = self.indice(instante)
+        with self.lock:
+            # Uma requisicao que terminou bem na virada pode chegar depois da janela ter sido gravada
+            indice = max(indice, self.proxima_gravar)
+            janela = self.abertas.get(indice)
+            if janela is None:
+                janela = self.abertas[indice] = [HistogramaLatencia(), 0]
+            janela[0].registrar(tempo)
+            if sucesso:
+                janela[1] += 1
+
+    def fechar_ate(self, limite, servidor=None, fim=None):
+        """Grava (em ordem) todas as janelas com indice menor que limite e retorna as linhas gravadas.
+
+        fim: instante em que o teste acabou; a ultima janela costuma ser cortada antes da
+        largura cheia, e o throughput dela usa a largura que de fato teve.
+        """
+        with self.lock:
+            fechadas = []
+            while self.proxima_gravar < limite:
+                fechadas.append((self.proxima_gravar, self.abertas.pop(self.proxima_gravar, None)))
+                self.proxima_gravar += 1
+
+        linhas = []
+        for indice, janela in fechadas:
+            histograma, sucessos = janela if janela is not None else (HistogramaLatencia(), 0)
+            self.total.juntar(histograma)
+            self.sucessos += sucessos
+            largura = self.largura
+            if fim is not None:
+                largura = min(largura, fim - self.inicio - indice * self.largura)
+            linha = {
+                'janela': indice,
+                'inicio': indice * self.largura,
+                'largura': largura,
+                'requisicoes': histograma.contagem,
+                'sucessos': sucessos,
+                'falhas': histograma.contagem - sucessos,
+                'throughput': sucessos / largura if largura > 0 else 0,
+                'media': histograma.media()
+            }
+            linha.update(histograma.resumo())
+            if servidor is not None:
+                linha['servidor'] = servidor
+            self.arquivo.write(json.dumps(linha) + "\n")
+            linhas.append(linha)
+        self.arquivo.flush()
+        return linhas
@@ -0,0 +1,184 @@
+import bisect
+import threading
+
+
+# Rotulo de rota das requisicoes sem rota casada (404, 405, X-Custom-ID invalido) e das
+# que nem chegaram a ser roteadas (400/408/413/431 do parser): o caminho cru nao vira
+# rotulo para que varreduras de URL nao criem uma serie por caminho
+ROTA_SEM_CORRESPONDENCIA = 'unmatched'
+ROTA_INVALIDA = 'invalid'
+
+# Limites (em segundos) dos baldes dos histogramas, como os padroes dos clientes Prometheus
+LIMITES_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICAS = {
+    'http_requests_total': ('counter', 'Requisicoes atendidas por rota, metodo e status'),
+    'http_request_duration_seconds': ('histogram', 'Tempo de atendimento por rota (roteamento, handler e envio)'),
+    'http_requests_in_flight': ('gauge', 'Requisicoes sendo atendidas agora'),
+    'http_received_bytes_total': ('counter', 'Bytes recebidos dos clientes'),
+    'http_sent_bytes_total': ('counter', 'Bytes enviados aos clientes (cabecalhos e corpo)'),
+    'server_queue_wait_seconds': ('histogram', 'Espera da conexao por uma vaga (semaforo no modo thread, fila no modo pool)'),
+}
+
+
+class FragmentoMetricas:
+    """Metricas de uma unica thread: so ela escreve, entao nao ha lock"""
+
+    __slots__ = ('thread', 'contadores', 'histogramas', 'em_andamento')
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.contadores = {}  # (nome, rotulos) -> valor
+        self.histogramas = {}  # (nome, rotulos) -> [balde_0, ..., balde_n, soma]
+        self.em_andamento = 0
+
+    def juntar(self, outro):
+        for chave, valor in outro.contadores.items():
+            self.contadores[chave] = self.contadores.get(chave, 0) + valor
+        for chave, baldes in outro.histogramas.items():
+            atual = self.histogramas.get(chave)
+            if atual is None:
+                self.histogramas[chave] = list(baldes)
+            else:
+                for indice, valor in enumerate(baldes):
+                    atual[indice] += valor
+        self.em_andamento += outro.em_andamento
+
+
+class RegistroMetricas:
+    """Registro de metricas dividido por thread, exportado no formato texto do Prometheus.
+
+    Cada thread grava no seu FragmentoMetricas (threading.local), sem lock no caminho da
+    requisicao; a leitura soma os fragmentos. Fragmentos de threads que ja terminaram
+    (uma por conexao no modo thread) sao somados num fragmento base e descartados, o
+    que mantem a lista pequena. O lock so e usado para criar e consolidar fragmentos.
+    """
+
+    MAX_FRAGMENTOS = 256
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = limites
+        self.local = threading.local()
+        self.fragmentos = []
+        self.base = FragmentoMetricas(None)
+        self.lock = threading.Lock()
+
+    def fragmento(self):
+        try:
+            return self.local.fragmento
+        except AttributeError:
+            fragmento = self.local.fragmento = FragmentoMetricas(threading.current_thread())
+            with self.lock:
+                self.fragmentos.append(fragmento)
+                if len(self.fragmentos) > self.MAX_FRAGMENTOS:
+                    self.consolidar()
+            return fragmento
+
+    def consolidar(self):
+        # Chamado com o lock: uma thread encerrada nao escreve mais no seu fragmento
+        vivos = []
+        for fragmento in self.fragmentos:
+            if fragmento.thread.is_alive():
+                vivos.append(fragmento)
+            else:
+                self.base.juntar(fragmento)
+        self.fragmentos = vivos
+
+    def incrementar(self, nome, rotulos=(), valor=1):
+        contadores = self.fragmento().contadores
+        chave = (nome, rotulos)
+        contadores[chave] = contadores.get(chave, 0) + valor
+
+    def observar(self, nome, valor, rotulos=()):
+        histogramas = self.fragmento().histogramas
+        chave = (nome, rotulos)
+        baldes = histogramas.get(chave)
+        if baldes is None:
+            baldes = histogramas[chave] = [0] * (len(self.limites) + 2)
+        baldes[bisect.bisect_left(self.limites, valor)] += 1
+        baldes[-1] += valor
+
+    def inicio_requisicao(self):
+        self.fragmento().em_andamento += 1
+
+    def fim_requisicao(self, rota, metodo, status, duracao, bytes_enviados):
+        # Uma chamada por requisicao registra contador, histograma e bytes no mesmo fragmento
+        if rota is None:
+            rota = ROTA_SEM_CORRESPONDENCIA
+        fragmento = self.fragmento()
+        fragmento.em_andamento -= 1
+        contadores = fragmento.contadores
+        chave = ('http_requests_total', (('route', rota), ('method', metodo), ('status', str(status))))
+        contadores[chave] = contadores.get(chave, 0) + 1
+        chave = ('http_sent_bytes_total', ())
+        contadores[chave] = contadores.get(chave, 0) + bytes_enviados
+        self.observar('http_request_duration_seconds', duracao, (('route', rota),))
+
+    def requisicao_invalida(self, status, bytes_enviados):
+        # Erro antes do roteamento: conta a resposta, sem histograma de duracao
+        self.incrementar('http_requests_total', (('route', ROTA_INVALIDA), ('method', '-'), ('status', str(status))))
+        self.incrementar('http_sent_bytes_total', valor=bytes_enviados)
+
+    def coletar(self):
+        with self.lock:
+            self.consolidar()
+            total = FragmentoMetricas(None)
+            total.juntar(self.base)
+            fragmentos = list(self.fragmentos)
+        for fragmento in fragmentos:
+            # dict.copy e list() nao soltam o GIL: a copia e consistente mesmo com a thread escrevendo
+            copia = FragmentoMetricas(None)
+            copia.contadores = fragmento.contadores.copy()
+            copia.histogramas = {chave: list(baldes) for chave, baldes in fragmento.histogramas.copy().items()}
+            copia.em_andamento = fragmento.em_andamento
+            total.juntar(copia)
+        return total
+
+    def exportar(self, extras=()):
+        """Texto no formato de exposicao do Prometheus (0.0.4).
+
+        extras: (nome, tipo, ajuda, valor) lidos na hora pelo servidor, como threads ativas,
+        filas e contadores que ja existiam antes do registro.
+        """
+        total = self.coletar()
+        por_nome = {}
+        for (nome, rotulos), valor in total.contadores.items():
+            por_nome.setdefault(nome, []).append((rotulos, valor))
+        histogramas = {}
+        for (nome, rotulos), baldes in total.histogramas.items():
+            histogramas.setdefault(nome, []).append((rotulos, baldes))
+
+        linhas = []
+        for nome, (tipo, ajuda) in METRICAS.items():
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            if nome == 'http_requests_in_flight':
+                linhas.append(f"{nome} {total.em_andamento}")
+            elif tipo == 'histogram':
+                for rotulos, baldes in sorted(histogramas.get(nome, ())):
+                    acumulado = 0
+                    for limite, quantidade in zip(self.limites + (float('inf'),), baldes):
+                        acumulado += quantidade
+                        le = '+Inf' if limite == float('inf') else repr(limite)
+                        linhas.append(f"{nome}_bucket{formatar_rotulos(rotulos + (('le', le),))} {acumulado}")
+                    linhas.append(f"{nome}_sum{formatar_rotulos(rotulos)} {baldes[-1]}")
+                    linhas.append(f"{nome}_count{formatar_rotulos(rotulos)} {acumulado}")
+            else:
+                for rotulos, valor in sorted(por_nome.get(nome, ())):
+                    linhas.append(f"{nome}{formatar_rotulos(rotulos)} {valor}")
+
+        for nome, tipo, ajuda, valor in extras:
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            linhas.append(f"{nome} {valor}")
+        return "\n".join(linhas) + "\n"
+
+
+def formatar_rotulos(rotulos):
+    if not rotulos:
+        return ""
+    partes = []
+    for chave, valor in rotulos:
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{chave}="{valor}"')
+    return "{" + ",".join(partes) + "}"
@@ -0,0 +1,209 @@
+# Resposta provisoria para quem mandou "Expect: 100-continue" e espera o aval antes do corpo
+RESPOSTA_CONTINUE = b'HTTP/1.1 100 Continue\r\n\r\n'
+
+
+class ErroHttp(Exception):
+    """Requisicao invalida; codigo e o status HTTP que deve ser devolvido ao cliente"""
+
+    def __init__(self, codigo, mensagem):
+        super().__init__(mensagem)
+        self.codigo = codigo
+        self.mensagem = mensagem
+
+
+class RequisicaoHttp:
+    __slots__ = ('metodo', 'alvo', 'caminho', 'versao', 'cabecalhos', 'corpo', 'parametros', 'query', 'numero', 'rota')
+
+    def __init__(self, metodo, caminho, versao, cabecalhos, corpo=b''):
+        self.metodo = metodo
+        self.alvo = caminho  # como veio na linha de requisicao, com query string
+        self.caminho = caminho  # o roteador troca pelo caminho sem query
+        self.versao = versao
+        self.cabecalhos = cabecalhos  # nomes em minusculo
+        self.corpo = corpo
+        self.parametros = {}
+        self.query = {}
+        self.numero = 0
+        self.rota = None  # padrao da rota casada (rotulo das metricas), None sem rota
+
+    def texto_corpo(self):
+        return self.corpo.decode('utf-8', errors='ignore')
+
+
+class ParserHttp:
+    """Parser incremental de HTTP/1.x: recebe pedacos com alimentar() e devolve requisicoes completas.
+
+    O estado fica salvo entre leituras, entao cada byte e examinado uma unica vez
+    mesmo quando os cabecalhos chegam em varios recv.
+    """
+
+    CABECALHOS = 0
+    CORPO = 1
+    TAMANHO_CHUNK = 2
+    DADOS_CHUNK = 3
+    TRAILER = 4
+
+    def __init__(self, max_cabecalhos=8192, max_corpo=1024 * 1024):
+        self.max_cabecalhos = max_cabecalhos
+        self.max_corpo = max_corpo
+        self.buffer = bytearray()
+        self.reiniciar_estado()
+
+    def reiniciar_estado(self):
+        self.estado = self.CABECALHOS
+        self.inicio_busca = 0
+        self.requisicao = None
+        self.restante = 0
+        self.corpo = bytearray()
+        self.continuar = False
+
+    def alimentar(self, dados):
+        self.buffer += dados
+
+    def pedir_continuacao(self):
+        """True uma unica vez quando o cliente espera o 100 Continue para mandar o corpo.
+
+        Quem le chama antes de cada recv: se o corpo ja veio junto com os cabecalhos a
+        requisicao sai completa antes, e o 100 nao e enviado.
+        """
+        if not self.continuar:
+            return False
+        self.continuar = False
+        return True
+
+    def pendente(self):
+        """Indica se ha uma requisicao parcialmente recebida"""
+        return bool(self.buffer) or self.estado != self.CABECALHOS
+
+    def proxima_requisicao(self):
+        """Retorna a proxima RequisicaoHttp completa ou None se faltam dados"""
+        while True:
+            if self.estado == self.CABECALHOS:
+                if not self.ler_cabecalhos():
+                    return None
+            elif self.estado == self.CORPO:
+                if len(self.buffer) < self.restante:
+                    return None
+                self.requisicao.corpo = bytes(self.buffer[:self.restante])
+                del self.buffer[:self.restante]
+                return self.concluir()
+            elif self.estado == self.TAMANHO_CHUNK:
+                if not self.ler_tamanho_chunk():
+                    return None
+            elif self.estado == self.DADOS_CHUNK:
+                # dados do chunk + CRLF final
+                if len(self.buffer) < self.restante + 2:
+                    return None
+                if self.buffer[self.restante:self.restante + 2] != b'\r\n':
+                    raise ErroHttp(400, "Chunk sem CRLF no final")
+                self.corpo += memoryview(self.buffer)[:self.restante]
+                del self.buffer[:self.restante + 2]
+                self.estado = self.TAMANHO_CHUNK
+            elif self.estado == self.TRAILER:
+                if not self.ler_trailer():
+                    return None
+                self.requisicao.corpo = bytes(self.corpo)
+                return self.concluir()
+
+    def concluir(self):
+        requisicao = self.requisicao
+        self.reiniciar_estado()
+        return requisicao
+
+    def ler_cabecalhos(self):
+        # Retoma a busca de onde parou (3 bytes antes, caso o CRLFCRLF tenha sido cortado no meio)
+        fim = self.buffer.find(b'\r\n\r\n', max(0, self.inicio_busca - 3))
+        if fim == -1:
+            if len(self.buffer) > self.max_cabecalhos:
+                raise ErroHttp(431, "Cabecalhos muito grandes")
+            self.inicio_busca = len(self.buffer)
+            return False
+        if fim > self.max_cabecalhos:
+            raise ErroHttp(431, "Cabecalhos muito grandes")
+
+        bloco = bytes(memoryview(self.buffer)[:fim])
+        del self.buffer[:fim + 4]
+
+        linhas = bloco.split(b'\r\n')
+        partes = linhas[0].split()
+        if len(partes) != 3 or not partes[2].startswith(b'HTTP/'):
+            raise ErroHttp(400, "Linha de requisicao invalida")
+        metodo, caminho, versao = (parte.decode('latin-1') for parte in partes)
+
+        cabecalhos = {}
+        for linha in linhas[1:]:
+            chave, separador, valor = linha.partition(b':')
+            if not separador:
+                raise ErroHttp(400, "Cabecalho malformado")
+            nome = chave.strip().decode('latin-1').lower()
+            valor = valor.strip().decode('latin-1')
+            # Content-Length repetido com valores diferentes: nao da para saber onde o corpo termina
+            if nome == 'content-length' and cabecalhos.get(nome, valor) != valor:
+                raise ErroHttp(400, "Content-Length duplicado com valores diferentes")
+            cabecalhos[nome] = valor
+
+        self.requisicao = RequisicaoHttp(metodo, caminho, versao, cabecalhos)
+        # So vale depois dos limites abaixo: corpo grande demais recebe 413 sem o 100 Continue
+        espera_continue = versao == 'HTTP/1.1' and cabecalhos.get('expect', '').lower() == '100-continue'
+
+        codificacao = cabecalhos.get('transfer-encoding', '').lower()
+        if codificacao:
+            if 'content-length' in cabecalhos:
+                raise ErroHttp(400, "Content-Length e Transfer-Encoding juntos")
+            if codificacao != 'chunked':
+                raise ErroHttp(501, f"Transfer-Encoding nao suportado: {codificacao}")
+            self.estado = self.TAMANHO_CHUNK
+            self.continuar = espera_continue
+            return True
+
+        try:
+            tamanho = int(cabecalhos.get('content-length', '0'))
+        except ValueError:
+            raise ErroHttp(400, "Content-Length invalido")
+        if tamanho < 0:
+            raise ErroHttp(400, "Content-Length invalido")
+        if tamanho > self.max_corpo:
+            raise ErroHttp(413, "Corpo muito grande")
+
+        self.restante = tamanho
+        self.estado = self.CORPO
+        self.continuar = espera_continue
+        return True
+
+    def ler_tamanho_chunk(self):
+        fim = self.buffer.find(b'\r\n')
+        if fim == -1:
+            if len(self.buffer) > 1024:
+                raise ErroHttp(400, "Linha de chunk invalida")
+            return False
+
+        linha = bytes(memoryview(self.buffer)[:fim]).split(b';', 1)[0].strip()
+        del self.buffer[:fim + 2]
+        try:
+            tamanho = int(linha, 16)
+        except ValueError:
+            raise ErroHttp(400, "Tamanho de chunk invalido")
+        if tamanho < 0:
+            raise ErroHttp(400, "Tamanho de chunk invalido")
+        if len(self.corpo) + tamanho > self.max_corpo:
+            raise ErroHttp(413, "Corpo muito grande")
+
+        if tamanho == 0:
+            self.estado = self.TRAILER
+        else:
+            self.restante = tamanho
+            self.estado = self.DADOS_CHUNK
+        return True
+
+    def ler_trailer(self):
+        # Sem trailers o corpo termina com um CRLF; trailers sao lidos e descartados
+        if self.buffer[:2] == b'\r\n':
+            del self.buffer[:2]
+            return True
+        fim = self.buffer.find(b'\r\n\r\n')
+        if fim == -1:
+            if len(self.buffer) > self.max_cabecalhos:
+                raise ErroHttp(431, "Trailers muito grandes")
+            return False
+        del self.buffer[:fim + 4]
+        return True
@@ -0,0 +1,186 @@
+import json
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+class PerfilAmostragem:
+    """Profiler por amostragem de todas as threads, ligado e desligado com o servidor rodando.
+
+    Uma thread propria le sys._current_frames() a cada 'intervalo' segundos e conta cada
+    pilha. No fim grava o arquivo no formato "collapsed" (uma linha 'raiz;...;folha N'),
+    que flamegraph.pl, speedscope e inferno leem direto. Desligado nao ha hook nenhum, so a
+    thread PerfilSinal parada num Event (quando o SIGUSR1 foi instalado), entao o custo e
+    praticamente zero; ligado, o custo e so o da thread de amostragem, e nao o de
+    instrumentar cada chamada como no cProfile. Threads bloqueadas (recv, accept, semaforo)
+    tambem aparecem, o que mostra onde o tempo e esperado e nao so onde e gasto.
+    """
+
+    def __init__(self, diretorio='resultados', prefixo='perfil', registro=None, duracao=30.0, intervalo=0.01):
+        self.diretorio = diretorio
+        self.prefixo = prefixo
+        self.registro = registro  # RegistroAcesso que recebe o aviso quando o arquivo e gravado
+        self.duracao = duracao  # padroes do SIGUSR1 e do POST /admin/profile/start sem parametros
+        self.intervalo = intervalo
+        self.lock = threading.Lock()
+        self.pedido_sinal = None
+        self.thread = None
+        self.evento_parar = None
+        self.atual = None
+        self.ultimo = None
+        # As threads (amostragem e PerfilSinal) nao sobrevivem ao fork (prefork): o filho recria as suas
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reiniciar_apos_fork)
+
+    def reiniciar_apos_fork(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.evento_parar = None
+        self.atual = None
+        if self.pedido_sinal is not None:
+            # O handler herdado usa self.pedido_sinal: com um Event novo, a thread nova o atende
+            self.pedido_sinal = threading.Event()
+            self.iniciar_thread_sinal()
+
+    def ativo(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def iniciar(self, duracao, intervalo):
+        """Comeca um perfil de 'duracao' segundos; retorna o caminho do arquivo ou None se ja ha um rodando"""
+        with self.lock:
+            if self.ativo():
+                return None
+            caminho = os.path.join(self.diretorio,
+                                   f"{self.prefixo}_{os.getpid()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.folded")
+            self.evento_parar = threading.Event()
+            self.atual = {'arquivo': caminho, 'duracao': duracao, 'intervalo': intervalo,
+                          'inicio': datetime.now().isoformat()}
+            self.thread = threading.Thread(target=self.amostrar, args=(duracao, intervalo, caminho, self.evento_parar),
+                                           name="Perfilador", daemon=True)
+            self.thread.start()
+            return caminho
+
+    def parar(self):
+        with self.lock:
+            if not self.ativo():
+                return False
+            self.evento_parar.set()
+            return True
+
+    def alternar(self):
+        # SIGUSR1: liga se estiver parado, para (e grava o que ja tem) se estiver rodando
+        if not self.parar():
+            self.iniciar(self.duracao, self.intervalo)
+
+    def instalar_sinal(self, sinal=getattr(signal, 'SIGUSR1', None)):
+        """Liga/desliga o perfil com um sinal; retorna False se nao da para instalar o handler.
+
+        O handler so marca o pedido: ele roda na thread principal entre dois bytecodes, talvez
+        com o lock do perfil (ou um lock interno do threading) na mao, entao chamar iniciar()
+        dali poderia travar ou ligar dois amostradores. Quem atende e a thread "PerfilSinal".
+        """
+        # So a thread principal pode instalar handlers (e o sinal nao existe no Windows)
+        if sinal is None or threading.current_thread() is not threading.main_thread():
+            return False
+        if self.pedido_sinal is None:
+            self.pedido_sinal = threading.Event()
+            self.iniciar_thread_sinal()
+        signal.signal(sinal, lambda numero, quadro: self.pedido_sinal.set())
+        return True
+
+    def iniciar_thread_sinal(self):
+        threading.Thread(target=self.atender_sinal, name="PerfilSinal", daemon=True).start()
+
+    def atender_sinal(self):
+        while True:
+            self.pedido_sinal.wait()
+            self.pedido_sinal.clear()
+            self.alternar()
+
+    def amostrar(self, duracao, intervalo, caminho, evento_parar):
+        propria = threading.get_ident()
+        contagens = {}  # (grupo da thread, codigo raiz, ..., codigo folha) -> amostras
+        amostras = 0
+        inicio = time.monotonic()
+        prazo = inicio + duracao
+        while not evento_parar.is_set() and time.monotonic() < prazo:
+            nomes = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, quadro in sys._current_frames().items():
+                if ident == propria:
+                    continue
+                # Guarda os objetos de codigo: o texto de cada quadro so e montado na gravacao
+                codigos = []
+                while quadro is not None:
+                    codigos.append(quadro.f_code)
+                    quadro = quadro.f_back
+                codigos.append(grupo_thread(nomes.get(ident, 'desconhecida')))
+                chave = tuple(reversed(codigos))
+                contagens[chave] = contagens.get(chave, 0) + 1
+            amostras += 1
+            evento_parar.wait(intervalo)
+
+        resumo = {'arquivo': caminho, 'amostras': amostras, 'pilhas': len(contagens),
+                  'segundos': round(time.monotonic() - inicio, 3), 'fim': datetime.now().isoformat()}
+        try:
+            self.gravar(caminho, contagens)
+        except OSError as erro:
+            resumo['erro'] = str(erro)
+        self.ultimo = resumo
+        if self.registro is not None:
+            self.registro.evento('aviso' if 'erro' in resumo else 'info',
+                                 f"Perfil gravado em {caminho}: {amostras} amostras, {len(contagens)} pilhas"
+                                 f"{' (' + resumo['erro'] + ')' if 'erro' in resumo else ''}")
+
+    def gravar(self, caminho, contagens):
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        rotulos = {}
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            for chave, quantidade in sorted(contagens.items(), key=lambda item: -item[1]):
+                partes = [chave[0]]
+                for codigo in chave[1:]:
+                    rotulo = rotulos.get(codigo)
+                    if rotulo is None:
+                        rotulo = rotulos[codigo] = rotulo_codigo(codigo)
+                    partes.append(rotulo)
+                arquivo.write(f"{';'.join(partes)} {quantidade}\n")
+
+    def estado(self):
+        return {'active': self.ativo(), 'current': self.atual if self.ativo() else None, 'last': self.ultimo}
+
+    def responder(self, caminho, query):
+        """Atende GET /admin/profile e POST /admin/profile/{start,stop}; retorna (status, corpo JSON)"""
+        if caminho.endswith('/start'):
+            return self.responder_iniciar(query)
+        if caminho.endswith('/stop'):
+            if not self.parar():
+                return 409, json.dumps({"error": "nenhum perfil em andamento"})
+            return 200, json.dumps({"status": "stopping", **self.estado()}, indent=2)
+        return 200, json.dumps(self.estado(), indent=2)
+
+    def responder_iniciar(self, query):
+        # ?seconds=N (ate 600) e ?interval_ms=M; sem eles valem os padroes do servidor
+        try:
+            segundos = float(query.get('seconds', [self.duracao])[0])
+            intervalo = float(query.get('interval_ms', [self.intervalo * 1000])[0]) / 1000
+        except ValueError:
+            return 400, json.dumps({"error": "seconds e interval_ms devem ser numeros"})
+        if not 0 < segundos <= 600 or not 0.001 <= intervalo <= 1:
+            return 400, json.dumps({"error": "seconds em (0, 600], interval_ms em [1, 1000]"})
+        arquivo = self.iniciar(segundos, intervalo)
+        if arquivo is None:
+            return 409, json.dumps({"error": "perfil ja em andamento", **self.estado()}, indent=2)
+        return 200, json.dumps({"status": "started", "file": arquivo, "seconds": segundos,
+                                "interval_ms": intervalo * 1000}, indent=2)
+
+
+def grupo_thread(nome):
+    # "Thread-12 (processar_cliente)" e "Worker-3" viram um grupo so por tipo de thread
+    return re.sub(r'-\d+', '', nome).replace(';', ',')
+
+
+def rotulo_codigo(codigo):
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})".replace(';', ',')
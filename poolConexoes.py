@@ -0,0 +1,121 @@
+import collections
+import select
+import socket
+import threading
+import time
+
+
+class ConexaoPersistente:
+    __slots__ = ('destino', 'socket', 'requisicoes', 'expira_em')
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.socket = None  # None ate o conectar(); assim quem chama consegue medir o connect
+        self.requisicoes = 0
+        self.expira_em = None
+
+    def reusada(self):
+        return self.requisicoes > 0
+
+
+class PoolConexoes:
+    """Pool de conexoes keep-alive por destino (ip, porta), compartilhado entre threads.
+
+    No maximo max_por_destino conexoes (ociosas + em uso) por destino: obter() bloqueia
+    quando todas estao em uso. Antes de reaproveitar uma conexao ociosa o pool confere se
+    ela ainda esta no prazo do Keep-Alive anunciado pelo servidor e se o servidor nao a
+    fechou (socket legivel sem requisicao pendente = EOF ou lixo).
+    """
+
+    MARGEM_OCIOSA = 0.25  # segundos de folga antes do timeout de keep-alive do servidor
+
+    def __init__(self, max_por_destino=10, max_requisicoes_conexao=100, tempo_ocioso=2.0, timeout=10):
+        self.max_por_destino = max_por_destino
+        self.max_requisicoes_conexao = max_requisicoes_conexao
+        self.tempo_ocioso = tempo_ocioso  # usado quando a resposta nao traz Keep-Alive: timeout=N
+        self.timeout = timeout
+        self.ociosas = {}
+        self.vagas = {}
+        self.lock = threading.Lock()
+        self.criadas = 0
+        self.reusos = 0
+        self.descartadas = 0
+
+    def vagas_destino(self, destino):
+        with self.lock:
+            vagas = self.vagas.get(destino)
+            if vagas is None:
+                vagas = self.vagas[destino] = threading.BoundedSemaphore(self.max_por_destino)
+                self.ociosas[destino] = collections.deque()
+            return vagas
+
+    def saudavel(self, conexao):
+        if time.monotonic() >= conexao.expira_em:
+            return False
+        try:
+            legivel, _, _ = select.select([conexao.socket], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not legivel
+
+    def obter(self, ip, porta):
+        destino = (ip, porta)
+        self.vagas_destino(destino).acquire()
+        while True:
+            with self.lock:
+                if not self.ociosas[destino]:
+                    break
+                # LIFO: a conexao usada mais recentemente e a que tem menos chance de ter expirado
+                conexao = self.ociosas[destino].pop()
+            if self.saudavel(conexao):
+                with self.lock:
+                    self.reusos += 1
+                return conexao
+            self.fechar_conexao(conexao)
+        return ConexaoPersistente(destino)
+
+    def conectar(self, conexao):
+        conexao.socket = socket.create_connection(conexao.destino, timeout=self.timeout)
+        conexao.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.lock:
+            self.criadas += 1
+
+    def devolver(self, conexao, reutilizavel=True, tempo_ocioso=None, maximo=None):
+        """Devolve a conexao ao pool depois de uma resposta completa (ou a fecha)"""
+        conexao.requisicoes += 1
+        limite = self.max_requisicoes_conexao if maximo is None else min(maximo, self.max_requisicoes_conexao)
+        if reutilizavel and conexao.socket is not None and conexao.requisicoes < limite:
+            ocioso = self.tempo_ocioso if tempo_ocioso is None else tempo_ocioso
+            conexao.expira_em = time.monotonic() + max(0.0, ocioso - self.MARGEM_OCIOSA)
+            with self.lock:
+                self.ociosas[conexao.destino].append(conexao)
+        else:
+            self.fechar_conexao(conexao)
+        self.vagas[conexao.destino].release()
+
+    def descartar(self, conexao):
+        # Conexao com erro: fecha e libera a vaga para outra ser aberta
+        self.fechar_conexao(conexao)
+        self.vagas[conexao.destino].release()
+
+    def fechar_conexao(self, conexao):
+        if conexao.socket is not None:
+            conexao.socket.close()
+            conexao.socket = None
+            with self.lock:
+                self.descartadas += 1
+
+    def estatisticas(self):
+        return {
+            'conexoes_abertas': self.criadas,
+            'reusos': self.reusos,
+            'conexoes_descartadas': self.descartadas
+        }
+
+    def fechar(self):
+        with self.lock:
+            ociosas = [conexao for fila in self.ociosas.values() for conexao in fila]
+            for fila in self.ociosas.values():
+                fila.clear()
+        for conexao in ociosas:
+            conexao.socket.close()
@@ -0,0 +1,84 @@
+import random
+import time
+
+
+class RastreioRequisicao:
+    """Tempo de cada etapa de uma requisicao em nanossegundos (perf_counter_ns).
+
+    Cada marcar(etapa) soma o tempo desde a marca anterior na etapa. O relogio so comeca
+    quando chega o primeiro pedaco da requisicao, entao a espera ociosa do keep-alive
+    nao conta; 'queue' (espera por uma vaga) vem de fora, medida antes do atendimento.
+    """
+
+    __slots__ = ('etapas', 'ultimo', 'recebeu')
+
+    ativo = True
+
+    def __init__(self, espera_fila=0):
+        self.etapas = {'queue': espera_fila} if espera_fila else {}
+        self.ultimo = time.perf_counter_ns()
+        self.recebeu = False
+
+    def recebido(self):
+        if self.recebeu:
+            self.marcar('recv')
+        else:
+            self.recebeu = True
+            self.ultimo = time.perf_counter_ns()
+
+    def marcar(self, etapa):
+        agora = time.perf_counter_ns()
+        self.etapas[etapa] = self.etapas.get(etapa, 0) + agora - self.ultimo
+        self.ultimo = agora
+
+    def cabecalho(self):
+        # So as etapas ja medidas: 'build' e 'send' acontecem depois do cabecalho estar pronto
+        duracoes = ", ".join(f"{etapa};dur={ns / 1e6:.3f}" for etapa, ns in self.etapas.items())
+        return f"Server-Timing: {duracoes}\r\n".encode('latin-1')
+
+
+class RastreioDesligado:
+    """Substitui o RastreioRequisicao com o rastreio desligado: cada chamada nao faz nada"""
+
+    __slots__ = ()
+
+    ativo = False
+
+    def recebido(self):
+        pass
+
+    def marcar(self, etapa):
+        pass
+
+    def cabecalho(self):
+        return None
+
+
+RASTREIO_DESLIGADO = RastreioDesligado()
+
+
+class Rastreador:
+    """Cria o rastreio de cada requisicao e manda uma amostra para o log de rastreio.
+
+    Desligado, novo() devolve sempre o mesmo RastreioDesligado: o atendimento so paga
+    algumas chamadas vazias, sem relogio, sem cabecalho e sem alocacao.
+    """
+
+    def __init__(self, habilitado=False, amostragem=0.01, registro=None):
+        self.habilitado = habilitado
+        self.amostragem = amostragem
+        self.registro = registro  # RegistroAcesso que escreve as linhas de rastreio
+
+    def novo(self, espera_fila=0):
+        if not self.habilitado:
+            return RASTREIO_DESLIGADO
+        return RastreioRequisicao(espera_fila)
+
+    def finalizar(self, rastreio, metodo, caminho, status):
+        if not rastreio.ativo or self.registro is None or random.random() >= self.amostragem:
+            return
+        dados = {'metodo': metodo, 'caminho': caminho, 'status': status,
+                 'total_us': sum(rastreio.etapas.values()) // 1000}
+        for etapa, ns in rastreio.etapas.items():
+            dados[f"{etapa}_us"] = ns // 1000
+        self.registro.rastreio(dados)
@@ -0,0 +1,138 @@
+import collections
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+class RegistroAcesso:
+    """Log de acesso estruturado com escrita em lote numa thread propria.
+
+    As threads de atendimento so montam uma tupla e a colocam numa deque (append e
+    atomico no CPython, sem lock); formatar e escrever no stdout fica com a thread
+    escritora, que acorda a cada 'intervalo' segundos e grava tudo de uma vez. Com a
+    fila cheia o registro e descartado e contado, nunca bloqueia quem atende.
+
+    Niveis: 'debug' (conexoes abertas/fechadas, threads), 'info' (uma linha por
+    requisicao), 'aviso' (timeouts, rejeicoes), 'erro' e 'desligado'. A amostragem vale
+    so para linhas de acesso com status < 500; erros do servidor sempre aparecem.
+    Linhas de rastreio (tempos por etapa, ver rastreamento.py) ja chegam amostradas e
+    saem em qualquer nivel.
+    """
+
+    NIVEIS = {'debug': 10, 'info': 20, 'aviso': 30, 'erro': 40, 'desligado': 100}
+    FORMATOS = ('texto', 'json')
+
+    def __init__(self, nivel='info', amostragem=1.0, tamanho_fila=10000, intervalo=0.2, formato='texto',
+                 saida=None):
+        if nivel not in self.NIVEIS:
+            raise ValueError(f"Nivel de log invalido: {nivel}")
+        if formato not in self.FORMATOS:
+            raise ValueError(f"Formato de log invalido: {formato}")
+        self.nivel = self.NIVEIS[nivel]
+        self.amostragem = amostragem
+        self.tamanho_fila = tamanho_fila
+        self.intervalo = intervalo
+        self.formato = formato
+        self.saida = saida
+        self.fila = collections.deque()
+        # O lock so e usado no descarte (fila cheia), nunca no caminho normal
+        self.lock_descartes = threading.Lock()
+        self.descartados = 0
+        self.descartados_avisados = 0
+        self.encerrado = threading.Event()
+        self.iniciar_escritor()
+        # A thread escritora nao sobrevive ao fork (prefork): o filho cria a sua
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reiniciar_apos_fork)
+
+    def iniciar_escritor(self):
+        self.escritor = threading.Thread(target=self.laco_escrita, name="RegistroAcesso", daemon=True)
+        self.escritor.start()
+
+    def reiniciar_apos_fork(self):
+        self.fila = collections.deque()
+        self.lock_descartes = threading.Lock()
+        self.encerrado = threading.Event()
+        self.iniciar_escritor()
+
+    def habilitado(self, nivel):
+        return self.NIVEIS[nivel] >= self.nivel
+
+    def enfileirar(self, registro):
+        if len(self.fila) >= self.tamanho_fila:
+            with self.lock_descartes:
+                self.descartados += 1
+            return
+        self.fila.append(registro)
+
+    def acesso(self, cliente, metodo, caminho, status, bytes_enviados, latencia):
+        if self.nivel > self.NIVEIS['info']:
+            return
+        if self.amostragem < 1.0 and status < 500 and random.random() >= self.amostragem:
+            return
+        self.enfileirar(('acesso', time.time(), threading.current_thread().name, cliente, metodo, caminho, status,
+                         bytes_enviados, latencia))
+
+    def rastreio(self, dados):
+        self.enfileirar(('rastreio', time.time(), threading.current_thread().name, dados))
+
+    def evento(self, nivel, mensagem):
+        if self.NIVEIS[nivel] < self.nivel:
+            return
+        self.enfileirar((nivel, time.time(), threading.current_thread().name, mensagem))
+
+    def formatar(self, registro):
+        tipo, instante, thread = registro[:3]
+        momento = datetime.fromtimestamp(instante).isoformat(timespec='milliseconds')
+        if tipo == 'acesso':
+            cliente, metodo, caminho, status, bytes_enviados, latencia = registro[3:]
+            endereco = f"{cliente[0]}:{cliente[1]}" if isinstance(cliente, tuple) else str(cliente)
+            if self.formato == 'json':
+                return json.dumps({'momento': momento, 'tipo': tipo, 'thread': thread, 'cliente': endereco,
+                                   'metodo': metodo, 'caminho': caminho, 'status': status,
+                                   'bytes': bytes_enviados, 'latencia_ms': round(latencia * 1000, 3)})
+            return (f"{momento} acesso thread={thread} cliente={endereco} metodo={metodo} caminho={caminho} "
+                    f"status={status} bytes={bytes_enviados} latencia_ms={latencia * 1000:.3f}")
+        if tipo == 'rastreio':
+            dados = registro[3]
+            if self.formato == 'json':
+                return json.dumps({'momento': momento, 'tipo': tipo, 'thread': thread, **dados})
+            return f"{momento} rastreio thread={thread} " + " ".join(f"{chave}={valor}" for chave, valor in dados.items())
+        if self.formato == 'json':
+            return json.dumps({'momento': momento, 'tipo': tipo, 'thread': thread, 'mensagem': registro[3]})
+        return f"{momento} {tipo} thread={thread} {registro[3]}"
+
+    def descarregar(self):
+        linhas = []
+        fila = self.fila
+        # So o que ja estava na fila: com carga continua o lote nao cresce sem fim
+        for _ in range(len(fila)):
+            linhas.append(self.formatar(fila.popleft()))
+        descartados = self.descartados - self.descartados_avisados
+        self.descartados_avisados += descartados
+        if descartados:
+            linhas.append(self.formatar(('aviso', time.time(), "RegistroAcesso",
+                                         f"{descartados} registros descartados (fila cheia)")))
+        if linhas:
+            saida = self.saida or sys.stdout
+            saida.write("\n".join(linhas) + "\n")
+            saida.flush()
+
+    def laco_escrita(self):
+        while not self.encerrado.wait(self.intervalo):
+            try:
+                self.descarregar()
+            except (OSError, ValueError):
+                pass  # stdout fechado ou pipe quebrado: o log nao pode derrubar o servidor
+
+    def estatisticas(self):
+        return {'pendentes': len(self.fila), 'descartados': self.descartados}
+
+    def encerrar(self):
+        self.encerrado.set()
+        self.escritor.join(timeout=1)
+        self.descarregar()
@@ -0,0 +1,144 @@
+import time
+from email.utils import formatdate
+
+from rastreamento import RASTREIO_DESLIGADO
+
+MENSAGENS_STATUS = {
+    200: "OK",
+    206: "Partial Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    409: "Conflict",
+    413: "Payload Too Large",
+    416: "Range Not Satisfiable",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    501: "Not Implemented",
+    503: "Service Unavailable"
+}
+
+
+class TrechoArquivo:
+    """Parte de um arquivo do cache de estaticos que sera enviada com sendfile"""
+    __slots__ = ('arquivo', 'inicio', 'quantidade')
+
+    def __init__(self, arquivo, inicio, quantidade):
+        self.arquivo = arquivo
+        self.inicio = inicio
+        self.quantidade = quantidade
+
+
+class RespostaHttp:
+    __slots__ = ('codigo', 'corpo', 'tipo_conteudo', 'cabecalhos_extras', 'arquivo')
+
+    def __init__(self, codigo, corpo, tipo_conteudo, cabecalhos_extras=None):
+        self.codigo = codigo
+        self.corpo = corpo  # bytes ja codificados
+        self.tipo_conteudo = tipo_conteudo
+        self.cabecalhos_extras = cabecalhos_extras
+        self.arquivo = None  # TrechoArquivo quando o corpo vem direto do disco
+
+    def tamanho_corpo(self):
+        return self.arquivo.quantidade if self.arquivo is not None else len(self.corpo)
+
+
+class ConstrutorRespostas:
+    """Monta respostas HTTP a partir de blocos de bytes pre-calculados na inicializacao.
+
+    Linha de status + X-Custom-ID + Server sao fixos por servidor, o Date e recalculado
+    no maximo uma vez por segundo e o corpo e codificado uma unica vez.
+    """
+
+    def __init__(self, assinatura_servidor, id_personalizado, tempo_ocioso=5.0, max_requisicoes_conexao=100):
+        self.cabecalhos_fixos = (f"X-Custom-ID: {id_personalizado}\r\n"
+                                 f"Server: {assinatura_servidor}\r\n").encode('latin-1')
+        self.prefixos = {codigo: self.montar_prefixo(codigo) for codigo in MENSAGENS_STATUS}
+        self.linhas_tipo = {}
+        self.fim_fechar = b"Connection: close\r\n\r\n"
+        self.fim_manter = (f"Connection: keep-alive\r\n"
+                           f"Keep-Alive: timeout={int(tempo_ocioso)}, max={max_requisicoes_conexao}\r\n\r\n").encode('latin-1')
+        self.segundo_data = 0
+        self.linha_data = b""
+
+    def montar_prefixo(self, codigo):
+        linha_status = f"HTTP/1.1 {codigo} {MENSAGENS_STATUS.get(codigo, 'Unknown')}\r\n".encode('latin-1')
+        return linha_status + self.cabecalhos_fixos
+
+    def linha_tipo(self, tipo_conteudo):
+        linha = self.linhas_tipo.get(tipo_conteudo)
+        if linha is None:
+            if tipo_conteudo.startswith('text/') or tipo_conteudo in ('application/json', 'application/javascript'):
+                linha = f"Content-Type: {tipo_conteudo}; charset=utf-8\r\n".encode('latin-1')
+            else:
+                linha = f"Content-Type: {tipo_conteudo}\r\n".encode('latin-1')
+            self.linhas_tipo[tipo_conteudo] = linha
+        return linha
+
+    def cabecalho_data(self):
+        agora = int(time.time())
+        if agora != self.segundo_data:
+            # Se duas threads virarem o segundo juntas, o pior caso e recalcular a linha duas vezes
+            self.linha_data = f"Date: {formatdate(agora, usegmt=True)}\r\n".encode('latin-1')
+            self.segundo_data = agora
+        return self.linha_data
+
+    def criar(self, codigo_status, conteudo, tipo_conteudo="text/html", cabecalhos_extras=None):
+        corpo = conteudo.encode('utf-8') if isinstance(conteudo, str) else conteudo
+        return RespostaHttp(codigo_status, corpo, tipo_conteudo, cabecalhos_extras)
+
+    def serializar(self, resposta, manter_conexao=False, incluir_corpo=True, cabecalho_extra=None):
+        """Retorna a resposta como lista de buffers para envio scatter-gather.
+
+        cabecalho_extra: linha ja codificada que vale so para este envio (ex.: Server-Timing),
+        fora da resposta, que pode estar guardada no cache.
+        """
+        prefixo = self.prefixos.get(resposta.codigo)
+        if prefixo is None:
+            prefixo = self.montar_prefixo(resposta.codigo)
+
+        buffers = [
+            prefixo,
+            self.linha_tipo(resposta.tipo_conteudo),
+            self.cabecalho_data()
+        ]
+        # 304 nao tem corpo; um Content-Length ali descreveria o corpo do 200, e nao 0
+        if resposta.codigo != 304:
+            buffers.append(b"Content-Length: %d\r\n" % resposta.tamanho_corpo())
+        if resposta.cabecalhos_extras:
+            buffers.append("".join(f"{chave}: {valor}\r\n" for chave, valor in resposta.cabecalhos_extras.items())
+                           .encode('latin-1'))
+        if cabecalho_extra:
+            buffers.append(cabecalho_extra)
+        buffers.append(self.fim_manter if manter_conexao else self.fim_fechar)
+        # Em HEAD o Content-Length continua sendo o do GET, mas o corpo nao vai
+        if resposta.corpo and incluir_corpo:
+            buffers.append(resposta.corpo)
+        return buffers
+
+    def enviar(self, socket_cliente, resposta, manter_conexao=False, incluir_corpo=True, rastreio=RASTREIO_DESLIGADO):
+        """Envia a resposta e retorna o total de bytes escritos no socket (cabecalhos e corpo).
+
+        Com rastreio ativo a resposta leva o Server-Timing e as etapas 'build' e 'send' sao marcadas.
+        """
+        try:
+            buffers = self.serializar(resposta, manter_conexao, incluir_corpo, rastreio.cabecalho())
+            rastreio.marcar('build')
+            enviados = socket_cliente.sendmsg(buffers)
+            total = sum(len(buffer) for buffer in buffers)
+            if enviados < total:
+                # Envio parcial (buffer do socket cheio): o restante segue pelo sendall
+                socket_cliente.sendall(memoryview(b"".join(buffers))[enviados:])
+
+            trecho = resposta.arquivo
+            if trecho is not None and incluir_corpo and trecho.quantidade:
+                # socket.sendfile usa os.sendfile: o conteudo vai do page cache ao socket sem passar pelo Python
+                socket_cliente.sendfile(trecho.arquivo.objeto, trecho.inicio, trecho.quantidade)
+                total += trecho.quantidade
+            rastreio.marcar('send')
+            return total
+        finally:
+            if resposta.arquivo is not None:
+                resposta.arquivo.arquivo.liberar()
@@ -0,0 +1,109 @@
+from urllib.parse import urlsplit, parse_qs
+
+
+class Rota:
+    __slots__ = ('metodo', 'padrao', 'funcao', 'atraso', 'pesada', 'segmentos')
+
+    def __init__(self, metodo, padrao, funcao, atraso=0, pesada=False):
+        self.metodo = metodo
+        self.padrao = padrao
+        self.funcao = funcao
+        self.atraso = atraso  # tempo de processamento simulado da rota, em segundos
+        self.pesada = pesada  # o atraso roda no executor de rotas pesadas, fora da thread da conexao
+        self.segmentos = tuple(padrao.strip('/').split('/'))
+
+
+class ResultadoRota:
+    __slots__ = ('rota', 'caminho', 'parametros', 'query', 'permitidos')
+
+    def __init__(self, rota, caminho, parametros, query, permitidos=()):
+        self.rota = rota
+        self.caminho = caminho
+        self.parametros = parametros
+        self.query = query
+        self.permitidos = permitidos  # metodos aceitos no caminho quando a resposta deve ser 405
+
+
+class Roteador:
+    """Tabela de rotas compartilhada pelos servidores.
+
+    Padroes aceitos em registrar():
+      '/info'            caminho exato, resolvido por dicionario (metodo, caminho)
+      '/api/itens/{id}'  segmentos entre chaves viram parametros
+      '/static/*'        prefixo; o restante do caminho fica em parametros['*']
+    """
+
+    def __init__(self):
+        self.exatas = {}
+        self.parametrizadas = []
+        self.prefixos = []
+        self.metodos_caminho = {}
+
+    def registrar(self, metodo, padrao, funcao, atraso=0, pesada=False):
+        rota = Rota(metodo, padrao, funcao, atraso, pesada)
+        if padrao.endswith('/*'):
+            self.prefixos.append((padrao[:-1], rota))
+            self.prefixos.sort(key=lambda item: len(item[0]), reverse=True)
+        elif '{' in padrao:
+            self.parametrizadas.append(rota)
+        else:
+            self.exatas[(metodo, padrao)] = rota
+        self.metodos_caminho.setdefault(padrao, set()).add(metodo)
+        return rota
+
+    def rotas(self):
+        todas = list(self.exatas.values()) + self.parametrizadas + [rota for _, rota in self.prefixos]
+        return sorted(todas, key=lambda rota: (rota.padrao, rota.metodo))
+
+    def metodos_permitidos(self, padrao):
+        metodos = set(self.metodos_caminho.get(padrao, ()))
+        if 'GET' in metodos:
+            metodos.add('HEAD')
+        return tuple(sorted(metodos))
+
+    def buscar(self, metodo, caminho):
+        rota = self.exatas.get((metodo, caminho))
+        if rota is not None:
+            return rota, {}
+
+        if self.parametrizadas:
+            segmentos = caminho.strip('/').split('/')
+            for rota in self.parametrizadas:
+                if rota.metodo != metodo or len(rota.segmentos) != len(segmentos):
+                    continue
+                parametros = {}
+                for esperado, recebido in zip(rota.segmentos, segmentos):
+                    if esperado.startswith('{') and esperado.endswith('}'):
+                        parametros[esperado[1:-1]] = recebido
+                    elif esperado != recebido:
+                        break
+                else:
+                    return rota, parametros
+
+        for prefixo, rota in self.prefixos:
+            if rota.metodo == metodo and caminho.startswith(prefixo):
+                return rota, {'*': caminho[len(prefixo):]}
+
+        return None, None
+
+    def resolver(self, metodo, alvo):
+        if '?' in alvo:
+            partes = urlsplit(alvo)
+            caminho, query = partes.path, parse_qs(partes.query, keep_blank_values=True)
+        else:
+            caminho, query = alvo, {}
+
+        rota, parametros = self.buscar(metodo, caminho)
+        if rota is None and metodo == 'HEAD':
+            # HEAD usa a rota GET; o servidor descarta o corpo no envio
+            rota, parametros = self.buscar('GET', caminho)
+        if rota is not None:
+            return ResultadoRota(rota, caminho, parametros, query)
+
+        # O caminho existe com outro metodo? Entao e 405 com Allow
+        for outro in ('GET', 'POST', 'PUT', 'DELETE', 'PATCH'):
+            if outro != metodo:
+                rota_outra, _ = self.buscar(outro, caminho)
+                if rota_outra is not None:
+                    return ResultadoRota(None, caminho, {}, query, self.metodos_permitidos(rota_outra.padrao))
+        return ResultadoRota(None, caminho, {}, query)
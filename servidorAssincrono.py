@@ -0,0 +1,221 @@
+import asyncio
+import os
+import time
+
+from servidorConcorrente import ServidorConcorrente
+from parserHttp import ParserHttp, ErroHttp, RESPOSTA_CONTINUE
+from cacheRespostas import carregar_rotas_cache
+from rastreamento import RASTREIO_DESLIGADO
+
+class ServidorAssincrono(ServidorConcorrente):
+    ASSINATURA_SERVIDOR = "Assincrono-Socket/Redes-II"
+    NOME_SERVIDOR = "assincrono"
+    TITULO_SERVIDOR = "Assincrono"
+    TIPO_SERVIDOR = "asynchronous"
+    MODELO_CONCORRENCIA = "event-loop (asyncio)"
+    DESCRICAO_SERVIDOR = "Assincrono (Socket TCP + asyncio, uma thread com laco de eventos)"
+
+    def __init__(self, host='37.92.0.12', porta=80, backlog=1024, tempo_ocioso=5.0,
+                 max_requisicoes_conexao=100, max_corpo=1024 * 1024, rotas_cache=None,
+                 raiz_documentos=None, nivel_log='info', amostragem_log=1.0, fila_log=10000, formato_log='texto',
+                 rastreio=False, amostragem_rastreio=0.01, duracao_perfil=30.0, intervalo_perfil=0.01):
+        super().__init__(host, porta, tempo_ocioso=tempo_ocioso,
+                         max_requisicoes_conexao=max_requisicoes_conexao, max_corpo=max_corpo,
+                         rotas_cache=rotas_cache, raiz_documentos=raiz_documentos,
+                         trabalhadores_pesados=0,
+                         nivel_log=nivel_log, amostragem_log=amostragem_log, fila_log=fila_log,
+                         formato_log=formato_log, rastreio=rastreio,
+                         amostragem_rastreio=amostragem_rastreio, duracao_perfil=duracao_perfil,
+                         intervalo_perfil=intervalo_perfil)  # o asyncio.sleep das rotas pesadas ja nao prende o loop
+        self.modo = 'asyncio'
+        self.backlog = backlog
+
+    def estatisticas_conexoes(self):
+        # Sem semaforo nem fila de conexoes: o laco de eventos aceita todas
+        return {}
+
+    def estatisticas_leves(self):
+        return None
+
+    async def despachar_requisicao_async(self, requisicao):
+        # Mesmo roteamento do concorrente; so o atraso da rota vira asyncio.sleep
+        rota, resposta = self.preparar_requisicao(requisicao)
+        if rota is None:
+            return resposta
+        if rota.atraso:
+            await asyncio.sleep(rota.atraso)
+        if rota.funcao == self.arquivo_estatico:
+            # stat/open no disco podem bloquear: saem do loop para nao parar as outras conexoes
+            tarefa = asyncio.ensure_future(asyncio.to_thread(self.executar_rota, rota, requisicao))
+            try:
+                return await asyncio.shield(tarefa)
+            except asyncio.CancelledError:
+                # A thread termina mesmo com a conexao cancelada: o arquivo que ela abrir volta ao cache
+                tarefa.add_done_callback(self.liberar_resposta_abandonada)
+                raise
+        return self.executar_rota(rota, requisicao)
+
+    def liberar_resposta_abandonada(self, tarefa):
+        if tarefa.cancelled() or tarefa.exception() is not None:
+            return
+        resposta = tarefa.result()
+        if resposta.arquivo is not None:
+            resposta.arquivo.arquivo.liberar()
+
+    async def enviar_resposta_async(self, escritor, resposta, manter_conexao=False, incluir_corpo=True,
+                                    rastreio=RASTREIO_DESLIGADO):
+        try:
+            buffers = self.construtor_respostas.serializar(resposta, manter_conexao, incluir_corpo, rastreio.cabecalho())
+            rastreio.marcar('build')
+            escritor.writelines(buffers)
+            total = sum(len(buffer) for buffer in buffers)
+            trecho = resposta.arquivo
+            if trecho is not None and incluir_corpo and trecho.quantidade:
+                await escritor.drain()
+                await asyncio.get_running_loop().sendfile(escritor.transport, trecho.arquivo.objeto,
+                                                          trecho.inicio, trecho.quantidade)
+                total += trecho.quantidade
+            return total
+        finally:
+            if resposta.arquivo is not None:
+                resposta.arquivo.arquivo.liberar()
+
+    async def ler_requisicao_async(self, leitor, escritor, parser, timeout, rastreio=RASTREIO_DESLIGADO):
+        while True:
+            requisicao = parser.proxima_requisicao()
+            if requisicao is not None:
+                rastreio.marcar('parse')
+                return requisicao
+            if parser.pedir_continuacao():
+                escritor.write(RESPOSTA_CONTINUE)
+                await escritor.drain()
+            pedaco = await asyncio.wait_for(leitor.read(65536), timeout=timeout)
+            if not pedaco:
+                return None
+            rastreio.recebido()
+            self.metricas.incrementar('http_received_bytes_total', valor=len(pedaco))
+            parser.alimentar(pedaco)
+
+    async def atender_conexao_async(self, leitor, escritor):
+        endereco_cliente = escritor.get_extra_info('peername')
+        registro = self.registro_acesso
+        metricas = self.metricas
+        registro.evento('debug', f"Conexao aceita: {endereco_cliente}")
+        parser = ParserHttp(self.max_cabecalhos, self.max_corpo)
+        requisicoes_atendidas = 0
+        em_andamento = False
+        resposta = None
+
+        try:
+            while True:
+                timeout = self.tempo_ocioso if requisicoes_atendidas else 10.0
+                rastreio = self.rastreador.novo()
+                requisicao = await self.ler_requisicao_async(leitor, escritor, parser, timeout, rastreio)
+                if requisicao is None:
+                    break
+
+                tempo_inicio = time.perf_counter()
+                requisicoes_atendidas += 1
+                manter_conexao = (self.deve_manter_conexao(requisicao.versao, requisicao.cabecalhos)
+                                  and requisicoes_atendidas < self.max_requisicoes_conexao)
+                metricas.inicio_requisicao()
+                em_andamento = True
+
+                resposta = await self.despachar_requisicao_async(requisicao)
+                rastreio.marcar('handler')
+                incluir_corpo = requisicao.metodo != 'HEAD'
+                enviados = await self.enviar_resposta_async(escritor, resposta, manter_conexao,
+                                                            incluir_corpo=incluir_corpo, rastreio=rastreio)
+                await escritor.drain()
+                rastreio.marcar('send')
+
+                duracao = time.perf_counter() - tempo_inicio
+                em_andamento = False
+                metricas.fim_requisicao(requisicao.rota, requisicao.metodo, resposta.codigo, duracao, enviados)
+                self.rastreador.finalizar(rastreio, requisicao.metodo, requisicao.caminho, resposta.codigo)
+                registro.acesso(endereco_cliente, requisicao.metodo, requisicao.caminho, resposta.codigo,
+                                resposta.tamanho_corpo() if incluir_corpo else 0, duracao)
+
+                if not manter_conexao:
+                    break
+
+        except ErroHttp as e:
+            resposta_erro = self.criar_resposta_http(e.codigo, f"<h1>{e.codigo} - {e.mensagem}</h1>")
+            buffers = self.construtor_respostas.serializar(resposta_erro)
+            escritor.writelines(buffers)
+            metricas.requisicao_invalida(e.codigo, sum(len(buffer) for buffer in buffers))
+            registro.evento('aviso', f"Requisicao invalida de {endereco_cliente}: {e.mensagem}")
+        except asyncio.TimeoutError:
+            # Conexao keep-alive ociosa fecha em silencio; requisicao incompleta recebe 408
+            if requisicoes_atendidas == 0 or parser.pendente():
+                resposta_erro = self.criar_resposta_http(408, "<h1>408 - Timeout</h1>")
+                buffers = self.construtor_respostas.serializar(resposta_erro)
+                escritor.writelines(buffers)
+                metricas.requisicao_invalida(408, sum(len(buffer) for buffer in buffers))
+                registro.evento('aviso', f"Timeout com {endereco_cliente}")
+        except ConnectionError:
+            if em_andamento:
+                # Cliente fechou no meio da resposta: sai do gauge, com o status que seria enviado
+                metricas.fim_requisicao(requisicao.rota, requisicao.metodo, resposta.codigo if resposta else 500,
+                                        time.perf_counter() - tempo_inicio, 0)
+        except Exception as e:
+            if em_andamento:
+                metricas.fim_requisicao(requisicao.rota, requisicao.metodo, 500, time.perf_counter() - tempo_inicio, 0)
+            resposta_erro = self.criar_resposta_http(500, f"<h1>500 - Erro Interno</h1><p>{str(e)}</p>")
+            escritor.writelines(self.construtor_respostas.serializar(resposta_erro))
+            registro.evento('erro', f"Erro com {endereco_cliente}: {e}")
+        finally:
+            registro.evento('debug', f"Conexao fechada: {endereco_cliente}")
+            escritor.close()
+            try:
+                await escritor.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def executar(self):
+        servidor = await asyncio.start_server(
+            self.atender_conexao_async, self.host, self.porta,
+            backlog=self.backlog, reuse_address=True
+        )
+
+        print("=" * 70)
+        print("SERVIDOR ASSINCRONO - ASYNCIO / SOCKETS NAO BLOQUEANTES")
+        print("=" * 70)
+        print(f"Servidor: {self.host}:{self.porta}")
+        print(f"X-Custom-ID: {self.id_personalizado}")
+        print(f"MATRicula:20229043792")
+        print(f"Nome: Victor Rodrigues Luz")
+        print("Endpoints: GET /, /info, /status, /metrics, /heavy, /health")
+        print("Endpoints: POST /api/data, /api/echo, /api/batch")
+        print("Digite Ctrl+C para encerrar")
+        print("=" * 70)
+
+        async with servidor:
+            await servidor.serve_forever()
+
+    def iniciar(self):
+        try:
+            asyncio.run(self.executar())
+        except KeyboardInterrupt:
+            print("\n[Async] Encerrando servidor...")
+        finally:
+            self.registro_acesso.encerrar()
+
+if __name__ == "__main__":
+    servidor = ServidorAssincrono(
+        backlog=int(os.environ.get('BACKLOG', '1024')),
+        tempo_ocioso=float(os.environ.get('TEMPO_OCIOSO', '5')),
+        max_requisicoes_conexao=int(os.environ.get('MAX_REQUISICOES_CONEXAO', '100')),
+        max_corpo=int(os.environ.get('MAX_CORPO', str(1024 * 1024))),
+        rotas_cache=carregar_rotas_cache(os.environ.get('CACHE_ROTAS', '')),
+        raiz_documentos=os.environ.get('RAIZ_DOCUMENTOS') or None,
+        nivel_log=os.environ.get('NIVEL_LOG', 'info'),
+        amostragem_log=float(os.environ.get('AMOSTRAGEM_LOG', '1')),
+        fila_log=int(os.environ.get('FILA_LOG', '10000')),
+        formato_log=os.environ.get('FORMATO_LOG', 'texto'),
+        rastreio=os.environ.get('RASTREIO', '0') == '1',
+        amostragem_rastreio=float(os.environ.get('AMOSTRAGEM_RASTREIO', '0.01')),
+        duracao_perfil=float(os.environ.get('PERFIL_DURACAO', '30')),
+        intervalo_perfil=float(os.environ.get('PERFIL_INTERVALO_MS', '10')) / 1000
+    )
+    servidor.iniciar()
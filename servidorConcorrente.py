@@ -4,17 +4,107 @@ from datetime import datetime
 import time
 import threading
 import json
+import queue
+import os
+import signal
+import multiprocessing
+
+from parserHttp import ParserHttp, ErroHttp, RESPOSTA_CONTINUE
+from respostaHttp import ConstrutorRespostas
+from cacheRespostas import CacheRespostas, carregar_rotas_cache
+from roteador import Roteador
+from arquivosEstaticos import ServidorArquivos
+from executorPesado import ExecutorPesado, FilaPesadaCheia
+from registroAcesso import RegistroAcesso
+from metricasServidor import RegistroMetricas
+from contadorRequisicoes import ContadorRequisicoes
+from rastreamento import Rastreador, RASTREIO_DESLIGADO
+from perfilAmostragem import PerfilAmostragem
 
 class ServidorConcorrente:
-    def __init__(self,host='37.92.0.11',porta=80):
+    ASSINATURA_SERVIDOR = "Concorrente-Socket/Redes-II"
+    # Identidade mostrada em /, /info, /status e /health (o assincrono troca por a sua)
+    NOME_SERVIDOR = "concorrente"
+    TITULO_SERVIDOR = "Concorrente"
+    TIPO_SERVIDOR = "concurrent"
+    MODELO_CONCORRENCIA = "thread-based"
+    DESCRICAO_SERVIDOR = "Concorrente (Socket TCP + Threads)"
+
+    def __init__(self,host='37.92.0.11',porta=80, modo='thread', num_trabalhadores=50,
+                 tamanho_fila=100, politica_sobrecarga='rejeitar', tempo_ocioso=5.0,
+                 max_requisicoes_conexao=100, max_cabecalhos=8192, max_corpo=1024 * 1024,
+                 rotas_cache=None, max_entradas_cache=128, raiz_documentos=None, prefixo_estatico='/static/',
+                 trabalhadores_pesados=0, fila_pesada=16, tipo_executor_pesado='thread',
+                 nivel_log='info', amostragem_log=1.0, fila_log=10000, formato_log='texto',
+                 rastreio=False, amostragem_rastreio=0.01, duracao_perfil=30.0, intervalo_perfil=0.01):
         self.host = host
         self.porta = porta
         self.id_personalizado = self.calcular_id_personalizado()
-        self.contador_requisicoes = 0
+        # Numeros unicos sem lock global (itertools.count); o total e somado por thread na leitura
+        self.contador_requisicoes = ContadorRequisicoes()
 
-        self.lock_contador = threading.Lock() # Trava
         self.semaphore = threading.Semaphore(50) # Limita para 50 thrends
-        
+        self.vagas_thread = 50
+        # Conexoes esperando uma vaga do semaforo (modo thread), para o /status e o /metrics
+        self.esperando_vaga = 0
+        self.lock_espera = threading.Lock()
+
+        # modo 'thread': uma thread por conexao (limitada pelo semaforo)
+        # modo 'pool': num_trabalhadores threads fixas consumindo uma fila limitada
+        if modo not in ('thread', 'pool'):
+            raise ValueError(f"Modo invalido: {modo}")
+        if politica_sobrecarga not in ('rejeitar', 'backlog'):
+            raise ValueError(f"Politica de sobrecarga invalida: {politica_sobrecarga}")
+        self.modo = modo
+        self.num_trabalhadores = num_trabalhadores
+        self.politica_sobrecarga = politica_sobrecarga
+        self.fila_conexoes = queue.Queue(maxsize=tamanho_fila)
+        self.conexoes_rejeitadas = 0
+
+        # Keep-alive: tempo maximo ocioso entre requisicoes e limite de requisicoes por conexao
+        self.tempo_ocioso = tempo_ocioso
+        self.max_requisicoes_conexao = max_requisicoes_conexao
+
+        # Limites do parser: cabecalhos maiores geram 431 e corpos maiores 413
+        self.max_cabecalhos = max_cabecalhos
+        self.max_corpo = max_corpo
+
+        self.construtor_respostas = ConstrutorRespostas(self.ASSINATURA_SERVIDOR, self.id_personalizado,
+                                                        tempo_ocioso, max_requisicoes_conexao)
+
+        # Cache opcional de respostas GET: {caminho: ttl_em_segundos}
+        self.cache_respostas = CacheRespostas(rotas_cache, max_entradas_cache) if rotas_cache else None
+
+        # Arquivos estaticos (opcional): GET <prefixo_estatico><arquivo> servido da raiz com sendfile
+        self.servidor_arquivos = ServidorArquivos(raiz_documentos) if raiz_documentos else None
+        self.prefixo_estatico = prefixo_estatico.rstrip('/') + '/'
+
+        # Rotas pesadas rodam num executor proprio com fila limitada (0 trabalhadores = inline, como antes).
+        # No modo thread a conexao devolve a vaga do semaforo enquanto espera, deixando-a para rotas leves
+        self.executor_pesado = (ExecutorPesado(trabalhadores_pesados, fila_pesada, tipo_executor_pesado)
+                                if trabalhadores_pesados > 0 else None)
+
+        # Log de acesso: as threads so enfileiram, uma thread propria escreve em lote
+        self.registro_acesso = RegistroAcesso(nivel_log, amostragem_log, fila_log, formato=formato_log)
+
+        # Metricas para o Prometheus (GET /metrics): cada thread grava no seu fragmento, sem lock
+        self.metricas = RegistroMetricas()
+
+        # Rastreio por etapa (Server-Timing + amostras no log); desligado custa so chamadas vazias
+        self.rastreador = Rastreador(rastreio, amostragem_rastreio, self.registro_acesso)
+
+        # Profiler por amostragem (POST /admin/profile/start ou SIGUSR1): parado nao custa nada
+        self.perfil = PerfilAmostragem(prefixo=f"perfil_{self.NOME_SERVIDOR}", registro=self.registro_acesso,
+                                       duracao=duracao_perfil, intervalo=intervalo_perfil)
+        self.perfil.instalar_sinal()
+
+        self.roteador = Roteador()
+        self.registrar_rotas()
+
+        # Prefork: contadores de cada processo em memoria compartilhada (um slot por worker)
+        self.contadores_processos = None
+        self.indice_processo = 0
+
     def calcular_id_personalizado(self):
         matricula = "20229043792"
         nome = "Victor Rodrigues Luz"
@@ -23,252 +113,449 @@ class ServidorConcorrente:
         return hashlib.md5(dados.encode()).hexdigest()
     
     def analisar_requisicao_http(self,dados):
+        # Mantido para compatibilidade: analisa uma requisicao completa ja recebida
         try:
-            linhas = dados.split('\r\n')
-            if not linhas:
+            parser = ParserHttp(self.max_cabecalhos, self.max_corpo)
+            parser.alimentar(dados.encode('utf-8') if isinstance(dados, str) else dados)
+            requisicao = parser.proxima_requisicao()
+            if requisicao is None:
                 return None, None, {}, ''
-            
-            linha_requisicao = linhas[0]
-            partes = linha_requisicao.split()
-            if len(partes) < 3:
-                return None, None, {}, ''
-                
-            metodo = partes[0]
-            caminho = partes[1]
-            
-            cabecalhos = {}
-            corpo = ''
-            linha_vazia_encontrada = False
-            
-            for linha in linhas[1:]:
-                if not linha:
-                    linha_vazia_encontrada = True
-                    continue
-                    
-                if not linha_vazia_encontrada and ':' in linha:
-                    chave, valor = linha.split(':', 1)
-                    cabecalhos[chave.strip()] = valor.strip()
-                elif linha_vazia_encontrada:
-                    corpo += linha
-            
-            return metodo, caminho, cabecalhos, corpo.strip()
-            
-        except Exception as e:
+            return requisicao.metodo, requisicao.caminho, requisicao.cabecalhos, requisicao.texto_corpo()
+        except ErroHttp:
             return None, None, {}, ''
     
     def validar_id_personalizado(self, cabecalhos):
-        return cabecalhos.get('X-Custom-ID') == self.id_personalizado
+        return cabecalhos.get('x-custom-id') == self.id_personalizado
     
     def criar_resposta_http(self, codigo_status, conteudo, tipo_conteudo="text/html", cabecalhos_personalizados=None):
-        mensagens_status = {
-            200: "OK",
-            400: "Bad Request",
-            404: "Not Found",
-            405: "Method Not Allowed",
-            500: "Internal Server Error"
-        }
-        
-        resposta = f"HTTP/1.1 {codigo_status} {mensagens_status.get(codigo_status, 'Unknown')}\r\n"
-        resposta += f"Content-Type: {tipo_conteudo}; charset=utf-8\r\n"
-        resposta += f"X-Custom-ID: {self.id_personalizado}\r\n"
-        resposta += f"Server: Concorrente-Socket/Redes-II\r\n"
-        resposta += f"Date: {datetime.now().strftime('%a, %d %b %Y %H:%M:%S GMT')}\r\n"
-        resposta += f"Content-Length: {len(conteudo.encode('utf-8'))}\r\n"
-        resposta += "Connection: close\r\n"
-        
-        if cabecalhos_personalizados:
-            for chave, valor in cabecalhos_personalizados.items():
-                resposta += f"{chave}: {valor}\r\n"
-        
-        resposta += "\r\n"
-        resposta += conteudo
-        
-        return resposta
+        # Cabecalhos fixos, Date e Connection sao montados pelo ConstrutorRespostas no envio
+        return self.construtor_respostas.criar(codigo_status, conteudo, tipo_conteudo, cabecalhos_personalizados)
+
+    def deve_manter_conexao(self, versao, cabecalhos):
+        conexao = cabecalhos.get('connection', '').lower()
+        if versao == 'HTTP/1.0':
+            return conexao == 'keep-alive'
+        return conexao != 'close'
     
-    def processar_requisicao_get(self,caminho, cabecalhos):
-        if not self.validar_id_personalizado(cabecalhos):
-            return self.criar_resposta_http(400, "<h1>400 - X-Custom-ID inválido ou ausente</h1>")
-        
-        with self.lock_contador:
-            self.contador_requisicoes += 1
-            contador_atual = self.contador_requisicoes
-        
-        if caminho == '/' or caminho == '/index.html':
-            conteudo = f"""
+    def proximo_numero_requisicao(self):
+        numero = self.contador_requisicoes.proximo()
+        if self.contadores_processos is not None:
+            # Sem lock duas threads podem gravar fora de ordem; o slot fica atras por no maximo
+            # as requisicoes em andamento e se corrige na proxima gravacao
+            self.contadores_processos[self.indice_processo] = numero
+        return numero
+
+    def total_requisicoes(self):
+        if self.contadores_processos is not None:
+            return sum(self.contadores_processos)
+        return self.contador_requisicoes.total()
+
+    def registrar_rotas(self):
+        self.roteador.registrar('GET', '/', self.pagina_inicial)
+        self.roteador.registrar('GET', '/index.html', self.pagina_inicial)
+        self.roteador.registrar('GET', '/info', self.rota_info)
+        self.roteador.registrar('GET', '/status', self.rota_status)
+        self.roteador.registrar('GET', '/metrics', self.rota_metrics)
+        self.roteador.registrar('GET', '/admin/profile', self.rota_perfil)
+        self.roteador.registrar('POST', '/admin/profile/start', self.rota_perfil)
+        self.roteador.registrar('POST', '/admin/profile/stop', self.rota_perfil)
+        self.roteador.registrar('GET', '/heavy', self.rota_heavy, atraso=2, pesada=True)
+        self.roteador.registrar('GET', '/health', self.rota_health)
+        self.roteador.registrar('POST', '/api/data', self.api_data, atraso=0.1)
+        self.roteador.registrar('POST', '/api/echo', self.api_echo)
+        self.roteador.registrar('POST', '/api/batch', self.api_batch, atraso=0.5, pesada=True)
+        if self.servidor_arquivos is not None:
+            self.roteador.registrar('GET', self.prefixo_estatico + '*', self.arquivo_estatico)
+
+    def simular_processamento(self, segundos):
+        time.sleep(segundos)
+
+    def processamento_pesado(self, segundos):
+        # time.sleep (e nao o metodo) vai para o executor para funcionar tambem com pool de processos
+        futuro = self.executor_pesado.submeter(time.sleep, segundos)
+        if self.modo != 'thread':
+            # No modo pool o worker fica preso ate o fim; o ExecutorPesado limita isso a
+            # trabalhadores_pesados + fila_pesada workers, o resto e 503
+            futuro.result()
+            return
+        self.semaphore.release()
+        try:
+            futuro.result()
+        finally:
+            self.ocupar_vaga()
+
+    def resposta_nao_encontrada(self, metodo):
+        if metodo == 'POST':
+            return self.criar_resposta_http(404, "<h1>404 - Endpoint POST não encontrado</h1>")
+        return self.criar_resposta_http(404,"<h1>404 - Recurso Não Encontrado</h1><p>Use: /, /info, /status, /heavy, /health</p>")
+
+    def preparar_requisicao(self, requisicao):
+        # Devolve (rota, None) para executar ou (None, resposta) quando ja ha resposta pronta
+        if not self.validar_id_personalizado(requisicao.cabecalhos):
+            return None, self.criar_resposta_http(400, "<h1>400 - X-Custom-ID inválido ou ausente</h1>")
+
+        resultado = self.roteador.resolver(requisicao.metodo, requisicao.alvo)
+        requisicao.caminho = resultado.caminho
+        requisicao.query = resultado.query
+        if resultado.rota is None:
+            if resultado.permitidos:
+                return None, self.criar_resposta_http(405, "<h1>405 - Método Não Permitido</h1>",
+                                                      cabecalhos_personalizados={"Allow": ", ".join(resultado.permitidos)})
+            return None, self.resposta_nao_encontrada(requisicao.metodo)
+
+        requisicao.rota = resultado.rota.padrao
+        requisicao.parametros = resultado.parametros
+        requisicao.numero = self.proximo_numero_requisicao()
+
+        # Rotas com cache ligado devolvem a resposta guardada enquanto o TTL valer
+        if self.cache_respostas is not None and requisicao.metodo != 'POST':
+            resposta = self.cache_respostas.obter(requisicao.caminho)
+            if resposta is not None:
+                return None, resposta
+
+        return resultado.rota, None
+
+    def executar_rota(self, rota, requisicao):
+        resposta = rota.funcao(requisicao)
+        if (self.cache_respostas is not None and requisicao.metodo != 'POST' and resposta.codigo == 200
+                and resposta.arquivo is None):
+            self.cache_respostas.guardar(requisicao.caminho, resposta)
+        return resposta
+
+    def despachar_requisicao(self, requisicao):
+        rota, resposta = self.preparar_requisicao(requisicao)
+        if rota is None:
+            return resposta
+        if rota.atraso:
+            if rota.pesada and self.executor_pesado is not None:
+                try:
+                    self.processamento_pesado(rota.atraso)
+                except FilaPesadaCheia:
+                    return self.criar_resposta_http(503, "<h1>503 - Fila de Processamento Pesado Cheia</h1>",
+                                                    cabecalhos_personalizados={"Retry-After": "1"})
+            else:
+                self.simular_processamento(rota.atraso)
+        return self.executar_rota(rota, requisicao)
+
+    def pagina_inicial(self, requisicao):
+        conteudo = f"""
 <!DOCTYPE html>
 <html>
 <head>
-    <title>Servidor Concorrente - Sockets</title>
+    <title>Servidor {self.TITULO_SERVIDOR} - Sockets</title>
     <meta charset="utf-8">
 </head>
 <body>
-    <h1>Servidor Web Concorrente com Sockets Brutos</h1>
+    <h1>Servidor Web {self.TITULO_SERVIDOR} com Sockets Brutos</h1>
     <p><strong>Matrícula:</strong> 20229043792</p>
     <p><strong>Nome:</strong> Victor Rodrigues Luz</p>
     <p><strong>Thread:</strong> {threading.current_thread().name}</p>
-    <p><strong>Requisição nº:</strong> {contador_atual}</p>
+    <p><strong>Requisição nº:</strong> {requisicao.numero}</p>
     <p><strong>Timestamp:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
     <p><strong>X-Custom-ID:</strong> {self.id_personalizado}</p>
-    <p><strong>Tipo:</strong> Concorrente (Socket TCP + Threads)</p>
+    <p><strong>Tipo:</strong> {self.DESCRICAO_SERVIDOR}</p>
 </body>
 </html>
 """
-            return self.criar_resposta_http(200, conteudo, "text/html")
-            
-        elif caminho == '/info':
-            info = {
-                "servidor": "concorrente_socket",
-                "matricula": "20229043792",
-                "nome": "Victor Rodrigues Luz",
-                "thread": threading.current_thread().name,
-                "custom_id": self.id_personalizado,
-                "timestamp": datetime.now().isoformat(),
-                "request_count": contador_atual,
-                "protocol": "TCP/Socket",
-                "concurrency": "thread-based"
-            }
-            return self.criar_resposta_http(200, json.dumps(info, indent=2), "application/json")
-            
-        elif caminho == '/status':
-            status_info = {
-                "status":"online",
-                "server_type":"concurrent",
-                "requests_processed":contador_atual,
-                "active_threads":threading.active_count(),
-                "thread_name":threading.current_thread().name,
-                "custom_id_valid": True
-            }
-            return self.criar_resposta_http(200, json.dumps(status_info, indent=2), "application/json")
-            
-        elif caminho == '/heavy':
-            time.sleep(2)
-            conteudo = {
-                "operation": "heavy_processing",
-                "duration": "2 seconds",
-                "thread": threading.current_thread().name,
-                "timestamp": datetime.now().isoformat()
-            }
-            return self.criar_resposta_http(200, json.dumps(conteudo, indent=2), "application/json")
-
-        elif caminho == '/health':
-            health_info = {
-                "status": "healthy", 
-                "server": "concorrente",
-                "threads_ativas": threading.active_count(),
-                "timestamp": datetime.now().isoformat()
-            }
-            return self.criar_resposta_http(200, json.dumps(health_info, indent=2), "application/json")
+        return self.criar_resposta_http(200, conteudo, "text/html")
 
+    def rota_info(self, requisicao):
+        info = {
+            "servidor": f"{self.NOME_SERVIDOR}_socket",
+            "matricula": "20229043792",
+            "nome": "Victor Rodrigues Luz",
+            "thread": threading.current_thread().name,
+            "custom_id": self.id_personalizado,
+            "timestamp": datetime.now().isoformat(),
+            "request_count": requisicao.numero,
+            "protocol": "TCP/Socket",
+            "concurrency": self.MODELO_CONCORRENCIA
+        }
+        return self.criar_resposta_http(200, json.dumps(info, indent=2), "application/json")
+
+    def rota_status(self, requisicao):
+        status_info = {
+            "status":"online",
+            "server_type": self.TIPO_SERVIDOR,
+            "requests_processed":requisicao.numero,
+            "active_threads":threading.active_count(),
+            "thread_name":threading.current_thread().name,
+            "custom_id_valid": True,
+            "concurrency_mode": self.modo,
+            "worker_process": self.indice_processo,
+            "requests_processed_all_processes": self.total_requisicoes(),
+            **self.estatisticas_conexoes(),
+            "request_classes": {
+                "light": self.estatisticas_leves(),
+                "heavy": self.executor_pesado.estatisticas() if self.executor_pesado else None
+            },
+            "response_cache": self.cache_respostas.estatisticas() if self.cache_respostas else None,
+            "access_log": self.registro_acesso.estatisticas()
+        }
+        return self.criar_resposta_http(200, json.dumps(status_info, indent=2), "application/json")
+
+    def estatisticas_conexoes(self):
+        return {"queued_connections": self.conexoes_na_fila(), "rejected_connections": self.conexoes_rejeitadas}
+
+    def conexoes_na_fila(self):
+        return self.fila_conexoes.qsize() if self.modo == 'pool' else self.esperando_vaga
+
+    def estatisticas_leves(self):
+        estatisticas = {"queued": self.conexoes_na_fila(), "rejected": self.conexoes_rejeitadas}
+        if self.modo == 'pool':
+            estatisticas["queue_limit"] = self.fila_conexoes.maxsize
         else:
-            return self.criar_resposta_http(404,"<h1>404 - Recurso Não Encontrado</h1><p>Use: /, /info, /status, /heavy, /health</p>")
-    
-    def processar_requisicao_post(self, caminho,cabecalhos, corpo):
-        if not self.validar_id_personalizado(cabecalhos):
-            return self.criar_resposta_http(400, "<h1>400 - X-Custom-ID inválido ou ausente</h1>")
-        
-        with self.lock_contador:
-            self.contador_requisicoes += 1
-            contador_atual = self.contador_requisicoes
-        
-        if caminho == '/api/data':
-            tempo_processamento = 0.1
-            time.sleep(tempo_processamento)
-            
-            dados_resposta = {
-                "status": "processed",
-                "data_received": corpo,
-                "data_length": len(corpo),
-                "processing_time": f"{tempo_processamento}s",
-                "processed_at": datetime.now().isoformat(),
-                "request_id": contador_atual,
-                "thread": threading.current_thread().name,
-                "custom_id": self.id_personalizado
-            }
-            return self.criar_resposta_http(200, json.dumps(dados_resposta,indent=2), "application/json")
-            
-        elif caminho == '/api/echo':
-            resposta_echo = {
-                "echo": corpo,
-                "timestamp": datetime.now().isoformat(),
-                "received_bytes": len(corpo),
-                "thread": threading.current_thread().name
-            }
-            return self.criar_resposta_http(200, json.dumps(resposta_echo,indent=2), "application/json")
-            
-        elif caminho == '/api/batch':
-            time.sleep(0.5)
-            resposta_lote = {
-                "operation": "batch_processing",
-                "items_processed": len(corpo.split(',')),
-                "processing_time": "0.5s",
-                "thread": threading.current_thread().name,
-                "timestamp": datetime.now().isoformat()
-            }
-            return self.criar_resposta_http(200, json.dumps(resposta_lote, indent=2), "application/json")
-            
-        else:
-            return self.criar_resposta_http(404, "<h1>404 - Endpoint POST não encontrado</h1>")
+            # Sem limite de espera no modo thread: quem passa das vagas fica parado no semaforo
+            estatisticas["slots"] = self.vagas_thread
+        return estatisticas
+
+    def rota_metrics(self, requisicao):
+        # Com prefork cada processo tem o seu registro: a resposta cobre so o worker que atendeu
+        extras = [
+            ("server_active_threads", "gauge", "Threads vivas no processo", threading.active_count()),
+            ("server_queued_connections", "gauge", "Conexoes esperando vaga (fila do pool ou semaforo)",
+             self.conexoes_na_fila()),
+            ("server_rejected_connections_total", "counter", "Conexoes rejeitadas com 503 (fila cheia)",
+             self.conexoes_rejeitadas),
+            ("server_requests_processed_total", "counter", "Requisicoes roteadas por todos os processos",
+             self.total_requisicoes())
+        ]
+        if self.executor_pesado is not None:
+            pesado = self.executor_pesado.estatisticas()
+            extras += [
+                ("server_heavy_running", "gauge", "Rotas pesadas executando", pesado["running"]),
+                ("server_heavy_queued", "gauge", "Rotas pesadas na fila do executor", pesado["queued"]),
+                ("server_heavy_rejected_total", "counter", "Rotas pesadas rejeitadas com 503", pesado["rejected"])
+            ]
+        return self.criar_resposta_http(200, self.metricas.exportar(extras), "text/plain; version=0.0.4")
+
+    def rota_perfil(self, requisicao):
+        codigo, corpo = self.perfil.responder(requisicao.caminho, requisicao.query)
+        return self.criar_resposta_http(codigo, corpo, "application/json")
+
+    def rota_heavy(self, requisicao):
+        conteudo = {
+            "operation": "heavy_processing",
+            "duration": "2 seconds",
+            "thread": threading.current_thread().name,
+            "timestamp": datetime.now().isoformat()
+        }
+        return self.criar_resposta_http(200, json.dumps(conteudo, indent=2), "application/json")
+
+    def rota_health(self, requisicao):
+        health_info = {
+            "status": "healthy", 
+            "server": self.NOME_SERVIDOR,
+            "threads_ativas": threading.active_count(),
+            "timestamp": datetime.now().isoformat()
+        }
+        return self.criar_resposta_http(200, json.dumps(health_info, indent=2), "application/json")
+
+    def arquivo_estatico(self, requisicao):
+        return self.servidor_arquivos.responder(requisicao, self.criar_resposta_http)
+
+    def api_data(self, requisicao):
+        corpo = requisicao.texto_corpo()
+        dados_resposta = {
+            "status": "processed",
+            "data_received": corpo,
+            "data_length": len(corpo),
+            "processing_time": "0.1s",
+            "processed_at": datetime.now().isoformat(),
+            "request_id": requisicao.numero,
+            "thread": threading.current_thread().name,
+            "custom_id": self.id_personalizado
+        }
+        return self.criar_resposta_http(200, json.dumps(dados_resposta,indent=2), "application/json")
+
+    def api_echo(self, requisicao):
+        corpo = requisicao.texto_corpo()
+        resposta_echo = {
+            "echo": corpo,
+            "timestamp": datetime.now().isoformat(),
+            "received_bytes": len(corpo),
+            "thread": threading.current_thread().name
+        }
+        return self.criar_resposta_http(200, json.dumps(resposta_echo,indent=2), "application/json")
+
+    def api_batch(self, requisicao):
+        resposta_lote = {
+            "operation": "batch_processing",
+            "items_processed": len(requisicao.texto_corpo().split(',')),
+            "processing_time": "0.5s",
+            "thread": threading.current_thread().name,
+            "timestamp": datetime.now().isoformat()
+        }
+        return self.criar_resposta_http(200, json.dumps(resposta_lote, indent=2), "application/json")
     
     def processar_cliente(self,socket_cliente,endereco_cliente):
-        with self.semaphore:
-            nome_thread = threading.current_thread().name
-            tempo_inicio = time.time()
-            
-            try:
-                dados_requisicao = b""
-                socket_cliente.settimeout(10.0)
-                
-                while True:
-                    pedaco = socket_cliente.recv(1024)
-                    if not pedaco:
-                        break
-                    dados_requisicao += pedaco
-                    if b'\r\n\r\n' in dados_requisicao:
-                        break
-                
-                if not dados_requisicao:
-                    return
-                
-                texto_requisicao = dados_requisicao.decode('utf-8',errors='ignore')
-                metodo, caminho, cabecalhos, corpo = self.analisar_requisicao_http(texto_requisicao)
-                
-                print(f"[{nome_thread}] {endereco_cliente} - {metodo} {caminho}")
-                
-                if metodo == 'GET':
-                    resposta = self.processar_requisicao_get(caminho, cabecalhos)
-                elif metodo == 'POST':
-                    resposta = self.processar_requisicao_post(caminho, cabecalhos, corpo)
-                elif metodo == 'HEAD':
-                    if caminho == '/':
-                        resposta = self.criar_resposta_http(200, "", "text/html")
-                    else:
-                        resposta = self.criar_resposta_http(404, "")
-                else:
-                    resposta = self.criar_resposta_http(405, "<h1>405 - Método Não Permitido</h1>")
-                
-                socket_cliente.send(resposta.encode('utf-8'))
+        inicio_espera = time.perf_counter_ns()
+        self.ocupar_vaga()
+        try:
+            espera = time.perf_counter_ns() - inicio_espera
+            self.metricas.observar('server_queue_wait_seconds', espera / 1e9)
+            self.atender_conexao(socket_cliente, endereco_cliente, espera)
+        finally:
+            self.semaphore.release()
+
+    def ocupar_vaga(self):
+        # Sem vaga livre a thread entra na conta de espera ate o semaforo liberar
+        if self.semaphore.acquire(blocking=False):
+            return
+        with self.lock_espera:
+            self.esperando_vaga += 1
+        try:
+            self.semaphore.acquire()
+        finally:
+            with self.lock_espera:
+                self.esperando_vaga -= 1
+
+    def ler_requisicao(self, socket_cliente, parser, rastreio=RASTREIO_DESLIGADO):
+        # Bytes a mais (pipelining) ficam guardados no parser para a proxima chamada
+        while True:
+            requisicao = parser.proxima_requisicao()
+            if requisicao is not None:
+                rastreio.marcar('parse')
+                return requisicao
+            if parser.pedir_continuacao():
+                socket_cliente.sendall(RESPOSTA_CONTINUE)
+            pedaco = socket_cliente.recv(65536)
+            if not pedaco:
+                return None
+            rastreio.recebido()
+            self.metricas.incrementar('http_received_bytes_total', valor=len(pedaco))
+            parser.alimentar(pedaco)
+
+    def atender_conexao(self, socket_cliente, endereco_cliente, espera_fila=0):
+        # espera_fila: ns que a conexao esperou por uma vaga, atribuidos a primeira requisicao
+        registro = self.registro_acesso
+        metricas = self.metricas
+        parser = ParserHttp(self.max_cabecalhos, self.max_corpo)
+        requisicoes_atendidas = 0
+        em_andamento = False
+        
+        try:
+            while True:
+                # A primeira requisicao tem 10s para chegar; as seguintes seguem o tempo ocioso do keep-alive
+                socket_cliente.settimeout(self.tempo_ocioso if requisicoes_atendidas else 10.0)
+                rastreio = self.rastreador.novo(0 if requisicoes_atendidas else espera_fila)
+                requisicao = self.ler_requisicao(socket_cliente, parser, rastreio)
+                if requisicao is None:
+                    break
+
+                tempo_inicio = time.perf_counter()
+                requisicoes_atendidas += 1
+                manter_conexao = (self.deve_manter_conexao(requisicao.versao, requisicao.cabecalhos)
+                                  and requisicoes_atendidas < self.max_requisicoes_conexao)
+                metricas.inicio_requisicao()
+                em_andamento = True
                 
-                tempo_processamento = time.time() - tempo_inicio
-                print(f"[{nome_thread}] Resposta enviada em {tempo_processamento:.3f}s")
+                resposta = self.despachar_requisicao(requisicao)
+                rastreio.marcar('handler')
+                incluir_corpo = requisicao.metodo != 'HEAD'
+                enviados = self.construtor_respostas.enviar(socket_cliente, resposta, manter_conexao,
+                                                            incluir_corpo=incluir_corpo, rastreio=rastreio)
                 
-            except socket.timeout:
+                duracao = time.perf_counter() - tempo_inicio
+                em_andamento = False
+                metricas.fim_requisicao(requisicao.rota, requisicao.metodo, resposta.codigo, duracao, enviados)
+                self.rastreador.finalizar(rastreio, requisicao.metodo, requisicao.caminho, resposta.codigo)
+                registro.acesso(endereco_cliente, requisicao.metodo, requisicao.caminho, resposta.codigo,
+                                resposta.tamanho_corpo() if incluir_corpo else 0, duracao)
+
+                if not manter_conexao:
+                    break
+            
+        except ErroHttp as e:
+            resposta_erro = self.criar_resposta_http(e.codigo, f"<h1>{e.codigo} - {e.mensagem}</h1>")
+            metricas.requisicao_invalida(e.codigo, self.construtor_respostas.enviar(socket_cliente, resposta_erro))
+            registro.evento('aviso', f"Requisicao invalida de {endereco_cliente}: {e.mensagem}")
+        except socket.timeout:
+            # Conexao keep-alive ociosa fecha em silencio; requisicao incompleta recebe 408
+            if requisicoes_atendidas == 0 or parser.pendente():
                 resposta_erro = self.criar_resposta_http(408, "<h1>408 - Timeout</h1>")
-                socket_cliente.send(resposta_erro.encode('utf-8'))
-                print(f"[{nome_thread}] Timeout com {endereco_cliente}")
-            except Exception as e:
-                resposta_erro = self.criar_resposta_http(500, f"<h1>500 - Erro Interno</h1><p>{str(e)}</p>")
-                socket_cliente.send(resposta_erro.encode('utf-8'))
-                print(f"[{nome_thread}] Erro: {e}")
-            finally:
-                socket_cliente.close()
-                print(f"[{nome_thread}] Conexao fechada: {endereco_cliente}")
+                metricas.requisicao_invalida(408, self.construtor_respostas.enviar(socket_cliente, resposta_erro))
+                registro.evento('aviso', f"Timeout com {endereco_cliente}")
+        except Exception as e:
+            # Registra antes do envio: se o envio do 500 tambem falhar, o gauge em andamento nao fica preso
+            if em_andamento:
+                metricas.fim_requisicao(requisicao.rota, requisicao.metodo, 500, time.perf_counter() - tempo_inicio, 0)
+            resposta_erro = self.criar_resposta_http(500, f"<h1>500 - Erro Interno</h1><p>{str(e)}</p>")
+            self.construtor_respostas.enviar(socket_cliente, resposta_erro)
+            registro.evento('erro', f"Erro com {endereco_cliente}: {e}")
+        finally:
+            socket_cliente.close()
+            registro.evento('debug', f"Conexao fechada: {endereco_cliente}")
     
-    def iniciar(self):
+    def trabalhador_pool(self):
+        while True:
+            socket_cliente, endereco_cliente, instante_fila = self.fila_conexoes.get()
+            espera = time.perf_counter_ns() - instante_fila
+            self.metricas.observar('server_queue_wait_seconds', espera / 1e9)
+            try:
+                self.atender_conexao(socket_cliente, endereco_cliente, espera)
+            finally:
+                self.fila_conexoes.task_done()
+
+    def iniciar_pool(self):
+        for i in range(self.num_trabalhadores):
+            trabalhador = threading.Thread(target=self.trabalhador_pool, name=f"Worker-{i + 1}")
+            trabalhador.daemon = True
+            trabalhador.start()
+
+    def rejeitar_conexao(self, socket_cliente, endereco_cliente):
+        self.conexoes_rejeitadas += 1
+        try:
+            resposta = self.criar_resposta_http(503, "<h1>503 - Servidor Sobrecarregado</h1>",
+                                                cabecalhos_personalizados={"Retry-After": "1"})
+            socket_cliente.settimeout(1.0)
+            self.construtor_respostas.enviar(socket_cliente, resposta)
+            # Descarta o que ja chegou da requisicao para o close nao gerar RST
+            socket_cliente.shutdown(socket.SHUT_WR)
+            socket_cliente.setblocking(False)
+            socket_cliente.recv(65536)
+        except OSError:
+            pass
+        finally:
+            socket_cliente.close()
+        self.registro_acesso.evento('aviso', f"Fila cheia, conexao rejeitada: {endereco_cliente}")
+
+    def despachar_conexao(self, socket_cliente, endereco_cliente):
+        if self.modo == 'thread':
+            thread_cliente = threading.Thread(
+                target=self.processar_cliente,
+                args=(socket_cliente, endereco_cliente),
+                name=f"Thread-{threading.active_count()}"
+            )
+            thread_cliente.daemon = True
+            thread_cliente.start()
+            
+            if self.registro_acesso.habilitado('debug'):
+                self.registro_acesso.evento('debug', f"Thread iniciada: {thread_cliente.name}, "
+                                                     f"threads ativas: {threading.active_count() - 1}")
+            return
+
+        if self.politica_sobrecarga == 'backlog':
+            # Bloqueia o accept ate abrir vaga: as proximas conexoes esperam no backlog do kernel
+            self.fila_conexoes.put((socket_cliente, endereco_cliente, time.perf_counter_ns()))
+            return
+
+        try:
+            self.fila_conexoes.put_nowait((socket_cliente, endereco_cliente, time.perf_counter_ns()))
+        except queue.Full:
+            self.rejeitar_conexao(socket_cliente, endereco_cliente)
+
+    def criar_socket_servidor(self, reuseport=False):
         socket_servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         socket_servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuseport:
+            # Cada processo tem seu proprio socket na mesma porta; o kernel distribui as conexoes
+            socket_servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         socket_servidor.bind((self.host, self.porta))
         socket_servidor.listen(10)
-        
+        return socket_servidor
+
+    def exibir_cabecalho(self):
         print("=" * 70)
         print("SERVIDOR CONCORRENTE - SOCKETS BRUTOS")
         print("=" * 70)
@@ -276,34 +563,132 @@ class ServidorConcorrente:
         print(f"X-Custom-ID: {self.id_personalizado}")
         print(f"MATRicula:20229043792")
         print(f"Nome: Victor Rodrigues Luz")
-        print("Endpoints: GET /, /info, /status, /heavy, /health")
+        print("Endpoints: GET /, /info, /status, /metrics, /heavy, /health")
         print("Endpoints: POST /api/data, /api/echo, /api/batch")
+        if self.executor_pesado is not None:
+            print(f"Rotas pesadas: executor {self.executor_pesado.tipo} ({self.executor_pesado.num_trabalhadores} workers, fila {self.executor_pesado.tamanho_fila})")
+        if self.modo == 'pool':
+            print(f"Modo: pool ({self.num_trabalhadores} workers, fila {self.fila_conexoes.maxsize}, sobrecarga: {self.politica_sobrecarga})")
+        else:
+            print("Modo: thread por conexao")
         print("Digite Ctrl+C para encerrar")
         print("=" * 70)
+
+    def laco_aceitacao(self, socket_servidor):
+        if self.modo == 'pool':
+            self.iniciar_pool()
         
         try:
             while True:
                 socket_cliente, endereco_cliente = socket_servidor.accept()
-                print(f"\n[Main] Conexao aceita: {endereco_cliente}")
-                
-                thread_cliente = threading.Thread(
-                    target=self.processar_cliente,
-                    args=(socket_cliente, endereco_cliente),
-                    name=f"Thread-{threading.active_count()}"
-                )
-                thread_cliente.daemon = True
-                thread_cliente.start()
-                
-                print(f"[Main] Thread iniciada: {thread_cliente.name}")
-                print(f"[Main] Threads ativas: {threading.active_count() - 1}")
+                self.registro_acesso.evento('debug', f"Conexao aceita: {endereco_cliente}")
+                self.despachar_conexao(socket_cliente, endereco_cliente)
                 
         except KeyboardInterrupt:
             print("\n[Main] Encerrando servidor...")
         except Exception as e:
             print(f"\n[Main] Erro: {e}")
+            self.registro_acesso.evento('erro', f"Laco de aceitacao interrompido: {e!r}")
+            raise
         finally:
             socket_servidor.close()
+            self.registro_acesso.encerrar()
+
+    def iniciar(self):
+        socket_servidor = self.criar_socket_servidor()
+        self.exibir_cabecalho()
+        # Falhas no accept ja foram registradas; propagam para o processo sair com codigo != 0
+        self.laco_aceitacao(socket_servidor)
+
+    def criar_processo_trabalhador(self, indice, socket_compartilhado):
+        pid = os.fork()
+        if pid != 0:
+            return pid
+
+        # Processo filho: retoma o contador do slot (caso esteja substituindo um worker que caiu)
+        codigo_saida = 0
+        try:
+            self.indice_processo = indice
+            self.contador_requisicoes = ContadorRequisicoes(self.contadores_processos[indice])
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            if socket_compartilhado is None:
+                socket_servidor = self.criar_socket_servidor(reuseport=True)
+            else:
+                socket_servidor = socket_compartilhado
+            print(f"[Worker {indice}] PID {os.getpid()} aceitando conexoes")
+            self.laco_aceitacao(socket_servidor)
+        except BaseException:
+            codigo_saida = 1
+        finally:
+            os._exit(codigo_saida)
+
+    def iniciar_prefork(self, num_processos, reuseport=True):
+        # Sem SO_REUSEPORT o master cria um unico socket e os filhos herdam no fork
+        socket_compartilhado = None if reuseport else self.criar_socket_servidor()
+        self.contadores_processos = multiprocessing.Array('q', num_processos, lock=False)
+        self.exibir_cabecalho()
+        print(f"[Master] Prefork: {num_processos} processos ({'SO_REUSEPORT' if reuseport else 'socket herdado'})")
+
+        processos = {}
+        inicio_processos = {}
+        for indice in range(num_processos):
+            processos[self.criar_processo_trabalhador(indice, socket_compartilhado)] = indice
+            inicio_processos[indice] = time.time()
+
+        try:
+            while True:
+                pid, status = os.wait()
+                indice = processos.pop(pid, None)
+                if indice is None:
+                    continue
+                print(f"[Master] Worker {indice} (PID {pid}) terminou com status {status}, reiniciando")
+                # Evita loop de fork se o worker morre logo ao subir (ex.: porta ocupada)
+                if time.time() - inicio_processos[indice] < 1.0:
+                    time.sleep(1.0)
+                processos[self.criar_processo_trabalhador(indice, socket_compartilhado)] = indice
+                inicio_processos[indice] = time.time()
+        except KeyboardInterrupt:
+            print("\n[Master] Encerrando workers...")
+        finally:
+            for pid in processos:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+            for pid in processos:
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+            if socket_compartilhado is not None:
+                socket_compartilhado.close()
+            print(f"[Master] Total de requisicoes atendidas: {self.total_requisicoes()}")
 
 if __name__ == "__main__":
-    servidor = ServidorConcorrente()
-    servidor.iniciar()
\ No newline at end of file
+    servidor = ServidorConcorrente(
+        modo=os.environ.get('MODO_CONCORRENCIA', 'thread'),
+        num_trabalhadores=int(os.environ.get('NUM_TRABALHADORES', '50')),
+        tamanho_fila=int(os.environ.get('TAMANHO_FILA', '100')),
+        politica_sobrecarga=os.environ.get('POLITICA_SOBRECARGA', 'rejeitar'),
+        tempo_ocioso=float(os.environ.get('TEMPO_OCIOSO', '5')),
+        max_requisicoes_conexao=int(os.environ.get('MAX_REQUISICOES_CONEXAO', '100')),
+        max_corpo=int(os.environ.get('MAX_CORPO', str(1024 * 1024))),
+        rotas_cache=carregar_rotas_cache(os.environ.get('CACHE_ROTAS', '')),
+        raiz_documentos=os.environ.get('RAIZ_DOCUMENTOS') or None,
+        trabalhadores_pesados=int(os.environ.get('TRABALHADORES_PESADOS', '0')),
+        fila_pesada=int(os.environ.get('FILA_PESADA', '16')),
+        tipo_executor_pesado=os.environ.get('EXECUTOR_PESADO', 'thread'),
+        nivel_log=os.environ.get('NIVEL_LOG', 'info'),
+        amostragem_log=float(os.environ.get('AMOSTRAGEM_LOG', '1')),
+        fila_log=int(os.environ.get('FILA_LOG', '10000')),
+        formato_log=os.environ.get('FORMATO_LOG', 'texto'),
+        rastreio=os.environ.get('RASTREIO', '0') == '1',
+        amostragem_rastreio=float(os.environ.get('AMOSTRAGEM_RASTREIO', '0.01')),
+        duracao_perfil=float(os.environ.get('PERFIL_DURACAO', '30')),
+        intervalo_perfil=float(os.environ.get('PERFIL_INTERVALO_MS', '10')) / 1000
+    )
+    num_processos = int(os.environ.get('PROCESSOS', '1'))
+    if num_processos > 1:
+        servidor.iniciar_prefork(num_processos, reuseport=os.environ.get('REUSEPORT', '1') == '1')
+    else:
+        servidor.iniciar()
\ No newline at end of file
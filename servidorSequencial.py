@@ -3,14 +3,63 @@ import hashlib
 from datetime import datetime
 import time
 import json
+import os
+
+from parserHttp import ParserHttp, ErroHttp, RESPOSTA_CONTINUE
+from respostaHttp import ConstrutorRespostas
+from cacheRespostas import CacheRespostas, carregar_rotas_cache
+from roteador import Roteador
+from arquivosEstaticos import ServidorArquivos
+from registroAcesso import RegistroAcesso
+from metricasServidor import RegistroMetricas
+from rastreamento import Rastreador, RASTREIO_DESLIGADO
+from perfilAmostragem import PerfilAmostragem
 
 class ServidorSequencial:
-    def __init__(self,host='37.92.0.10',porta=80):
+    def __init__(self,host='37.92.0.10',porta=80, tempo_ocioso=2.0, max_requisicoes_conexao=100,
+                 max_cabecalhos=8192, max_corpo=1024 * 1024, rotas_cache=None, max_entradas_cache=128,
+                 raiz_documentos=None, prefixo_estatico='/static/', nivel_log='info', amostragem_log=1.0,
+                 fila_log=10000, formato_log='texto', rastreio=False, amostragem_rastreio=0.01,
+                 duracao_perfil=30.0, intervalo_perfil=0.01):
         self.host = host # IP do servidor
         self.porta = porta
         self.id_personalizado = self.calcular_id_personalizado() # X-Custom
         self.contador_requisicoes = 0
 
+        # Keep-alive: enquanto uma conexao fica aberta ninguem mais e atendido,
+        # por isso o tempo ocioso padrao e menor que o do concorrente
+        self.tempo_ocioso = tempo_ocioso
+        self.max_requisicoes_conexao = max_requisicoes_conexao
+        self.max_cabecalhos = max_cabecalhos
+        self.max_corpo = max_corpo
+
+        # Bloco de cabecalhos fixo pre-montado em bytes
+        self.construtor_respostas = ConstrutorRespostas("Sequencial-Socket/Redes-II", self.id_personalizado,
+                                                        tempo_ocioso, max_requisicoes_conexao)
+
+        # Cache opcional (ex.: {'/health': 1.0}); dentro do TTL contador e timestamp ficam defasados
+        self.cache_respostas = CacheRespostas(rotas_cache, max_entradas_cache) if rotas_cache else None
+
+        self.servidor_arquivos = ServidorArquivos(raiz_documentos) if raiz_documentos else None
+        self.prefixo_estatico = prefixo_estatico.rstrip('/') + '/'
+
+        # Log de acesso fora do laco de atendimento: a unica thread que atende nao espera o stdout
+        self.registro_acesso = RegistroAcesso(nivel_log, amostragem_log, fila_log, formato=formato_log)
+
+        # Metricas para o Prometheus (GET /metrics); aqui so a thread principal grava
+        self.metricas = RegistroMetricas()
+
+        # Rastreio por etapa (Server-Timing + amostras no log); sem fila: o backlog do kernel nao e visivel daqui
+        self.rastreador = Rastreador(rastreio, amostragem_rastreio, self.registro_acesso)
+
+        # Profiler por amostragem (POST /admin/profile/start ou SIGUSR1): parado nao custa nada
+        self.perfil = PerfilAmostragem(prefixo="perfil_sequencial", registro=self.registro_acesso,
+                                       duracao=duracao_perfil, intervalo=intervalo_perfil)
+        self.perfil.instalar_sinal()
+
+        self.roteador = Roteador()
+        self.registrar_rotas()
+
 
     def calcular_id_personalizado(self):
         mat = "20229043792"
@@ -20,86 +69,82 @@ class ServidorSequencial:
         return hashlib.md5(dados.encode()).hexdigest()
 
     def analisar_requisicao_http(self, dados):
+        # Compatibilidade: o atendimento usa o ParserHttp incremental direto
         try:
-            linhas = dados.split('\r\n')
-            if len(linhas) == 0:
-                return None, None, {}, ''
-
-            primeira_linha = linhas[0].split()
-            if len(primeira_linha) < 3:
+            parser = ParserHttp(self.max_cabecalhos, self.max_corpo)
+            parser.alimentar(dados.encode('utf-8') if isinstance(dados, str) else dados)
+            req = parser.proxima_requisicao()
+            if req is None:
                 return None, None, {}, ''
-
-            metodo = primeira_linha[0]
-            caminho = primeira_linha[1]
-            
-            cabecalhos = {}
-            corpo = ''
-            achou_vazio = False
-
-            for i in range(1, len(linhas)):
-                linha_atual = linhas[i]
-                
-                if linha_atual == '':
-                    achou_vazio = True
-                    continue
-                    
-                if achou_vazio:
-                    corpo += linha_atual
-                
-                else:
-                    if ':' in linha_atual:
-                        partes = linha_atual.split(':', 1)
-                        chave = partes[0].strip()
-                        valor = partes[1].strip()
-                        cabecalhos[chave] = valor
-
-            return metodo, caminho, cabecalhos, corpo.strip()
-            
-        except:
+            return req.metodo, req.caminho, req.cabecalhos, req.texto_corpo()
+        except ErroHttp:
             return None, None, {}, ''
     
     '''Verifica se o X-Custom(id unico'''
     def validar_id_personalizado(self,cabecalhos):
-        return cabecalhos.get('X-Custom-ID') == self.id_personalizado
+        return cabecalhos.get('x-custom-id') == self.id_personalizado
     
     '''Cria uma resposta http'''
     def criar_resposta_http(self,cod_status,conteudo,tipo_conteudo="text/html", cabecalhos_psl=None):
-        mensagens_status = {
-            200: "OK",
-            400: "Bad Request",
-            404: "Not Found",
-            405: "Method Not Allowed",
-            500: "Internal Server Error"
-        }
+        return self.construtor_respostas.criar(cod_status, conteudo, tipo_conteudo, cabecalhos_psl)
 
-        resposta = f"HTTP/1.1 {cod_status} {mensagens_status.get(cod_status, 'Unknown')}\r\n"
-
-        resposta += f"Content-Type: {tipo_conteudo}; charset=utf-8\r\n"
-        resposta += f"X-Custom-ID: {self.id_personalizado}\r\n"
-        resposta += f"Server: Sequencial-Socket/Redes-II\r\n"
-        resposta += f"Date: {datetime.now().strftime('%a, %d %b %Y %H:%M:%S GMT')}\r\n"
-        resposta += f"Content-Length: {len(conteudo.encode('utf-8'))}\r\n"
-        resposta += "Connection: close\r\n"
-        
-        if cabecalhos_psl:
-            for chave, valor in cabecalhos_psl.items():
-                resposta += f"{chave}: {valor}\r\n"
-        
-        resposta += "\r\n"
-        resposta += conteudo
-        
-        return resposta
+    def deve_manter_conexao(self, versao, cabecalhos):
+        conexao = cabecalhos.get('connection', '').lower()
+        if versao == 'HTTP/1.0':
+            return conexao == 'keep-alive'
+        return conexao != 'close'
     
-    def processar_requisicao_get(self, caminho,cabecalhos):
-        if not self.validar_id_personalizado(cabecalhos):
+    def registrar_rotas(self):
+        self.roteador.registrar('GET', '/', self.pagina_inicial)
+        self.roteador.registrar('GET', '/index.html', self.pagina_inicial)
+        self.roteador.registrar('GET', '/info', self.rota_info)
+        self.roteador.registrar('GET', '/status', self.rota_status)
+        self.roteador.registrar('GET', '/metrics', self.rota_metrics)
+        self.roteador.registrar('GET', '/admin/profile', self.rota_perfil)
+        self.roteador.registrar('POST', '/admin/profile/start', self.rota_perfil)
+        self.roteador.registrar('POST', '/admin/profile/stop', self.rota_perfil)
+        self.roteador.registrar('GET', '/health', self.rota_health)
+        self.roteador.registrar('POST', '/api/data', self.api_data, atraso=0.01)
+        self.roteador.registrar('POST', '/api/echo', self.api_echo)
+        if self.servidor_arquivos is not None:
+            self.roteador.registrar('GET', self.prefixo_estatico + '*', self.arquivo_estatico)
+
+    def despachar_requisicao(self, req):
+        if not self.validar_id_personalizado(req.cabecalhos):
             return self.criar_resposta_http(400, "<h1>400 - X-Custom-ID inválido ou ausente</h1>")
-        
+
+        resultado = self.roteador.resolver(req.metodo, req.alvo)
+        req.caminho = resultado.caminho
+        req.query = resultado.query
+        if resultado.rota is None:
+            if resultado.permitidos:
+                return self.criar_resposta_http(405, "<h1>405 - Método Não Permitido</h1>",
+                                                cabecalhos_psl={"Allow": ", ".join(resultado.permitidos)})
+            if req.metodo == 'POST':
+                return self.criar_resposta_http(404, "<h1>404 - Endpoint POST não encontrado</h1>")
+            return self.criar_resposta_http(404, "<h1>404 - Recurso Não Encontrado</h1><p>Use: /, /info, /status</p>")
+
+        req.rota = resultado.rota.padrao
+        req.parametros = resultado.parametros
         self.contador_requisicoes += 1
+        req.numero = self.contador_requisicoes
 
+        usa_cache = self.cache_respostas is not None and req.metodo != 'POST'
+        if usa_cache:
+            resposta = self.cache_respostas.obter(req.caminho)
+            if resposta is not None:
+                return resposta
 
+        if resultado.rota.atraso:
+            time.sleep(resultado.rota.atraso)
+        resposta = resultado.rota.funcao(req)
+
+        if usa_cache and resposta.codigo == 200 and resposta.arquivo is None:
+            self.cache_respostas.guardar(req.caminho, resposta)
+        return resposta
 
-        if caminho == '/' or caminho == '/index.html':
-            conteudo = f"""
+    def pagina_inicial(self, req):
+        conteudo = f"""
 <!DOCTYPE html>
 <html>
 <head>
@@ -110,124 +155,146 @@ class ServidorSequencial:
     <h1>Servidor Web Sequencial com Sockets Brutos</h1>
     <p><strong>Matrícula:</strong> 20229043792</p>
     <p><strong>Nome:</strong> Victor Rodrigues Luz</p>
-    <p><strong>Requisição nº:</strong> {self.contador_requisicoes}</p>
+    <p><strong>Requisição nº:</strong> {req.numero}</p>
     <p><strong>Timestamp:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
     <p><strong>X-Custom-ID:</strong> {self.id_personalizado}</p>
     <p><strong>Tipo:</strong> Sequencial (Socket TCP Bruto)</p>
 </body>
 </html>
 """
-            return self.criar_resposta_http(200, conteudo, "text/html")
-            
-        elif caminho == '/info':
-            info = {
-                "servidor": "sequencial_socket",
-                "matricula": "20229043792",
-                "nome": "Victor Rodrigues Luz",
-                "custom_id": self.id_personalizado,
-                "timestamp": datetime.now().isoformat(),
-                "request_count": self.contador_requisicoes,
-                "protocol": "TCP/Socket"
-            }
-
-            return self.criar_resposta_http(200, json.dumps(info, indent=2), "application/json")
-            
-        elif caminho == '/status':
-            status_info = {
-                "status": "online",
-                "server_type": "sequential",
-                "requests_processed": self.contador_requisicoes,
-                "uptime": "since_start",
-                "custom_id_valid": True
-            }
-            return self.criar_resposta_http(200, json.dumps(status_info, indent=2), "application/json")
-
-        elif caminho == '/health':
-            health_info = {
-                "status": "healthy",
-                "server": "sequencial",
-                "timestamp": datetime.now().isoformat()
-            }
-            return self.criar_resposta_http(200, json.dumps(health_info, indent=2), "application/json")
-
-        else:
-            return self.criar_resposta_http(404, "<h1>404 - Recurso Não Encontrado</h1><p>Use: /, /info, /status</p>")
-    
-    def processar_requisicao_post(self, caminho,cabecalhos, corpo):
-        if not self.validar_id_personalizado(cabecalhos):
-            return self.criar_resposta_http(400, "<h1>400 - X-Custom-ID inválido ou ausente</h1>")
-        
-        self.contador_requisicoes += 1
-        
-        if caminho == '/api/data':
-            time.sleep(0.01)
-            
-            dados_resposta = {
-                "status": "received",
-                "data_length": len(corpo),
-                "processed_at": datetime.now().isoformat(),
-                "request_id": self.contador_requisicoes,
-                "custom_id": self.id_personalizado
-            }
-            return self.criar_resposta_http(200, json.dumps(dados_resposta, indent=2), "application/json")
-            
-        elif caminho == '/api/echo':
-            resposta_echo = {
-                "echo": corpo,
-                "timestamp": datetime.now().isoformat(),
-                "received_bytes": len(corpo)
-            }
-            return self.criar_resposta_http(200, json.dumps(resposta_echo, indent=2), "application/json")
-            
-        else:
-            return self.criar_resposta_http(404, "<h1>404 - Endpoint POST não encontrado</h1>")
-    
+        return self.criar_resposta_http(200, conteudo, "text/html")
 
+    def rota_info(self, req):
+        info = {
+            "servidor": "sequencial_socket",
+            "matricula": "20229043792",
+            "nome": "Victor Rodrigues Luz",
+            "custom_id": self.id_personalizado,
+            "timestamp": datetime.now().isoformat(),
+            "request_count": req.numero,
+            "protocol": "TCP/Socket"
+        }
+
+        return self.criar_resposta_http(200, json.dumps(info, indent=2), "application/json")
+
+    def rota_status(self, req):
+        status_info = {
+            "status": "online",
+            "server_type": "sequential",
+            "requests_processed": req.numero,
+            "uptime": "since_start",
+            "custom_id_valid": True,
+            "response_cache": self.cache_respostas.estatisticas() if self.cache_respostas else None,
+            "access_log": self.registro_acesso.estatisticas()
+        }
+        return self.criar_resposta_http(200, json.dumps(status_info, indent=2), "application/json")
+
+    def rota_metrics(self, req):
+        extras = [("server_requests_processed_total", "counter", "Requisicoes roteadas", self.contador_requisicoes)]
+        return self.criar_resposta_http(200, self.metricas.exportar(extras), "text/plain; version=0.0.4")
+
+    def rota_perfil(self, req):
+        codigo, corpo = self.perfil.responder(req.caminho, req.query)
+        return self.criar_resposta_http(codigo, corpo, "application/json")
+
+    def rota_health(self, req):
+        health_info = {
+            "status": "healthy",
+            "server": "sequencial",
+            "timestamp": datetime.now().isoformat()
+        }
+        return self.criar_resposta_http(200, json.dumps(health_info, indent=2), "application/json")
+
+    def arquivo_estatico(self, req):
+        return self.servidor_arquivos.responder(req, self.criar_resposta_http)
+
+    def api_data(self, req):
+        dados_resposta = {
+            "status": "received",
+            "data_length": len(req.texto_corpo()),
+            "processed_at": datetime.now().isoformat(),
+            "request_id": req.numero,
+            "custom_id": self.id_personalizado
+        }
+        return self.criar_resposta_http(200, json.dumps(dados_resposta, indent=2), "application/json")
+
+    def api_echo(self, req):
+        corpo = req.texto_corpo()
+        resposta_echo = {
+            "echo": corpo,
+            "timestamp": datetime.now().isoformat(),
+            "received_bytes": len(corpo)
+        }
+        return self.criar_resposta_http(200, json.dumps(resposta_echo, indent=2), "application/json")
+
+    def ler_requisicao(self, socket_cliente, parser, rastreio=RASTREIO_DESLIGADO):
+        # O parser guarda o estado entre recv; bytes a mais (pipelining) ficam para a proxima
+        while True:
+            req = parser.proxima_requisicao()
+            if req is not None:
+                rastreio.marcar('parse')
+                return req
+            if parser.pedir_continuacao():
+                socket_cliente.sendall(RESPOSTA_CONTINUE)
+            pedaco = socket_cliente.recv(65536)
+            if not pedaco:
+                return None
+            rastreio.recebido()
+            self.metricas.incrementar('http_received_bytes_total', valor=len(pedaco))
+            parser.alimentar(pedaco)
 
     def processar_requisicao(self,socket_cliente, endereco_cliente):
+        registro = self.registro_acesso
+        metricas = self.metricas
+        parser = ParserHttp(self.max_cabecalhos, self.max_corpo)
+        atendidas = 0
+        em_andamento = False
         try:
-            dados_req = b""
-            socket_cliente.settimeout(5.0)
-            
             while True:
-                pedaco = socket_cliente.recv(1024)
-                if not pedaco:
+                socket_cliente.settimeout(self.tempo_ocioso if atendidas else 5.0)
+                rastreio = self.rastreador.novo()
+                req = self.ler_requisicao(socket_cliente, parser, rastreio)
+                if req is None:
                     break
-                
-                dados_req += pedaco
 
-                if b'\r\n\r\n' in dados_req:
-                    break
+                inicio = time.perf_counter()
+                atendidas += 1
+                manter_conexao = self.deve_manter_conexao(req.versao, req.cabecalhos) and atendidas < self.max_requisicoes_conexao
+                metricas.inicio_requisicao()
+                em_andamento = True
             
-            if not dados_req:
-                return
-            
-            texto_requisicao = dados_req.decode('utf-8', errors='ignore')
-            metodo, caminho, cabecalhos, corpo = self.analisar_requisicao_http(texto_requisicao)
-            
-            print(f"[Sequencial] {endereco_cliente} - {metodo} {caminho}")
-            
-            if metodo == 'GET':
-                resposta = self.processar_requisicao_get(caminho, cabecalhos)
-            elif metodo == 'POST':
-                resposta = self.processar_requisicao_post(caminho, cabecalhos, corpo)
-            elif metodo == 'HEAD':
-                if caminho == '/':
-                    conteudo = ""
-                    resposta = self.criar_resposta_http(200, conteudo, "text/html")
-                else:
-                    resposta = self.criar_resposta_http(404, "")
-            else:
-                resposta = self.criar_resposta_http(405, "<h1>405 - Método Não Permitido</h1>")
-            
-            socket_cliente.send(resposta.encode('utf-8'))
+                resposta = self.despachar_requisicao(req)
+                rastreio.marcar('handler')
+                incluir_corpo = req.metodo != 'HEAD'
+                enviados = self.construtor_respostas.enviar(socket_cliente, resposta, manter_conexao,
+                                                            incluir_corpo=incluir_corpo, rastreio=rastreio)
+
+                duracao = time.perf_counter() - inicio
+                em_andamento = False
+                metricas.fim_requisicao(req.rota, req.metodo, resposta.codigo, duracao, enviados)
+                self.rastreador.finalizar(rastreio, req.metodo, req.caminho, resposta.codigo)
+                registro.acesso(endereco_cliente, req.metodo, req.caminho, resposta.codigo,
+                                resposta.tamanho_corpo() if incluir_corpo else 0, duracao)
+
+                if not manter_conexao:
+                    break
             
+        except ErroHttp as e:
+            resposta_erro = self.criar_resposta_http(e.codigo, f"<h1>{e.codigo} - {e.mensagem}</h1>")
+            metricas.requisicao_invalida(e.codigo, self.construtor_respostas.enviar(socket_cliente, resposta_erro))
+            registro.evento('aviso', f"Requisicao invalida de {endereco_cliente}: {e.mensagem}")
         except socket.timeout:
-            resposta_erro = self.criar_resposta_http(408, "<h1>408 - Timeout</h1>")
-            socket_cliente.send(resposta_erro.encode('utf-8'))
+            # keep-alive ocioso: so fecha; requisicao incompleta: 408
+            if atendidas == 0 or parser.pendente():
+                resposta_erro = self.criar_resposta_http(408, "<h1>408 - Timeout</h1>")
+                metricas.requisicao_invalida(408, self.construtor_respostas.enviar(socket_cliente, resposta_erro))
+                registro.evento('aviso', f"Timeout com {endereco_cliente}")
         except Exception as e:
+            if em_andamento:
+                metricas.fim_requisicao(req.rota, req.metodo, 500, time.perf_counter() - inicio, 0)
             resposta_erro = self.criar_resposta_http(500, f"<h1>500 - Erro Interno</h1><p>{str(e)}</p>")
-            socket_cliente.send(resposta_erro.encode('utf-8'))
+            self.construtor_respostas.enviar(socket_cliente, resposta_erro)
+            registro.evento('erro', f"Erro com {endereco_cliente}: {e}")
         finally:
             socket_cliente.close()
     
@@ -241,7 +308,7 @@ class ServidorSequencial:
         
         print("SERVIDOR SEQUENCIAL - SOCKETS BRUTOS")
         print("=" * 70)
-        print("Endpoints: GET /, /info, /status, /health")
+        print("Endpoints: GET /, /info, /status, /metrics, /health")
         print("Endpoints: POST /api/data, /api/echo")
         print("servidor: " + self.host + ":" + str(self.porta))
         print("X-Custom-id:" + self.id_personalizado)
@@ -253,9 +320,9 @@ class ServidorSequencial:
         try:
             while True:
                 socket_cliente, endereco_clt = socket_serv.accept()
-                print(f"\n[Sequencial] Conexao foi aceita: {endereco_clt}")
+                self.registro_acesso.evento('debug', f"Conexao foi aceita: {endereco_clt}")
                 self.processar_requisicao(socket_cliente, endereco_clt)
-                print(f"[Sequencial] Requisicao foi concluida: {endereco_clt}")
+                self.registro_acesso.evento('debug', f"Conexao foi concluida: {endereco_clt}")
 
         except KeyboardInterrupt:
             print("\n[Sequencial] Encerrando servidor...")
@@ -263,7 +330,22 @@ class ServidorSequencial:
             print(f"\n[Sequencial] Erro: {e}")
         finally:
             socket_serv.close()
+            self.registro_acesso.encerrar()
 
 if __name__ == "__main__":
-    servidor = ServidorSequencial()
+    servidor = ServidorSequencial(
+        tempo_ocioso=float(os.environ.get('TEMPO_OCIOSO', '2')),
+        max_requisicoes_conexao=int(os.environ.get('MAX_REQUISICOES_CONEXAO', '100')),
+        max_corpo=int(os.environ.get('MAX_CORPO', str(1024 * 1024))),
+        rotas_cache=carregar_rotas_cache(os.environ.get('CACHE_ROTAS', '')),
+        raiz_documentos=os.environ.get('RAIZ_DOCUMENTOS') or None,
+        nivel_log=os.environ.get('NIVEL_LOG', 'info'),
+        amostragem_log=float(os.environ.get('AMOSTRAGEM_LOG', '1')),
+        fila_log=int(os.environ.get('FILA_LOG', '10000')),
+        formato_log=os.environ.get('FORMATO_LOG', 'texto'),
+        rastreio=os.environ.get('RASTREIO', '0') == '1',
+        amostragem_rastreio=float(os.environ.get('AMOSTRAGEM_RASTREIO', '0.01')),
+        duracao_perfil=float(os.environ.get('PERFIL_DURACAO', '30')),
+        intervalo_perfil=float(os.environ.get('PERFIL_INTERVALO_MS', '10')) / 1000
+    )
     servidor.iniciar()
\ No newline at end of file
@@ -0,0 +1,109 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parserHttp import ParserHttp, ErroHttp
+
+
+def alimentado(*pedacos, **limites):
+    parser = ParserHttp(**limites)
+    for pedaco in pedacos:
+        parser.alimentar(pedaco)
+    return parser
+
+
+class TesteParserHttp(unittest.TestCase):
+    def assertErroHttp(self, codigo, parser):
+        with self.assertRaises(ErroHttp) as contexto:
+            parser.proxima_requisicao()
+        self.assertEqual(contexto.exception.codigo, codigo)
+
+    def test_cabecalhos_divididos_entre_recv(self):
+        parser = ParserHttp()
+        mensagem = b"GET /info?x=1 HTTP/1.1\r\nHost: a\r\nX-Custom-ID: abc\r\n\r\n"
+        for i in range(len(mensagem) - 1):
+            parser.alimentar(mensagem[i:i + 1])
+            self.assertIsNone(parser.proxima_requisicao())
+        parser.alimentar(mensagem[-1:])
+        requisicao = parser.proxima_requisicao()
+        self.assertEqual((requisicao.metodo, requisicao.alvo, requisicao.versao), ('GET', '/info?x=1', 'HTTP/1.1'))
+        self.assertEqual(requisicao.cabecalhos['x-custom-id'], 'abc')
+        self.assertFalse(parser.pendente())
+
+    def test_corpo_com_content_length_em_pedacos(self):
+        parser = alimentado(b"POST /api/echo HTTP/1.1\r\nContent-Length: 5\r\n\r\nhe")
+        self.assertIsNone(parser.proxima_requisicao())
+        parser.alimentar(b"llo")
+        self.assertEqual(parser.proxima_requisicao().corpo, b"hello")
+
+    def test_chunked(self):
+        parser = alimentado(b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n",
+                            b"3;ext=1\r\nabc\r\n", b"A\r\n0123456789\r\n", b"0\r\nX-Trailer: 1\r\n\r\n")
+        self.assertEqual(parser.proxima_requisicao().corpo, b"abc0123456789")
+
+    def test_chunked_sem_crlf_depois_dos_dados(self):
+        parser = alimentado(b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n3\r\nabcXY0\r\n\r\n")
+        self.assertErroHttp(400, parser)
+
+    def test_tamanho_de_chunk_invalido(self):
+        parser = alimentado(b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\nabc\r\n")
+        self.assertErroHttp(400, parser)
+
+    def test_limite_do_corpo(self):
+        self.assertErroHttp(413, alimentado(b"POST / HTTP/1.1\r\nContent-Length: 11\r\n\r\n", max_corpo=10))
+        parser = alimentado(b"POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n6\r\nabcdef\r\n6\r\n", max_corpo=10)
+        self.assertErroHttp(413, parser)
+
+    def test_limite_dos_cabecalhos(self):
+        parser = alimentado(b"GET / HTTP/1.1\r\nX-Grande: " + b"a" * 200, max_cabecalhos=100)
+        self.assertErroHttp(431, parser)
+
+    def test_content_length_com_transfer_encoding(self):
+        parser = alimentado(b"POST / HTTP/1.1\r\nContent-Length: 3\r\nTransfer-Encoding: chunked\r\n\r\nabc")
+        self.assertErroHttp(400, parser)
+
+    def test_content_length_duplicado(self):
+        parser = alimentado(b"POST / HTTP/1.1\r\nContent-Length: 3\r\nContent-Length: 5\r\n\r\nabcde")
+        self.assertErroHttp(400, parser)
+        parser = alimentado(b"POST / HTTP/1.1\r\nContent-Length: 3\r\nContent-Length: 3\r\n\r\nabc")
+        self.assertEqual(parser.proxima_requisicao().corpo, b"abc")
+
+    def test_pipelining_deixa_o_resto_no_buffer(self):
+        parser = alimentado(b"GET /a HTTP/1.1\r\n\r\nPOST /b HTTP/1.1\r\nContent-Length: 2\r\n\r\nokGET /c HT")
+        self.assertEqual(parser.proxima_requisicao().alvo, '/a')
+        self.assertEqual(parser.proxima_requisicao().corpo, b"ok")
+        self.assertIsNone(parser.proxima_requisicao())
+        self.assertTrue(parser.pendente())
+        parser.alimentar(b"TP/1.1\r\n\r\n")
+        self.assertEqual(parser.proxima_requisicao().alvo, '/c')
+        self.assertFalse(parser.pendente())
+
+    def test_expect_100_continue(self):
+        parser = alimentado(b"POST / HTTP/1.1\r\nContent-Length: 5\r\nExpect: 100-continue\r\n\r\n")
+        self.assertIsNone(parser.proxima_requisicao())
+        self.assertTrue(parser.pedir_continuacao())
+        self.assertFalse(parser.pedir_continuacao())
+        parser.alimentar(b"hello")
+        self.assertEqual(parser.proxima_requisicao().corpo, b"hello")
+
+    def test_expect_100_continue_sem_continue(self):
+        # Corpo que ja chegou junto, HTTP/1.0 e corpo acima do limite nao recebem o 100
+        parser = alimentado(b"POST / HTTP/1.1\r\nContent-Length: 2\r\nExpect: 100-continue\r\n\r\nok")
+        self.assertEqual(parser.proxima_requisicao().corpo, b"ok")
+        self.assertFalse(parser.pedir_continuacao())
+        parser = alimentado(b"POST / HTTP/1.0\r\nContent-Length: 2\r\nExpect: 100-continue\r\n\r\n")
+        self.assertIsNone(parser.proxima_requisicao())
+        self.assertFalse(parser.pedir_continuacao())
+        parser = alimentado(b"POST / HTTP/1.1\r\nContent-Length: 11\r\nExpect: 100-continue\r\n\r\n", max_corpo=10)
+        self.assertErroHttp(413, parser)
+        self.assertFalse(parser.pedir_continuacao())
+
+    def test_linha_de_requisicao_invalida(self):
+        self.assertErroHttp(400, alimentado(b"GET /\r\n\r\n"))
+        self.assertErroHttp(400, alimentado(b"GET / HTTP/1.1\r\nsem-dois-pontos\r\n\r\n"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import socket
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clienteTestes import ClienteTestesServidores
+from poolConexoes import PoolConexoes
+
+RESPOSTA = (b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: keep-alive\r\n"
+            b"Keep-Alive: timeout=30, max=100\r\n\r\nok")
+
+
+class ServidorUmaResposta:
+    """Responde uma requisicao por conexao e fecha (FIN) ao receber a segunda, sem responder.
+
+    Simula o servidor que encerra a conexao keep-alive ociosa no mesmo instante em que o
+    cliente a reaproveita: o select() do pool nao ve nada e a leitura recebe EOF limpo.
+    """
+
+    def __init__(self):
+        self.socket = socket.create_server(('127.0.0.1', 0))
+        self.porta = self.socket.getsockname()[1]
+        self.conexoes = 0
+        threading.Thread(target=self.aceitar, daemon=True).start()
+
+    def aceitar(self):
+        while True:
+            try:
+                cliente, _ = self.socket.accept()
+            except OSError:
+                return
+            self.conexoes += 1
+            threading.Thread(target=self.atender, args=(cliente,), daemon=True).start()
+
+    def atender(self, cliente):
+        with cliente:
+            if self.ler_requisicao(cliente):
+                cliente.sendall(RESPOSTA)
+                self.ler_requisicao(cliente)
+
+    def ler_requisicao(self, cliente):
+        buffer = b''
+        while b'\r\n\r\n' not in buffer:
+            dados = cliente.recv(65536)
+            if not dados:
+                return False
+            buffer += dados
+        return True
+
+    def fechar(self):
+        self.socket.close()
+
+
+class TestePoolKeepAlive(unittest.TestCase):
+    def setUp(self):
+        self.servidor = ServidorUmaResposta()
+        self.cliente = ClienteTestesServidores()
+        self.pool = PoolConexoes(max_por_destino=1)
+
+    def tearDown(self):
+        self.pool.fechar()
+        self.servidor.fechar()
+
+    def test_repete_em_conexao_nova_apos_eof_na_conexao_reusada(self):
+        porta = self.servidor.porta
+        self.assertEqual(self.cliente.medir_requisicao_pool('127.0.0.1', porta, self.pool)[1:], (200, True))
+        fases = self.cliente.novas_fases()
+        self.assertEqual(self.cliente.medir_requisicao_pool('127.0.0.1', porta, self.pool, fases=fases)[1:],
+                         (200, True))
+        self.assertEqual(self.servidor.conexoes, 2)
+        self.assertEqual(self.pool.estatisticas()['reusos'], 1)
+        self.assertEqual(fases['primeiro_byte'].contagem, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()